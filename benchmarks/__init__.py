@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of mlox_rule_mgr.
+
+- generate: deterministic generator of synthetic rule files at multiples of
+  the size of mlox_base.txt
+- run: times parsing, splitting, merging and reporting on generated rule
+  files, and compares the timings with a stored baseline
+- bench_matcher: PluginMatcher against naive per-pattern matching
+
+Run them from the top directory of the repository, e.g.
+"python -m benchmarks.run --help".
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of PluginMatcher against naive per-pattern matching.
+
+Generates a set of plugin-name patterns, a fraction of which use wildcards,
+and a list of installed plugin names, then times finding every matching
+pattern for every plugin both ways and checks that the results agree.
+
+usage: python benchmarks/bench_matcher.py [--patterns N] [--plugins N] [--wildcards FRACTION]
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from mlox_rule_mgr import matching
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+WORDS = (
+    "morrowind", "tribunal", "bloodmoon", "patch", "rebirth", "better", "bodies",
+    "tamriel", "rebuilt", "data", "hlaalu", "telvanni", "redoran", "vivec", "balmora",
+    "sounds", "textures", "meshes", "expanded", "fixes", "quests", "armor", "weapons",
+)
+
+
+def random_name(rng):
+    words = [rng.choice(WORDS).title() for _ in range(rng.randint(1, 4))]
+    return " ".join(words)
+
+
+def random_version(rng):
+    return ".".join(str(rng.randint(0, 9)) for _ in range(rng.randint(1, 3)))
+
+
+def generate(num_patterns, num_plugins, wildcard_share, seed = 0):
+    """Returns (patterns, plugins)."""
+    rng = random.Random(seed)
+    bases = [random_name(rng) for _ in range(max(num_patterns // 2, 1))]
+    patterns = set()
+    while len(patterns) < num_patterns:
+        base = rng.choice(bases)
+        extension = rng.choice((".esp", ".esm"))
+        if rng.random() < wildcard_share:
+            wildcard = rng.choice((" *", " <VER>", "?", " v<VER>*"))
+            patterns.add(f"{base}{wildcard}{extension}")
+        else:
+            patterns.add(f"{base}{extension}")
+    plugins = list()
+    for _ in range(num_plugins):
+        base = rng.choice(bases)
+        extension = rng.choice((".esp", ".esm"))
+        suffix = rng.choice(("", f" {random_version(rng)}", f" v{random_version(rng)} Beta", "2"))
+        plugins.append(f"{base}{suffix}{extension}")
+    return sorted(patterns), plugins
+
+
+def naive_matches(patterns, plugins):
+    """Matches every plugin against every pattern, one pattern at a time."""
+    compiled = list()
+    for pattern in patterns:
+        prefix, regex = matching.split_pattern(pattern)
+        rest = regex.pattern if regex is not None else ""
+        compiled.append((re.compile(re.escape(prefix) + rest, re.DOTALL), pattern))
+    matches = dict()
+    for plugin in plugins:
+        name = plugin.lower()
+        plugin_matches = [pattern for regex, pattern in compiled if regex.fullmatch(name)]
+        if plugin_matches:
+            matches[plugin] = plugin_matches
+    return matches
+
+
+def timed(function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Benchmark PluginMatcher against per-pattern matching")
+    parser.add_argument("--patterns", type = int, default = 3000, help = "number of patterns (default: 3000)")
+    parser.add_argument("--plugins", type = int, default = 3000, help = "number of plugin names (default: 3000)")
+    parser.add_argument(
+        "--wildcards", type = float, default = 0.2,
+        help = "share of patterns with wildcards (default: 0.2)"
+    )
+    parser.add_argument("--seed", type = int, default = 0, help = "random seed (default: 0)")
+    args = parser.parse_args(argv)
+
+    patterns, plugins = generate(args.patterns, args.plugins, args.wildcards, args.seed)
+    print(f"{len(patterns)} patterns, {len(plugins)} plugins")
+
+    matcher, compile_time = timed(matching.PluginMatcher, patterns)
+    matches, match_time = timed(matcher.match_all, plugins)
+    expected, naive_time = timed(naive_matches, patterns, plugins)
+    if {plugin: sorted(found) for plugin, found in matches.items()} != \
+            {plugin: sorted(found) for plugin, found in expected.items()}:
+        print("PluginMatcher and naive matching disagree!")
+        return 1
+
+    print(f"\t{len(matches)} plugins matched")
+    print(f"\tPluginMatcher: {compile_time:.3f} s compile, {match_time:.3f} s match")
+    print(f"\tnaive: {naive_time:.3f} s")
+    print(f"\tspeedup: {naive_time / max(compile_time + match_time, 1e-9):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
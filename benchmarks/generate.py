@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic generator of synthetic mlox rule files.
+
+Files look like mlox_base.txt: a header of ";;" comment lines and a
+[Version] line, then mod sections (";; @mod name [author]") of a few rules
+each. At scale 1 a file has about as many sections as mlox_base.txt. The
+same arguments and seed always give the same file.
+
+usage: python -m benchmarks.generate [--scale N] [--duplicates SHARE] [--header-lines N]
+                                     [--comments DENSITY] [--rule-mix KIND=WEIGHT,...] [--seed N] output
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import random
+import sys
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+# Number of mod sections of mlox_base.txt, roughly.
+BASE_SECTIONS = 2500
+
+DEFAULT_DUPLICATE_SHARE = 0.02
+DEFAULT_HEADER_LINES = 60
+DEFAULT_COMMENT_DENSITY = 0.2
+DEFAULT_RULE_MIX = {
+    "Order": 0.35,
+    "Requires": 0.2,
+    "Conflict": 0.2,
+    "Patch": 0.1,
+    "Note": 0.1,
+    "NearEnd": 0.05,
+}
+
+SYLLABLES = (
+    "mor", "row", "ind", "tri", "bu", "nal", "blood", "moon", "tam", "ri", "el", "re",
+    "built", "hla", "alu", "tel", "van", "ni", "do", "ran", "vi", "vec", "bal", "ma",
+    "sa", "dra", "ald", "ruhn", "gni", "sis", "sad", "rith", "ebon", "heart", "kha", "jiit",
+)
+WORDS = (
+    "better", "bodies", "sounds", "textures", "meshes", "expanded", "fixes", "quests",
+    "armor", "weapons", "patch", "lights", "houses", "guards", "merchants", "books",
+)
+AUTHORS = (
+    "Psychodog", "Grond1911", "arvisrend", "EnderAndrew", "Midgetalien", "Trancemaster",
+    "Dragon32", "TR Team", "Westly", "Arcimaestro", "Qarl", "Dongle", "Melchior", "Abot",
+)
+
+
+def parse_rule_mix(text):
+    """Parses "Order=0.5,Requires=0.5" into {"Order": 0.5, "Requires": 0.5}."""
+    rule_mix = dict()
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        rule_mix[kind.strip()] = float(weight)
+    return rule_mix
+
+
+class RuleFileGenerator(object):
+    """
+    Generates the text of a synthetic rule file.
+
+    Parameters
+    ----------
+    scale : float, optional
+        size of the file in multiples of mlox_base.txt.
+    duplicate_share : float, optional
+        share of sections whose name repeats that of an earlier section.
+    header_lines : int, optional
+        number of lines of the header.
+    comment_density : float, optional
+        chance of a comment line before each rule line.
+    rule_mix : dict, optional
+        relative weights of the rule kinds.
+    seed : int, optional
+        random seed.
+
+    """
+    def __init__(
+            self,
+            scale = 1,
+            duplicate_share = DEFAULT_DUPLICATE_SHARE,
+            header_lines = DEFAULT_HEADER_LINES,
+            comment_density = DEFAULT_COMMENT_DENSITY,
+            rule_mix = None,
+            seed = 0,
+    ):
+        self.num_sections = max(int(BASE_SECTIONS * scale), 1)
+        self.duplicate_share = duplicate_share
+        self.header_lines = header_lines
+        self.comment_density = comment_density
+        self.rule_mix = dict(DEFAULT_RULE_MIX if rule_mix is None else rule_mix)
+        self.rng = random.Random(seed)
+        # A pool of plugins shared between sections, so rules overlap.
+        self.plugins = [self.plugin_name() for _ in range(max(self.num_sections * 3, 10))]
+
+    def word(self):
+        rng = self.rng
+        if rng.random() < 0.3:
+            return rng.choice(WORDS).title()
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+
+    def plugin_name(self):
+        rng = self.rng
+        name = " ".join(self.word() for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            name += f" {rng.randint(0, 3)}.{rng.randint(0, 9)}"
+        return name + rng.choice((".esp", ".esp", ".esp", ".esm"))
+
+    def comment(self):
+        rng = self.rng
+        return ";; " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+
+    def plugin_lines(self, num_plugins, ordered = False):
+        plugin_ids = self.rng.sample(range(len(self.plugins)), num_plugins)
+        if ordered:
+            # Order rules agree with the order of the pool, so have no cycles.
+            plugin_ids.sort()
+        lines = list()
+        for plugin in (self.plugins[plugin_id] for plugin_id in plugin_ids):
+            if self.rng.random() < self.comment_density:
+                lines.append(self.comment())
+            lines.append(plugin)
+        return lines
+
+    def rule(self, kind):
+        rng = self.rng
+        if kind == "Order":
+            return ["[Order]"] + self.plugin_lines(rng.randint(2, 5), ordered = True)
+        if kind == "NearEnd":
+            return ["[NearEnd]"] + self.plugin_lines(rng.randint(1, 3))
+        if kind == "Note":
+            return ["[Note]", f" {self.comment()[3:]}."] + self.plugin_lines(rng.randint(1, 3))
+        first, second, third = rng.sample(self.plugins, 3)
+        if kind == "Requires":
+            return ["[Requires]", first, f"[ALL {second} {third}]"]
+        if kind == "Conflict":
+            return ["[Conflict]", f" {self.comment()[3:]}."] + self.plugin_lines(rng.randint(2, 4))
+        if kind == "Patch":
+            return ["[Patch]", f" {self.comment()[3:]}.", first, f"[ANY {second} {third}]"]
+        raise ValueError(f"unknown rule kind '{kind}'")
+
+    def header(self):
+        lines = [";; -*- mode: emacs-lisp -*-", ";" * 70]
+        while len(lines) < self.header_lines - 2:
+            lines.append(self.comment())
+        lines.extend(["", "[Version 2021-01-09 00:00:00 (UTC)]"])
+        return lines[:self.header_lines]
+
+    def section_names(self):
+        rng = self.rng
+        names = list()
+        for _ in range(self.num_sections):
+            if names and rng.random() < self.duplicate_share:
+                names.append(rng.choice(names))
+            else:
+                mod_name = " ".join(self.word() for _ in range(rng.randint(1, 4)))
+                names.append(f"{mod_name} [{rng.choice(AUTHORS)}]")
+        # mlox_base.txt is mostly in alphabetical order.
+        names.sort(key = str.lower)
+        return names
+
+    def lines(self):
+        """Generates the lines of the file, without line ends."""
+        rng = self.rng
+        kinds = list(self.rule_mix)
+        weights = [self.rule_mix[kind] for kind in kinds]
+        yield from self.header()
+        for name in self.section_names():
+            yield ""
+            yield ";" * 70
+            yield f";; @{name}"
+            for kind in rng.choices(kinds, weights, k = rng.randint(1, 4)):
+                yield ""
+                yield from self.rule(kind)
+
+    def write(self, filename):
+        with open(filename, "w", encoding = "utf-8") as f:
+            for line in self.lines():
+                f.write(line)
+                f.write("\n")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Generate a synthetic mlox rule file")
+    parser.add_argument("output", help = "rule file to write")
+    parser.add_argument(
+        "--scale", type = float, default = 1,
+        help = "size in multiples of mlox_base.txt (default: 1)"
+    )
+    parser.add_argument(
+        "--duplicates", type = float, default = DEFAULT_DUPLICATE_SHARE,
+        help = f"share of sections with duplicate names (default: {DEFAULT_DUPLICATE_SHARE})"
+    )
+    parser.add_argument(
+        "--header-lines", type = int, default = DEFAULT_HEADER_LINES,
+        help = f"number of header lines (default: {DEFAULT_HEADER_LINES})"
+    )
+    parser.add_argument(
+        "--comments", type = float, default = DEFAULT_COMMENT_DENSITY,
+        help = f"chance of a comment before each rule line (default: {DEFAULT_COMMENT_DENSITY})"
+    )
+    parser.add_argument(
+        "--rule-mix", type = parse_rule_mix, default = None,
+        help = "relative weights of rule kinds, e.g. Order=0.5,Requires=0.5 (default: "
+        + ",".join(f"{kind}={weight}" for kind, weight in DEFAULT_RULE_MIX.items()) + ")"
+    )
+    parser.add_argument("--seed", type = int, default = 0, help = "random seed (default: 0)")
+    args = parser.parse_args(argv)
+
+    generator = RuleFileGenerator(
+        args.scale, args.duplicates, args.header_lines, args.comments, args.rule_mix, args.seed
+    )
+    generator.write(args.output)
+    print(f"wrote {generator.num_sections} sections to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
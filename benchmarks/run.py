@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Times the main mlox_rule_mgr operations on generated rule files.
+
+For each scale (in multiples of the size of mlox_base.txt), generates a rule
+file and times parse_rulefile_1, parse_rulefile_2, split_1, merge_1 (of the
+split files), report (plain, and with all its slower checks) and
+similar_names (of its section names) on it, keeping the best of several
+runs. Results can be saved as JSON, and compared with a
+baseline saved earlier: a timing more than --tolerance slower than its
+baseline is a regression, and makes the exit status 1.
+
+usage: python -m benchmarks.run [--scales N [N ...]] [--repeat N] [--output FILE]
+                                [--baseline FILE] [--tolerance SHARE]
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from mlox_rule_mgr import cli, similarity
+
+from benchmarks import generate
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+RESULTS_VERSION = 1
+DEFAULT_SCALES = (1, 10)
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+
+def rule_manager(**kwargs):
+    """Returns an MloxRuleManager with the given arguments, bypassing the parse cache."""
+    return cli.MloxRuleManager(argparse.Namespace(no_cache = True, **kwargs))
+
+
+def bench_parse_rulefile_1(rulefile_name, work_dir):
+    rule_mgr = rule_manager()
+    with open(rulefile_name, "r", encoding = "utf-8") as f:
+        rule_mgr.parse_rulefile_1(f)
+
+
+def bench_parse_rulefile_2(rulefile_name, work_dir):
+    rule_mgr = rule_manager()
+    with open(rulefile_name, "r", encoding = "utf-8") as f:
+        rule_mgr.parse_rulefile_2(f)
+
+
+def bench_split_1(rulefile_name, work_dir):
+    split_dir = os.path.join(work_dir, "split")
+    os.makedirs(split_dir, exist_ok = True)
+    rule_manager(mlox_file = rulefile_name, directory = split_dir).split_1()
+
+
+def bench_merge_1(rulefile_name, work_dir):
+    # Merges what the last split_1 run wrote.
+    split_dir = os.path.join(work_dir, "split")
+    rule_manager(
+        base_mlox_file = os.path.join(work_dir, "merged.txt"),
+        mlox_files = [os.path.join(split_dir, "*.txt")],
+    ).merge_1()
+
+
+def bench_report(rulefile_name, work_dir, all_checks = False):
+    rule_mgr = rule_manager(
+        mlox_files = [rulefile_name], sections = False, name_distance = 2,
+        similar_names = all_checks, order_cycles = all_checks, similar_bodies = all_checks,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        rule_mgr.report()
+
+
+def bench_report_all_checks(rulefile_name, work_dir):
+    bench_report(rulefile_name, work_dir, all_checks = True)
+
+
+def bench_similar_names(rulefile_name, work_dir):
+    # Includes parsing, which parse_rulefile_2 times on its own.
+    with open(rulefile_name, "r", encoding = "utf-8") as f:
+        section_names = [name for name in rule_manager().parse_rulefile_2(f) if name != "_header"]
+    similarity.similar_names(section_names)
+
+
+BENCHMARKS = (
+    ("parse_rulefile_1", bench_parse_rulefile_1),
+    ("parse_rulefile_2", bench_parse_rulefile_2),
+    ("split_1", bench_split_1),
+    ("merge_1", bench_merge_1),
+    ("report", bench_report),
+    ("report_all_checks", bench_report_all_checks),
+    ("similar_names", bench_similar_names),
+)
+
+
+def time_benchmark(function, rulefile_name, work_dir, repeat):
+    times = list()
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function(rulefile_name, work_dir)
+        times.append(time.perf_counter() - start_time)
+    return {"best": min(times), "median": statistics.median(times)}
+
+
+def run_benchmarks(scales, repeat, seed = 0):
+    """
+    Runs every benchmark at every scale.
+
+    Returns
+    -------
+    results : dict
+        {"<scale>x": {"file": {...}, "<benchmark>": {"best": s, "median": s}}}
+
+    """
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix = "mlox_bench_") as work_dir:
+        for scale in scales:
+            key = f"{scale:g}x"
+            scale_dir = os.path.join(work_dir, key)
+            os.makedirs(scale_dir)
+            rulefile_name = os.path.join(scale_dir, "rules.txt")
+            generator = generate.RuleFileGenerator(scale, seed = seed)
+            generator.write(rulefile_name)
+            results[key] = scale_results = {
+                "file": {"sections": generator.num_sections, "bytes": os.path.getsize(rulefile_name)},
+            }
+            print(f"{key}: {generator.num_sections} sections, {scale_results['file']['bytes']} bytes")
+            for name, function in BENCHMARKS:
+                scale_results[name] = timing = time_benchmark(function, rulefile_name, scale_dir, repeat)
+                print(f"\t{name}: {timing['best']:.3f} s (median {timing['median']:.3f} s)")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares results with baseline results.
+
+    Returns
+    -------
+    regressions : list of (scale, benchmark, best, baseline best) tuples
+        timings more than tolerance slower than their baseline.
+
+    """
+    regressions = list()
+    for key, scale_results in results.items():
+        for name, timing in scale_results.items():
+            baseline_timing = baseline.get(key, dict()).get(name)
+            if name == "file" or baseline_timing is None:
+                continue
+            ratio = timing["best"] / max(baseline_timing["best"], 1e-9)
+            print(f"\t{key} {name}: {ratio:.2f} of baseline")
+            if ratio > 1 + tolerance:
+                regressions.append((key, name, timing["best"], baseline_timing["best"]))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Time mlox_rule_mgr operations on generated rule files")
+    parser.add_argument(
+        "--scales", type = float, nargs = "+", default = list(DEFAULT_SCALES),
+        help = "file sizes in multiples of mlox_base.txt (default: 1 10)"
+    )
+    parser.add_argument(
+        "--repeat", type = int, default = DEFAULT_REPEAT,
+        help = f"runs of each benchmark (default: {DEFAULT_REPEAT})"
+    )
+    parser.add_argument("--seed", type = int, default = 0, help = "random seed (default: 0)")
+    parser.add_argument("-o", "--output", help = "file to save results to, as JSON")
+    parser.add_argument("--baseline", help = "results saved earlier to compare with")
+    parser.add_argument(
+        "--tolerance", type = float, default = DEFAULT_TOLERANCE,
+        help = f"slowdown relative to baseline counted as a regression (default: {DEFAULT_TOLERANCE})"
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scales, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding = "utf-8") as f:
+            json.dump({
+                "version": RESULTS_VERSION,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent = 2)
+        print(f"saved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding = "utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("version") != RESULTS_VERSION:
+            print(f"{args.baseline} is not a results file of version {RESULTS_VERSION}")
+            return 2
+        print(f"compared with {args.baseline}:")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        nregressions = len(regressions)
+        if nregressions:
+            print(f"{nregressions} Regression{(nregressions != 1) and 's' or ''}:")
+            for key, name, best, baseline_best in regressions:
+                print(f"\t{key} {name}: {best:.3f} s, baseline {baseline_best:.3f} s")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
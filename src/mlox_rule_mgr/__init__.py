@@ -5,13 +5,19 @@ Created on Sat Jan  9 18:14:27 2021
 @author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
 """
 
-from pkg_resources import DistributionNotFound, get_distribution
 
-try:
-    # Change here if project is renamed and does not equal the package name
-    dist_name = __name__
-    __version__ = get_distribution(dist_name).version
-except DistributionNotFound:
-    __version__ = "unknown"
-finally:
-    del get_distribution, DistributionNotFound
+def __getattr__(name):
+    # __version__ is looked up on first use, as importing importlib.metadata
+    # takes longer than starting most subcommands.
+    global __version__
+    if name != "__version__":
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        # Change here if project is renamed and does not equal the package name
+        dist_name = __name__
+        __version__ = version(dist_name)
+    except PackageNotFoundError:
+        __version__ = "unknown"
+    return __version__
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk cache of section tables.
+
+Entries are keyed by the real path of a rule file and the way it was
+scanned, and are only used when the file's size, modification time and
+content hash all match what was recorded. Old entries are evicted by age and
+by the total size of the cache directory.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import time
+
+from mlox_rule_mgr import sections
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+# Bumped whenever scanning a rule file can give different section tables.
+CACHE_VERSION = 2
+CACHE_DIR_ENV = "MLOX_RULE_MGR_CACHE_DIR"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+
+def default_cache_dir():
+    """
+    Returns the cache directory: $MLOX_RULE_MGR_CACHE_DIR if set, otherwise
+    mlox_rule_mgr under $XDG_CACHE_HOME or ~/.cache.
+    """
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if directory:
+        return directory
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "mlox_rule_mgr")
+
+
+def content_digest(buf):
+    return hashlib.blake2b(buf, digest_size = 20).hexdigest()
+
+
+def scan_flavor(section_regex, naming):
+    """Identifies how a section table was scanned, for use in cache keys."""
+    return f"{section_regex.pattern!r}:{naming.__module__}.{naming.__qualname__}"
+
+
+class ParseCache(object):
+    """
+    Directory of pickled section tables.
+
+    Parameters
+    ----------
+    directory : string, optional
+        cache directory; defaults to default_cache_dir().
+    max_bytes : int, optional
+        total size the cache directory is pruned down to.
+    max_age : float, optional
+        seconds after which unused entries are evicted.
+
+    """
+    suffix = ".sections"
+
+    def __init__(self, directory = None, max_bytes = DEFAULT_MAX_BYTES, max_age = DEFAULT_MAX_AGE):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def entry_path(self, realpath, flavor):
+        key = hashlib.sha1(f"{CACHE_VERSION}\0{realpath}\0{flavor}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, filename, buf, flavor):
+        """
+        Returns the cached sections of a rule file, or None on a miss.
+
+        Parameters
+        ----------
+        filename : string
+            path of the rule file.
+        buf : bytes-like object
+            contents of the rule file.
+        flavor : string
+            scan_flavor() of the wanted table.
+
+        """
+        realpath = os.path.realpath(filename)
+        entry_path = self.entry_path(realpath, flavor)
+        try:
+            stat = os.stat(realpath)
+            with open(entry_path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+            _logger.debug(f"ignoring unreadable cache entry '{entry_path}': {e}")
+            return None
+
+        key = (CACHE_VERSION, realpath, flavor, stat.st_size, stat.st_mtime_ns)
+        if entry.get("key") != key or entry.get("digest") != content_digest(buf):
+            _logger.debug(f"stale cache entry for '{realpath}'")
+            return None
+
+        # Mark the entry as recently used, for eviction.
+        with contextlib.suppress(OSError):
+            os.utime(entry_path)
+        _logger.debug(f"cache hit for '{realpath}'")
+        return sections.sections_from_tuples(entry["sections"])
+
+    def store(self, filename, buf, flavor, section_list):
+        """
+        Saves the sections of a rule file, then prunes the cache.
+        """
+        realpath = os.path.realpath(filename)
+        entry_path = self.entry_path(realpath, flavor)
+        try:
+            stat = os.stat(realpath)
+            entry = {
+                "key": (CACHE_VERSION, realpath, flavor, stat.st_size, stat.st_mtime_ns),
+                "digest": content_digest(buf),
+                "sections": [section.astuple() for section in section_list],
+            }
+            os.makedirs(self.directory, exist_ok = True)
+            tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entry, f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            _logger.debug(f"cannot write cache entry '{entry_path}': {e}")
+            return
+        self.prune()
+
+    def prune(self):
+        """
+        Evicts entries older than max_age, then the least recently used
+        entries until the cache is no larger than max_bytes.
+        """
+        entries = list()
+        for path in self._entry_paths():
+            with contextlib.suppress(OSError):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        oldest_allowed = time.time() - self.max_age
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if mtime >= oldest_allowed and total_size <= self.max_bytes:
+                break
+            _logger.debug(f"evicting cache entry '{path}'")
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                total_size -= size
+
+    def _entry_paths(self):
+        try:
+            return [
+                entry.path for entry in os.scandir(self.directory)
+                if entry.name.endswith(self.suffix)
+            ]
+        except OSError:
+            return []
+
+
+@contextlib.contextmanager
+def cached_section_table_factory(
+    cache,
+    filename,
+    section_regex = sections.section_name_regex_2,
+    naming = sections.section_key,
+):
+    """
+    Same as sections.section_table_factory, but reuses a cached table when
+    the file has not changed.
+    """
+    flavor = scan_flavor(section_regex, naming)
+    with sections.mapped_file(filename) as buf:
+        section_list = cache.load(filename, buf, flavor)
+        if section_list is None:
+            section_list = list(sections.iter_sections(buf, section_regex, naming))
+            cache.store(filename, buf, flavor, section_list)
+        yield sections.SectionTable(buf, section_list)
@@ -7,15 +7,17 @@ Created on Sat Jan  9 18:18:51 2021
 
 import argparse
 import contextlib
-import json
+import errno
+import functools
 import glob
+import io
 import logging
 import os
 import re
 import string
 import sys
 
-from mlox_rule_mgr import __version__
+from mlox_rule_mgr import cache, commands, profiling, sections
 
 __author__ = "Kaben Nanlohy"
 __copyright__ = "Kaben Nanlohy"
@@ -43,11 +45,29 @@ def get_safe_filename(name):
     return filename
 
 
+def safe_section_key(match):
+    """
+    Names a section by the safe filename of its section-name text, as
+    `split` does. Used with sections.sectionname_regex.
+
+    """
+    name = sys.intern(get_safe_filename(match.group(1).decode("utf-8")))
+    return name, name, ""
+
+
 def coalesce_lines(lines):
     text = "".join(lines)
     return text.strip()
 
 
+def merged_segment(data, encoding = "utf-8"):
+    """Renders the contents of a rule file the way merge_1 writes it."""
+    with io.TextIOWrapper(io.BytesIO(data), encoding = encoding) as in_f:
+        text = coalesce_lines(in_f.readlines()) + os.linesep
+    # As written by a text-mode file.
+    return text.replace("\n", os.linesep).encode(encoding)
+
+
 @contextlib.contextmanager
 def textfile_reader_factory(filename, encoding = "utf-8"):
     f = open(filename, 'r', encoding = encoding)
@@ -80,105 +100,90 @@ class MloxRuleManager(object):
         self.args = args
         self.reader_factory = textfile_reader_factory
         self.writer_factory = textfile_writer_factory
-        self.comment_regex = re.compile(r"\s*;+\s*")
-        self.sectionname_regex = re.compile(r"\s*;+\s*@(.*)")
-        self.section_name_regex_2 = re.compile(r"\s*;+\s*@(?P<mod_name>.*?)\s*(?: \[(?P<author>.*)\])")
+        self.section_table_factory = sections.section_table_factory
+        self.profiler = profiling.NULL_PROFILER
+        if getattr(args, "profile", None):
+            self.profiler = profiling.Profiler()
+        self.parse_cache = None
+        if not getattr(args, "no_cache", False):
+            self.parse_cache = cache.ParseCache(getattr(args, "cache_dir", None))
+            self.section_table_factory = functools.partial(cache.cached_section_table_factory, self.parse_cache)
 
 
-    def parse_rulefile_1(self, reader):
-        # TODO: Instead of collecting sections into dictionary, save to disk.
-        sections = dict()
+    def __getattr__(self, name):
+        """
+        Finds subcommand methods (merge, report, load_section_index, ...)
+        in their command modules, importing the module on first use.
 
-        # Create first "header" section.
-        sectionname = "_header"
-        section = list()
-        comments = list()
+        """
+        module_name = commands.METHOD_MODULES.get(name)
+        if module_name is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        return functools.partial(getattr(commands.load(module_name), name), self)
 
-        for line_num, line in enumerate(reader.readlines()):
-            sectionname_match = self.sectionname_regex.match(line)
-            comment_match = self.comment_regex.match(line)
-            if sectionname_match:
-                _logger.debug(f"{line_num}: sectionname: {sectionname_match}")
-                _logger.debug(sectionname_match.groups())
-                # Save existing section.
-                #sections[sectionname] = section              
-                section_versions = sections.get(sectionname, list())
-                section_versions.append(section)
-                sections[sectionname] = section_versions
-                # TODO: Instead of collecting sections into dictionary,
-                # save to disk at this point.
-                # Create new section.
-                sectionname = get_safe_filename(sectionname_match.group(1))
-                _logger.debug(f"{line_num}: safe_sectionname: {sectionname}")
-                # Add existing comment lines to start of section.
-                section = comments
-                comments = list()
-                # Add section name to start of section.
-                section.append(line)
-            elif comment_match:
-                _logger.debug(f"{line_num}: comment: {comment_match}")
-                # Collect comment line, but don't add to section yet.
-                comments.append(line)
-            else:
-                # Add any comment lines to current section.
-                section.extend(comments)
-                comments = list()
-                # Add current line to section.
-                section.append(line)
-
-        # Save final section.
-        if comments:
-            section.extend(comments)
-        section_versions = sections.get(sectionname, list())
-        section_versions.append(section)
-        sections[sectionname] = section_versions
-        
-        return sections
-        
 
+    # Compiled on first use, as only the text-based parsers use them.
+    @functools.cached_property
+    def comment_regex(self):
+        return re.compile(r"\s*;+\s*")
 
-    def parse_rulefile_2(self, reader):
-        # TODO: Instead of collecting sections into dictionary, save to disk.
-        section_dict = dict()
 
-        # Create entry for header section.
-        section_info = dict()
-        section_info["line_number"] = 1
-        section_info["mod_name"] = "_header"
-        section_info["author"] = ""
-        section_name = "_header"
+    @functools.cached_property
+    def sectionname_regex(self):
+        return re.compile(r"\s*;+\s*@(.*)")
+
+
+    @functools.cached_property
+    def section_name_regex_2(self):
+        return re.compile(r"\s*;+\s*@(?P<mod_name>.*?)\s*(?: \[(?P<author>.*)\])")
+
+
+    def _iter_section_lines(self, reader, section_regex):
+        """
+        Generates sections of a rule file in a single pass.
+
+        Only the lines of the current section (plus any comment lines that
+        might belong to the next one) are held in memory.
+
+        Parameters
+        ----------
+        reader : file-like object
+            text stream of the rule file.
+        section_regex : re.Pattern
+            regex matching section-name lines.
+
+        Yields
+        ------
+        (match, line_number, lines) : tuple
+            section-name match (None for the header section), line number of
+            the section-name line, and list of lines in the section.
+
+        """
+        # Create first "header" section.
+        section_match = None
+        section_line_num = 1
         section_lines = list()
         comment_lines = list()
 
-        for line_num, line in enumerate(reader.readlines()):
-            section_name_match = self.section_name_regex_2.match(line)
+        for line_num, line in enumerate(reader):
+            section_name_match = section_regex.match(line)
             comment_match = self.comment_regex.match(line)
             if section_name_match:
-                # Save existing section.
-                section_info["lines"] = section_lines
-                section_versions = section_dict.get(section_name, list())
-                section_versions.append(section_info)
-                section_dict[section_name] = section_versions
-
-                # TODO: Instead of collecting sections into dictionary,
-                # save to disk at this point.
+                _logger.debug(f"{line_num}: section_name_match: {section_name_match}")
+                # Hand off existing section.
+                yield section_match, section_line_num, section_lines
+
                 # Create new section.
-                section_info = dict()
-                section_info["line_number"] = line_num
-                section_name_groupdict = section_name_match.groupdict()
-                mod_name = section_name_groupdict["mod_name"]
-                author = section_name_groupdict["author"]
-                section_info["mod_name"] = mod_name
-                section_info["author"] = author
-                section_name = f"{mod_name} [{author}]"
+                section_match = section_name_match
+                section_line_num = line_num
 
                 # Add existing comment lines to start of new section.
                 section_lines = comment_lines
                 comment_lines = list()
-                
+
                 # Also add section name line to start of new section.
                 section_lines.append(line)
-                
+
             elif comment_match:
                 _logger.debug(f"{line_num}: comment_match: {comment_match}")
                 # Comment line might or might not be part of a new section,
@@ -194,14 +199,76 @@ class MloxRuleManager(object):
                 # Add current line to section.
                 section_lines.append(line)
 
-        # Save final section.
-        if comment_lines:
-            section_lines.extend(comment_lines)
-        section_info["lines"] = section_lines
-        section_versions = section_dict.get(section_name, list())
-        section_versions.append(section_info)
-        section_dict[section_name] = section_versions
-        
+        # Hand off final section.
+        section_lines.extend(comment_lines)
+        yield section_match, section_line_num, section_lines
+
+
+    def iter_sections_1(self, reader):
+        """
+        Generates (safe_name, lines) pairs for each section of a rule file,
+        starting with the "_header" section.
+
+        """
+        for match, line_num, lines in self._iter_section_lines(reader, self.sectionname_regex):
+            if match is None:
+                sectionname = "_header"
+            else:
+                sectionname = get_safe_filename(match.group(1))
+                _logger.debug(f"{line_num}: safe_sectionname: {sectionname}")
+            yield sectionname, lines
+
+
+    def iter_sections(self, reader):
+        """
+        Generates (section_name, section_info) pairs for each section of a
+        rule file, starting with the "_header" section.
+
+        Parameters
+        ----------
+        reader : file-like object
+            text stream of the rule file.
+
+        Yields
+        ------
+        (section_name, section_info) : tuple
+            section name of the form "mod_name [author]", and dict with
+            "line_number", "mod_name", "author" and "lines" entries.
+
+        """
+        for match, line_num, lines in self._iter_section_lines(reader, self.section_name_regex_2):
+            section_info = dict()
+            section_info["line_number"] = line_num
+            if match is None:
+                section_info["mod_name"] = "_header"
+                section_info["author"] = ""
+                section_name = "_header"
+            else:
+                section_name_groupdict = match.groupdict()
+                mod_name = section_name_groupdict["mod_name"]
+                author = section_name_groupdict["author"]
+                section_info["mod_name"] = mod_name
+                section_info["author"] = author
+                section_name = f"{mod_name} [{author}]"
+            section_info["lines"] = lines
+            yield section_name, section_info
+
+
+    def parse_rulefile_1(self, reader):
+        section_dict = dict()
+        for sectionname, section in self.iter_sections_1(reader):
+            section_versions = section_dict.get(sectionname, list())
+            section_versions.append(section)
+            section_dict[sectionname] = section_versions
+        return section_dict
+
+
+    def parse_rulefile_2(self, reader):
+        section_dict = dict()
+        for section_name, section_info in self.iter_sections(reader):
+            section_versions = section_dict.get(section_name, list())
+            section_versions.append(section_info)
+            section_dict[section_name] = section_versions
         return section_dict
         
     
@@ -209,152 +276,74 @@ class MloxRuleManager(object):
         return self.parse_rulefile_2(reader)
         
 
-    def merge_1(self):
+    def expand_rulefile_names(self, patterns, strict = False):
         """
-        usage: merge [-h] base_mlox_file mlox_files [mlox_files ...]
-        
-        positional arguments:
-          base_mlox_file    target file to merge subsequent mlox rule files into
-          mlox_files   rule files to merge
+        Expands glob patterns into rule file names, in case-insensitive
+        alphabetical order. A directory stands for the .txt files in it, and
+        an existing file for itself, even if its name has glob characters.
 
-        Returns
-        -------
-        None.
+        Parameters
+        ----------
+        patterns : list of strings
+            glob patterns, directories and rule file names.
+        strict : bool, optional
+            raise FileNotFoundError for the first pattern matching nothing.
 
         """
-        basefile_name = self.args.base_mlox_file
-        rulefile_names = self.args.mlox_files
-        _logger.debug(f"base_mlox_file: {basefile_name}, mlox_files: {rulefile_names}")
-
-        sorted_rulefile_names = list()
-        for rulefile_name in rulefile_names:
-            sorted_rulefile_names.extend(glob.glob(rulefile_name))
-        sorted_rulefile_names.sort(key = str.lower)
-        
-        with open(basefile_name, "w", encoding="utf-8") as out_f:
-            for rulefile_name in sorted_rulefile_names:
-                _logger.info(f"reading rulefile '{rulefile_name}'")
-                with open(rulefile_name, "r", encoding="utf-8") as in_f:
-                    lines = in_f.readlines()
-                    out_f.write(coalesce_lines(lines))
-                    out_f.write(os.linesep)
-    
-    
-    def split_1(self):
+        rulefile_names = list()
+        with self.profiler.phase("glob"):
+            for pattern in patterns:
+                if os.path.isdir(pattern):
+                    # A split directory.
+                    matches = glob.glob(os.path.join(glob.escape(pattern), "*.txt"))
+                elif os.path.exists(pattern):
+                    matches = [pattern]
+                else:
+                    matches = glob.glob(pattern)
+                if strict and not matches:
+                    raise FileNotFoundError(errno.ENOENT, "no rule files match", pattern)
+                rulefile_names.extend(matches)
+            rulefile_names.sort(key = str.lower)
+        return rulefile_names
+
+
+    @contextlib.contextmanager
+    def open_section_tables(self, rulefile_names, jobs = 1):
         """
-        usage: split [-h] [-d DIRECTORY] mlox_file
+        Opens the section tables of several rule files, scanning them in a
+        process pool when jobs is not 1.
 
-        positional arguments:
-          mlox_file              rule file to split
-        
-        optional arguments:
-          -h, --help            show this help message and exit
-          -d DIRECTORY, --directory DIRECTORY
-                                output directory
-
-        Returns
-        -------
-        None.
+        Parameters
+        ----------
+        rulefile_names : list of strings
+            paths of the rule files.
+        jobs : int, optional
+            number of worker processes; 0 means one per CPU.
 
-        """
-        rulefile_name = os.path.realpath(self.args.mlox_file)
-        directory = self.args.directory
-        if directory is None:
-            directory = os.path.dirname(os.path.realpath(rulefile_name))
-        if not os.path.exists(directory):
-            _logger.warn(f"specified output directory '{directory}' does not exist")
-            return
-        
-        _logger.debug(f"rulefile: {rulefile_name}")
-
-        # Try to read rulefile.
-        with open(rulefile_name, "r", encoding="utf-8") as in_f:
-            sections = self.parse_rulefile_1(in_f)
-
-            _logger.debug(f"output directory: {directory}")
-            for name, section_versions in sections.items():
-                sectionfile_name = os.path.join(directory, f"{name}.txt")
-                with open(sectionfile_name, "w", encoding="utf-8") as out_f:
-                    for i, section in enumerate(section_versions):
-                        _logger.info(f"saving section '{name}' version {i}")
-                        out_f.write(coalesce_lines(section))
-                        out_f.write(os.linesep)
-            
-                
-    def report(self):
-        """
-        report [-h] [-s] mlox_file
-        
-        positional arguments:
-          mlox_file       rule file to examine
-        
-        optional arguments:
-          -h, --help      show this help message and exit
-          -s, --sections  print file sections in the order they appear
-          
-        Returns
-        -------
-        None.
+        Yields
+        ------
+        tables : list of sections.SectionTable
+            section tables in the order of rulefile_names.
 
         """
-        rulefile_name = os.path.realpath(self.args.mlox_file)
-        with self.reader_factory(rulefile_name, encoding="utf-8") as in_f:
-            section_dict = self.parse_rulefile(in_f)
-            header_versions = section_dict.pop("_header", None)
-            
-            # Coalesce header contents into a single string to see if empty.
-            header_content = "".join(["".join(version["lines"]) for version in header_versions])
-
-            if (not header_content) and (len(section_dict) == 0):
-                print(f"{self.args.mlox_file} is empty.")
-                return
-
-            # Enumerate sections, tracking line numbers and duplicate names.
-            num_sections = 0
-            duplicate_sections = dict()
-            section_line_nums = []
-            for name, versions in section_dict.items():
-                num_versions = len(versions)
-                num_sections += num_versions
-                if num_versions > 1:
-                    duplicate_sections[name] = versions
-                for version in versions:
-                    section_line_nums.append((name, version["line_number"]))
-
-            print(f"{self.args.mlox_file} report:")
-            print(f"\tHeader: {header_content and 'Yes' or 'No'}")
-            print(f"\t{num_sections} Mod Section{(num_sections != 1) and 's' or ''}")
-            
-            if (num_sections == 0):
-                return            
-            
-            # Check whether sections appear in rulefile in lexical order.
-            section_line_nums_sorted_by_name = section_line_nums.copy()
-            section_line_nums_sorted_by_line = section_line_nums.copy()
-            section_line_nums_sorted_by_name.sort(key = lambda entry: entry[0])
-            section_line_nums_sorted_by_line.sort(key = lambda entry: entry[1])
-            sections_by_name = [entry[0] for entry in section_line_nums_sorted_by_name]
-            sections_by_line = [entry[0] for entry in section_line_nums_sorted_by_line]
-            print(f"\tSections Sorted: {(sections_by_name == sections_by_line) and 'Yes' or 'No'}")
-
-            # List locations of sections with duplicated names.
-            ndups = len(duplicate_sections)
-            if (ndups == 0):
-                print("\t0 Duplicate Section Names")
+        from mlox_rule_mgr import parallel
+
+        jobs = parallel.resolve_jobs(jobs)
+        with contextlib.ExitStack() as stack:
+            if jobs > 1 and len(rulefile_names) > 1:
+                section_lists = parallel.scan_rulefiles(rulefile_names, jobs, self.parse_cache)
+                tables = [
+                    sections.SectionTable(stack.enter_context(sections.mapped_file(rulefile_name)), section_list)
+                    for rulefile_name, section_list in zip(rulefile_names, section_lists)
+                ]
             else:
-                print(f"\t{ndups} Duplicate Section Name{(ndups != 1) and 's' or ''}:")
-                for name, versions in duplicate_sections.items():
-                    _logger.debug(f"report: duplicate_section: name {name}, versions {versions}")
-                    line_number_list = ", ".join(f"line {version['line_number']}" for version in versions)
-                    print(f"\t\t{name}: {line_number_list}")
-
-            # List names and line numbers of all sections found.
-            if self.args.sections:
-                print("\n\tSections found:")
-                for entry in sections_by_line:
-                    print(f"\t\t{entry}")
+                tables = [
+                    stack.enter_context(self.section_table_factory(rulefile_name))
+                    for rulefile_name in rulefile_names
+                ]
+            yield tables
+
 
-    
     def run(self):
         """
         Runs commands specified in args to MloxRuleManager(args).
@@ -365,7 +354,7 @@ class MloxRuleManager(object):
 
         """
         _logger.debug(f"args: {self.args}")
-        subcommand = self.args.subcommand
+        subcommand = self.args.subcommand.replace("-", "_")
         if hasattr(self, subcommand):
             getattr(self, subcommand)()
         else:
@@ -373,9 +362,25 @@ class MloxRuleManager(object):
             _logger.warn("I don't have that subcommand")
 
 
+class VersionAction(argparse.Action):
+    """Prints the version and exits, looking the version up only then."""
+    def __init__(self, option_strings, dest = argparse.SUPPRESS, default = argparse.SUPPRESS, help = None):
+        super().__init__(option_strings, dest = dest, default = default, nargs = 0, help = help)
+
+    def __call__(self, parser, namespace, values, option_string = None):
+        from mlox_rule_mgr import __version__
+
+        parser._print_message(f"mlox_rule_mgr {__version__}\n", sys.stdout)
+        parser.exit()
+
+
 def parse_args(args):
     """Parse command line parameters
 
+    Only the arguments of the chosen subcommand are added to the parser, so
+    only its module is imported: the global options and the subcommand are
+    parsed first, then the whole command line.
+
     Args:
       args ([str]): command line parameters as list of strings
 
@@ -387,8 +392,8 @@ def parse_args(args):
     )
     parser.add_argument(
         "--version",
-        action="version",
-        version="mlox_rule_mgr {ver}".format(ver=__version__),
+        action=VersionAction,
+        help="show program's version number and exit",
     )
     parser.add_argument(
         "-v",
@@ -406,63 +411,43 @@ def parse_args(args):
         action="store_const",
         const=logging.DEBUG,
     )
+    parser.add_argument(
+        "--no-cache",
+        action = "store_true",
+        help = "do not read or write the parse cache",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help = f"parse cache directory (default: ${cache.CACHE_DIR_ENV} or ~/.cache/mlox_rule_mgr)",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs = "?",
+        const = "text",
+        choices = profiling.PROFILE_FORMATS,
+        help = "print time spent in each phase, and counts of lines, sections, bytes and files,"
+        " to stderr on exit (as text, or as JSON with --profile=json)",
+    )
     subparsers = parser.add_subparsers(
         title = "subcommands",
         dest = "subcommand",
         required = True,
     )
-    
-    merge_cmd = subparsers.add_parser(
-        "merge",
-        help = "merge mlox rule files",
-    )
-    merge_cmd.add_argument(
-        "base_mlox_file",
-        help = "target file to merge subsequent mlox rule files into"
-    )
-    merge_cmd.add_argument(
-        "mlox_files",
-        nargs = "+", help = "rule files to merge"
-    )
-    
-    split_cmd = subparsers.add_parser(
-        "split",
-        help = "split an mlox rule file"
-    )
-    split_cmd.add_argument(
-        "mlox_file",
-        help = "rule file to split"
-    )
-    split_cmd.add_argument(
-        "-d", "--directory",
-        help = "output directory"
+    for command in commands.COMMANDS:
+        # -h is added with the other arguments, once the subcommand is known.
+        subparsers.add_parser(command.name, help = command.help, add_help = False)
+
+    # A bare --profile would take the subcommand for its format.
+    args = [(arg == "--profile") and "--profile=text" or arg for arg in args]
+    known_args, _ = parser.parse_known_args(args)
+    command = commands.COMMANDS_BY_NAME[known_args.subcommand]
+    command_parser = subparsers.choices[command.name]
+    command_parser.add_argument(
+        "-h", "--help",
+        action = "help",
+        help = "show this help message and exit",
     )
-    
-    report_cmd = subparsers.add_parser(
-        "report",
-        help = "examine and report an mlox rule file",
-        description = """
-The report command will look at an mlox-formatted file and give you warnings and stats:
-
-- (info) whether the file has a header
-- (info) number of mod sections found
-- (info) whether the mod sections are sorted alphabetically
-- (warning) number, names, and line numbers of mod sections with the same name
-
-If the --sections option is specified, the sections in the file will be printed in the order they appear.
-""",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
-    report_cmd.add_argument(
-        "mlox_file",
-        help = "rule file to examine"
-    )
-    report_cmd.add_argument(
-        "-s", "--sections",
-        action = 'store_true',
-        help = "print file sections in the order they appear"
-    )
-
+    commands.load(command.module_name).add_arguments(command_parser)
     args = parser.parse_args(args)
     return args
 
@@ -493,7 +478,11 @@ def main(args):
     args = parse_args(args)
     setup_logging(args.loglevel)
     rule_mgr = MloxRuleManager(args)
-    rule_mgr.run()
+    try:
+        rule_mgr.run()
+    finally:
+        if args.profile:
+            rule_mgr.profiler.emit(args.profile, sys.stderr)
 
 
 def run():
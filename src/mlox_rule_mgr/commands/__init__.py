@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Subcommands of mlox_rule_mgr, one module each.
+
+Only this registry is imported at startup. A subcommand's module, and the
+modules it needs (numpy, process pools, similarity indexes and so on), are
+imported when that subcommand is chosen, or when one of its methods is first
+called on a MloxRuleManager. Each module has an add_arguments(parser)
+function adding its arguments to its subparser, and functions taking the
+MloxRuleManager as their first argument, which MloxRuleManager dispatches
+to as methods.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import collections
+import importlib
+import logging
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+Command = collections.namedtuple("Command", ("name", "module_name", "help", "methods"))
+
+COMMANDS = (
+    Command(
+        "merge", "merge", "merge mlox rule files",
+        ("merge", "merge_1", "merge_sorted", "merge_report", "merge_incremental"),
+    ),
+    Command("split", "split", "split an mlox rule file", ("split", "split_1", "split_2")),
+    Command("watch", "watch", "keep a merged file or a split directory up to date", ("watch",)),
+    Command(
+        "report", "report", "examine and report an mlox rule file",
+        ("report", "report_records", "print_report", "report_document"),
+    ),
+    Command("index", "index", "write a section index for an mlox rule file", ("index", "load_section_index")),
+    Command("show", "show", "print a section of an mlox rule file", ("show",)),
+    Command(
+        "who-mentions", "who_mentions", "list the rules that mention a plugin",
+        ("who_mentions", "load_plugin_index"),
+    ),
+    Command(
+        "sort-load-order", "sort_load_order", "sort a load order by the ordering rules of mlox rule files",
+        ("sort_load_order", "parse_rulefiles"),
+    ),
+    Command(
+        "evaluate", "evaluate", "evaluate conflict, requires and patch rules over many load orders",
+        ("evaluate",),
+    ),
+)
+
+COMMANDS_BY_NAME = {command.name: command for command in COMMANDS}
+
+# Method name -> name of the module defining it.
+METHOD_MODULES = {
+    method: command.module_name
+    for command in COMMANDS
+    for method in command.methods
+}
+
+
+def load(module_name):
+    """Imports and returns the module of a subcommand."""
+    return importlib.import_module(f"{__name__}.{module_name}")
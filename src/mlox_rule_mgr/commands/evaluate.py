@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+The evaluate subcommand: fires the [Conflict], [Requires] and [Patch]
+rules of a rule file over many load orders. Imports numpy only when run.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import logging
+import sys
+
+from mlox_rule_mgr import loadorder
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.description = """
+The evaluate command finds which [Conflict], [Requires] and [Patch] rules of a rule
+file fire for each of many load orders, and prints how many load orders each rule
+fires for. Load orders are files listing plugins, one per line. [SIZE], [VER] and
+[DESC] expressions only check that their plugin is present. Needs numpy.
+"""
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "mlox_file",
+        help = "rule file to evaluate"
+    )
+    parser.add_argument(
+        "load_orders",
+        nargs = "+", help = "load order files (glob patterns and directories of .txt files allowed)"
+    )
+    parser.add_argument(
+        "-p", "--per-load-order",
+        action = "store_true",
+        help = "also list the rules firing for each load order"
+    )
+
+
+def evaluate(rule_mgr):
+    """
+    usage: evaluate [-h] [-p] mlox_file load_orders [load_orders ...]
+
+    positional arguments:
+      mlox_file             rule file to evaluate
+      load_orders           load order files, one plugin per line (glob
+                            patterns and directories of .txt files allowed)
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      -p, --per-load-order  also list the rules firing for each load order
+
+    Evaluates the [Conflict], [Requires] and [Patch] rules of mlox_file
+    for every load order at once, and prints how many load orders each
+    rule fires for. Needs numpy.
+
+    Returns
+    -------
+    None.
+
+    """
+    try:
+        from mlox_rule_mgr import evaluation
+    except ImportError as e:
+        # Fail, so that scripts and CI jobs running the evaluation notice.
+        _logger.error(f"evaluate needs numpy (pip install mlox_rule_mgr[evaluate]): {e}")
+        sys.exit(1)
+
+    load_order_names = rule_mgr.expand_rulefile_names(rule_mgr.args.load_orders)
+    load_orders = [loadorder.read_plugin_list(name) for name in load_order_names]
+    rule_list, _ = rule_mgr.parse_rulefiles([rule_mgr.args.mlox_file])
+    evaluated_rules, hits = evaluation.evaluate_rules(rule_list, load_orders)
+    rule_hits = hits.sum(axis = 0)
+
+    nloadorders = len(load_orders)
+    nrules = len(evaluated_rules)
+    fired = [column for column in range(nrules) if rule_hits[column] > 0]
+    nfired = len(fired)
+    print("evaluate report:")
+    print(f"\t{nloadorders} Load Order{(nloadorders != 1) and 's' or ''}")
+    print(f"\t{nrules} Conflict/Requires/Patch Rule{(nrules != 1) and 's' or ''}")
+    print(f"\t{nfired} Rule{(nfired != 1) and 's' or ''} Fired{nfired and ':' or ''}")
+    for column in fired:
+        rule = evaluated_rules[column]
+        nhits = rule_hits[column]
+        print(f"\t\t{rule.section}: line {rule.line_number} [{rule.kind}]: {nhits} load order{(nhits != 1) and 's' or ''}")
+
+    if rule_mgr.args.per_load_order:
+        print("\n\tLoad Orders:")
+        for row, name in enumerate(load_order_names):
+            columns = hits[row].nonzero()[0]
+            locations = ", ".join(f"line {evaluated_rules[column].line_number}" for column in columns)
+            print(f"\t\t{name}: {len(columns)} rule{(len(columns) != 1) and 's' or ''}{locations and ': ' or ''}{locations}")
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+The index subcommand, and the section indexes that show reads.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import logging
+import os
+
+from mlox_rule_mgr import index as indexing
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "mlox_file",
+        help = "rule file to index"
+    )
+    parser.add_argument(
+        "-i", "--index-file",
+        help = "index file (default: mlox_file.idx)"
+    )
+
+
+def index(rule_mgr):
+    """
+    usage: index [-h] [-i INDEX_FILE] mlox_file
+
+    positional arguments:
+      mlox_file             rule file to index
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      -i INDEX_FILE, --index-file INDEX_FILE
+                            index file (default: mlox_file.idx)
+
+    Returns
+    -------
+    None.
+
+    """
+    rulefile_name = os.path.realpath(rule_mgr.args.mlox_file)
+    section_index = rule_mgr.load_section_index(rulefile_name, rule_mgr.args.index_file, rebuild = True)
+    _logger.info(f"indexed {len(section_index)} sections of '{rule_mgr.args.mlox_file}'")
+
+
+def load_section_index(rule_mgr, rulefile_name, index_name = None, rebuild = False):
+    """
+    Returns the section index of a rule file, reading its sidecar index
+    file if it is up to date, and (re)building and saving it otherwise.
+
+    Parameters
+    ----------
+    rulefile_name : string
+        path of the rule file.
+    index_name : string, optional
+        path of the index file; defaults to rulefile_name + ".idx".
+    rebuild : bool, optional
+        rebuild the index even if it is up to date.
+
+    Returns
+    -------
+    section_index : indexing.SectionIndex
+        section index of the rule file.
+
+    """
+    if index_name is None:
+        index_name = indexing.default_index_path(rulefile_name)
+    if not rebuild:
+        section_index = indexing.SectionIndex.read(index_name)
+        if section_index is not None and section_index.is_current(rulefile_name):
+            return section_index
+    _logger.debug(f"building section index '{index_name}'")
+    source = indexing.source_signature(rulefile_name)
+    with rule_mgr.section_table_factory(rulefile_name) as table:
+        section_index = indexing.SectionIndex.from_table(table, source)
+    try:
+        section_index.write(index_name)
+    except OSError as e:
+        _logger.warning(f"cannot write section index '{index_name}': {e}")
+    return section_index
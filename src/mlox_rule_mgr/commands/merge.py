@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+The merge subcommand: plain, sorted, incremental, and --report merges.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+
+from mlox_rule_mgr import cli, manifest, sections
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "base_mlox_file",
+        help = "target file to merge subsequent mlox rule files into"
+    )
+    parser.add_argument(
+        "mlox_files",
+        nargs = "+", help = "rule files to merge"
+    )
+    parser.add_argument(
+        "-s", "--sorted",
+        action = "store_true",
+        help = "merge sections in alphabetical order, keeping headers at the top"
+    )
+    parser.add_argument(
+        "-r", "--report",
+        action = "store_true",
+        help = "report duplicate section names and misplaced headers instead of merging"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type = int,
+        default = 1,
+        help = "number of processes parsing rule files (default: 1; 0: one per CPU)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action = "store_true",
+        help = "only re-read rule files that changed since the last incremental merge"
+    )
+
+
+def merge(rule_mgr):
+    if rule_mgr.args.report:
+        return rule_mgr.merge_report()
+    if rule_mgr.args.sorted:
+        if getattr(rule_mgr.args, "incremental", False):
+            _logger.warning("--incremental only applies to unsorted merges; ignoring it")
+        return rule_mgr.merge_sorted()
+    if getattr(rule_mgr.args, "incremental", False):
+        return rule_mgr.merge_incremental()
+    return rule_mgr.merge_1()
+
+
+def merge_1(rule_mgr):
+    """
+    usage: merge [-h] base_mlox_file mlox_files [mlox_files ...]
+
+    positional arguments:
+      base_mlox_file    target file to merge subsequent mlox rule files into
+      mlox_files   rule files to merge
+
+    Returns
+    -------
+    None.
+
+    """
+    basefile_name = rule_mgr.args.base_mlox_file
+    rulefile_names = rule_mgr.args.mlox_files
+    _logger.debug(f"base_mlox_file: {basefile_name}, mlox_files: {rulefile_names}")
+
+    sorted_rulefile_names = rule_mgr.expand_rulefile_names(rulefile_names)
+
+    profiler = rule_mgr.profiler
+    with open(basefile_name, "w", encoding="utf-8") as out_f:
+        for rulefile_name in sorted_rulefile_names:
+            _logger.info(f"reading rulefile '{rulefile_name}'")
+            with profiler.phase("read"), open(rulefile_name, "r", encoding="utf-8") as in_f:
+                lines = in_f.readlines()
+                if profiler.enabled:
+                    profiler.count("files_opened")
+                    profiler.count("lines", len(lines))
+                    profiler.count("bytes_read", os.fstat(in_f.fileno()).st_size)
+            with profiler.phase("coalesce"):
+                text = cli.coalesce_lines(lines)
+            with profiler.phase("write"):
+                out_f.write(text)
+                out_f.write(os.linesep)
+    if profiler.enabled:
+        profiler.count("files_written")
+        profiler.count("bytes_written", os.path.getsize(basefile_name))
+
+
+def merge_sorted(rule_mgr):
+    """
+    usage: merge --sorted [-h] base_mlox_file mlox_files [mlox_files ...]
+
+    Merges the sections of all rule files into base_mlox_file in
+    alphabetical order of section name. The headers of the rule files are
+    kept at the top, in file order. Sections of a rule file that is not
+    already sorted are sorted first; sections with the same name keep the
+    order of their files.
+
+    Section text is streamed from memory maps of the rule files, one
+    section at a time. The section tables of all rule files are held for
+    the whole merge, though, as they come from the cache or from --jobs
+    scanning processes, along with a sorted list of the sections of each
+    rule file that is not sorted. So memory grows with the total number
+    of sections, at a few hundred bytes per section (mostly their names),
+    rather than with the number of rule files times the largest section.
+
+    Returns
+    -------
+    None.
+
+    """
+    basefile_name = rule_mgr.args.base_mlox_file
+    rulefile_names = rule_mgr.expand_rulefile_names(rule_mgr.args.mlox_files)
+    _logger.debug(f"base_mlox_file: {basefile_name}, mlox_files: {rulefile_names}")
+
+    separator = os.linesep.encode("utf-8")
+    # Write to a temporary file first, since base_mlox_file might also be
+    # one of the (memory-mapped) rule files.
+    tmp_name = f"{basefile_name}.{os.getpid()}.tmp"
+    try:
+        for rulefile_name in rulefile_names:
+            _logger.info(f"reading rulefile '{rulefile_name}'")
+        with contextlib.ExitStack() as stack:
+            with rule_mgr.profiler.phase("scan"):
+                tables = stack.enter_context(rule_mgr.open_section_tables(rulefile_names, rule_mgr.args.jobs))
+            out_f = stack.enter_context(open(tmp_name, "wb"))
+            stack.enter_context(rule_mgr.profiler.phase("write"))
+            chunks_written = 0
+            def write_section(table, section):
+                nonlocal chunks_written
+                if chunks_written:
+                    out_f.write(separator)
+                out_f.writelines(sections.text_output_chunks(table.buf, section.start, section.end))
+                chunks_written += 1
+
+            for table in tables:
+                if len(table.header):
+                    write_section(table, table.header)
+
+            streams = list()
+            for table_num, (rulefile_name, table) in enumerate(zip(rulefile_names, tables)):
+                mod_sections = table.sections[1:]
+                if not sections.is_sorted(mod_sections):
+                    _logger.info(f"sorting sections of rulefile '{rulefile_name}'")
+                    mod_sections = sorted(mod_sections, key = sections.section_sort_key)
+                streams.append(zip(itertools.repeat(table_num), mod_sections))
+
+            merged = heapq.merge(*streams, key = lambda entry: (entry[1].name, entry[0]))
+            for table_num, section in merged:
+                write_section(tables[table_num], section)
+
+            if rule_mgr.profiler.enabled:
+                rule_mgr.profiler.count("files_opened", len(tables))
+                rule_mgr.profiler.count("sections", sum(len(table.sections) - 1 for table in tables))
+                rule_mgr.profiler.count("bytes_read", sum(len(table.buf) for table in tables))
+                rule_mgr.profiler.count("files_written")
+                rule_mgr.profiler.count("bytes_written", out_f.tell())
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_name)
+        raise
+    os.replace(tmp_name, basefile_name)
+
+
+def merge_report(rule_mgr):
+    """
+    usage: merge --report [--sorted] [-h] base_mlox_file mlox_files [mlox_files ...]
+
+    Reports what merging the rule files would do, without writing
+    base_mlox_file:
+    - number of rule files and mod sections
+    - names and locations of sections with the same name, across all files
+    - headers that would end up inside the sections of another file
+      (without --sorted, every header but the first)
+
+    Only section names and locations are looked at; section text is never
+    read into memory.
+
+    Returns
+    -------
+    None.
+
+    """
+    rulefile_names = rule_mgr.expand_rulefile_names(rule_mgr.args.mlox_files)
+    _logger.debug(f"mlox_files: {rulefile_names}")
+
+    num_sections = 0
+    locations_by_name = dict()
+    misplaced_headers = list()
+    with rule_mgr.open_section_tables(rulefile_names, rule_mgr.args.jobs) as tables:
+        for rulefile_name, table in zip(rulefile_names, tables):
+            header = table.header
+            mod_sections = table.sections[1:]
+            if len(header) and num_sections and not rule_mgr.args.sorted:
+                last_line = mod_sections[0].start_line - 1 if mod_sections else "end"
+                misplaced_headers.append((rulefile_name, header.start_line, last_line))
+            for section in mod_sections:
+                locations_by_name.setdefault(section.name, list()).append((rulefile_name, section.name_line))
+            num_sections += len(mod_sections)
+    duplicate_sections = {
+        name: locations
+        for name, locations in locations_by_name.items()
+        if len(locations) > 1
+    }
+
+    nfiles = len(rulefile_names)
+    print("merge report:")
+    print(f"\t{nfiles} Rule File{(nfiles != 1) and 's' or ''}")
+    print(f"\t{num_sections} Mod Section{(num_sections != 1) and 's' or ''}")
+
+    ndups = len(duplicate_sections)
+    if (ndups == 0):
+        print("\t0 Duplicate Section Names")
+    else:
+        print(f"\t{ndups} Duplicate Section Name{(ndups != 1) and 's' or ''}:")
+        for name, locations in duplicate_sections.items():
+            location_list = ", ".join(f"{rulefile_name} line {line_num}" for rulefile_name, line_num in locations)
+            print(f"\t\t{name}: {location_list}")
+
+    nmisplaced = len(misplaced_headers)
+    if (nmisplaced == 0):
+        print("\t0 Misplaced Headers")
+    else:
+        print(f"\t{nmisplaced} Misplaced Header{(nmisplaced != 1) and 's' or ''}:")
+        for rulefile_name, first_line, last_line in misplaced_headers:
+            print(f"\t\t{rulefile_name}: lines {first_line}-{last_line}")
+
+
+def merge_incremental(rule_mgr, merged_output = None):
+    """
+    usage: merge --incremental [-h] base_mlox_file mlox_files [mlox_files ...]
+
+    Same output as merge_1, but keeps a manifest next to base_mlox_file
+    (base_mlox_file.manifest.json) of the rule files merged and where
+    each went in the output. On the next merge, only rule files that
+    changed since are read; the rest are copied over from the previous
+    output.
+
+    Parameters
+    ----------
+    merged_output : manifest.MergedOutput, optional
+        state of the previous build, to reuse instead of reading the
+        manifest file.
+
+    Returns
+    -------
+    merged_output : manifest.MergedOutput
+        state of this build.
+
+    """
+    basefile_name = rule_mgr.args.base_mlox_file
+    # base_mlox_file may match a pattern, but is never merged into itself.
+    rulefile_names = [
+        rulefile_name for rulefile_name in rule_mgr.expand_rulefile_names(rule_mgr.args.mlox_files)
+        if os.path.abspath(rulefile_name) != os.path.abspath(basefile_name)
+    ]
+    _logger.debug(f"base_mlox_file: {basefile_name}, mlox_files: {rulefile_names}")
+
+    if merged_output is None:
+        merged_output = manifest.MergedOutput(basefile_name)
+    merged_output.rebuild(rulefile_names, cli.merged_segment)
+    print(f"merge: {merged_output.summary()}")
+    return merged_output
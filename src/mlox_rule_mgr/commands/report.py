@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""
+The report subcommand: facts and warnings about one or many rule files, as
+text, JSON or NDJSON.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import logging
+import os
+import sys
+
+from mlox_rule_mgr import cli, loadorder, parallel, rules, sections, similarity
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+class ReportTotals(object):
+    """
+    Totals over the reports of several rule files.
+
+    Attributes
+    ----------
+    num_files, num_sections : int
+        numbers of rule files and mod sections seen.
+    files_with_duplicates : list of strings
+        rule files with duplicate section names.
+    unsorted_files : list of strings
+        rule files whose sections are not in alphabetical order.
+
+    """
+    def __init__(self):
+        self.num_files = 0
+        self.num_sections = 0
+        self.files_with_duplicates = list()
+        self.unsorted_files = list()
+        # Section name -> [(rule file, line number)].
+        self._locations = dict()
+
+    def observe(self, rulefile_label, records):
+        """Passes on the report records of a rule file, adding them up."""
+        self.num_files += 1
+        for record in records:
+            record_type = record["type"]
+            if record_type == "section":
+                self._locations.setdefault(record["name"], list()).append((rulefile_label, record["line_number"]))
+            elif record_type == "summary":
+                self.num_sections += record["num_sections"]
+                if record["sorted"] is False:
+                    self.unsorted_files.append(rulefile_label)
+            elif record_type == "duplicate_name":
+                if rulefile_label not in self.files_with_duplicates[-1:]:
+                    self.files_with_duplicates.append(rulefile_label)
+            yield record
+
+    def cross_file_duplicates(self):
+        """
+        Returns {section name: [(rule file, line number)]} for the section
+        names found in more than one rule file.
+        """
+        return {
+            name: locations
+            for name, locations in self._locations.items()
+            if len({rulefile_label for rulefile_label, _ in locations}) > 1
+        }
+
+    def as_record(self):
+        return {
+            "type": "aggregate",
+            "num_files": self.num_files,
+            "num_sections": self.num_sections,
+            "files_with_duplicates": self.files_with_duplicates,
+            "unsorted_files": self.unsorted_files,
+            "cross_file_duplicates": [
+                {
+                    "name": name,
+                    "locations": [
+                        {"file": rulefile_label, "line_number": line_number}
+                        for rulefile_label, line_number in locations
+                    ],
+                }
+                for name, locations in self.cross_file_duplicates().items()
+            ],
+        }
+
+    def print_summary(self):
+        print("report summary:")
+        print(f"\t{self.num_files} Rule File{(self.num_files != 1) and 's' or ''}")
+        print(f"\t{self.num_sections} Mod Section{(self.num_sections != 1) and 's' or ''}")
+        nfiles = len(self.files_with_duplicates)
+        print(f"\t{nfiles} File{(nfiles != 1) and 's' or ''} With Duplicate Section Names{nfiles and ':' or ''}")
+        for rulefile_label in self.files_with_duplicates:
+            print(f"\t\t{rulefile_label}")
+        nfiles = len(self.unsorted_files)
+        print(f"\t{nfiles} Unsorted File{(nfiles != 1) and 's' or ''}{nfiles and ':' or ''}")
+        for rulefile_label in self.unsorted_files:
+            print(f"\t\t{rulefile_label}")
+        cross_file_duplicates = self.cross_file_duplicates()
+        ndups = len(cross_file_duplicates)
+        print(f"\t{ndups} Duplicate Section Name{(ndups != 1) and 's' or ''} Across Files{ndups and ':' or ''}")
+        for name, locations in cross_file_duplicates.items():
+            location_list = ", ".join(f"{rulefile_label} line {line_number}" for rulefile_label, line_number in locations)
+            print(f"\t\t{name}: {location_list}")
+
+
+def report_rulefile(args, rulefile_name):
+    """
+    Returns the report records of a rule file as a list; run by the worker
+    processes of a report on several rule files.
+    """
+    return list(cli.MloxRuleManager(args).report_records(rulefile_name))
+
+
+def name_distance(text):
+    """Parses a --name-distance value: a number of edits, at least 0."""
+    distance = int(text)
+    if distance < 0:
+        raise argparse.ArgumentTypeError(f"must be at least 0, not {distance}")
+    return distance
+
+
+def add_arguments(parser):
+    parser.description = """
+The report command will look at an mlox-formatted file and give you warnings and stats:
+
+- (info) whether the file has a header
+- (info) number of mod sections found
+- (info) whether the mod sections are sorted alphabetically
+- (warning) number, names, and line numbers of mod sections with the same name
+- (warning) sections with the same rules, whatever their names
+
+Slower checks, for occasional use rather than every commit, are chosen with options:
+
+- (warning) --similar-names: mod section names differing only in case and spacing, or by a few edits
+- (warning) --order-cycles: groups of plugins whose [Order] rules contradict each other, with the
+  sections and line numbers of those rules
+- (warning) --similar-bodies: sections with nearly the same rules, whatever their names
+
+If the --sections option is specified, the sections in the file will be printed in the order they appear.
+
+With --format json, the same facts, and the list of sections, are printed as one JSON object. With
+--format ndjson, they are printed as one JSON record per line: a "file" record, a "header" record, a
+"section" record for each section as the file is scanned, a "summary" record, then one record per finding.
+
+Several rule files (or glob patterns) can be examined at once, in --jobs worker processes. Their reports
+are printed in alphabetical order of file name, followed by a summary: total sections, files with
+duplicate section names, unsorted files, and section names found in more than one file.
+"""
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "mlox_files",
+        nargs = "+",
+        help = "rule files (or glob patterns) to examine"
+    )
+    parser.add_argument(
+        "-s", "--sections",
+        action = 'store_true',
+        help = "print file sections in the order they appear"
+    )
+    parser.add_argument(
+        "--similar-names",
+        action = 'store_true',
+        help = "report section names that look like misspellings of each other"
+    )
+    parser.add_argument(
+        "--name-distance",
+        type = name_distance,
+        default = similarity.DEFAULT_NAME_DISTANCE,
+        metavar = "N",
+        help = f"largest number of edits between section names reported as similar (default: {similarity.DEFAULT_NAME_DISTANCE})"
+    )
+    parser.add_argument(
+        "--order-cycles",
+        action = 'store_true',
+        help = "parse the rules, and report [Order] rules that contradict each other"
+    )
+    parser.add_argument(
+        "--similar-bodies",
+        action = 'store_true',
+        help = "report sections with nearly the same rules"
+    )
+    parser.add_argument(
+        "-f", "--format",
+        choices = ("text", "json", "ndjson"),
+        default = "text",
+        help = "print the report as text (default), as one JSON object, or as one JSON record per line,"
+        " streamed as the file is scanned"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type = int,
+        default = 1,
+        help = "number of processes examining rule files (default: 1; 0: one per CPU)"
+    )
+
+
+def report(rule_mgr):
+    """
+    report [-h] [-s] [--similar-names] [--name-distance N] [--order-cycles] [--similar-bodies]
+           [-f {text,json,ndjson}] [-j JOBS] mlox_files [mlox_files ...]
+
+    positional arguments:
+      mlox_files         rule files (or glob patterns) to examine
+
+    optional arguments:
+      -h, --help         show this help message and exit
+      -s, --sections     print file sections in the order they appear
+      --similar-names    report section names that look like
+                         misspellings of each other
+      --name-distance N  largest number of edits between section names
+                         reported as similar (default: 2)
+      --order-cycles     parse the rules, and report [Order] rules that
+                         contradict each other
+      --similar-bodies   report sections with nearly the same rules
+      -f {text,json,ndjson}, --format {text,json,ndjson}
+                         print the report as text, as one JSON object,
+                         or as one JSON record per line, streamed as the
+                         file is scanned; JSON output always lists the
+                         sections
+      -j JOBS, --jobs JOBS
+                         number of processes examining rule files
+                         (default: 1; 0: one per CPU)
+
+    With more than one rule file, the reports of the files are followed
+    by a summary: total sections, files with duplicate section names,
+    unsorted files, and section names found in more than one file.
+
+    Returns
+    -------
+    None.
+
+    """
+    try:
+        rulefile_names = rule_mgr.expand_rulefile_names(rule_mgr.args.mlox_files, strict = True)
+    except FileNotFoundError as e:
+        # Fail, so that scripts and hooks running the report notice.
+        _logger.error(f"no rule files match '{e.filename}'")
+        sys.exit(1)
+    report_format = getattr(rule_mgr.args, "format", "text")
+    jobs = parallel.resolve_jobs(getattr(rule_mgr.args, "jobs", 1))
+    if jobs > 1 and len(rulefile_names) > 1:
+        record_lists = parallel.map_rulefiles(
+            functools.partial(report_rulefile, rule_mgr.args),
+            [os.path.realpath(rulefile_name) for rulefile_name in rulefile_names],
+            jobs,
+        )
+    else:
+        record_lists = (
+            rule_mgr.report_records(os.path.realpath(rulefile_name), stream = (report_format == "ndjson"))
+            for rulefile_name in rulefile_names
+        )
+
+    totals = ReportTotals() if len(rulefile_names) > 1 else None
+    documents = list()
+    for file_num, (rulefile_name, records) in enumerate(zip(rulefile_names, record_lists)):
+        records = iter(records)
+        if totals is not None:
+            records = totals.observe(rulefile_name, records)
+        if report_format == "ndjson":
+            print(json.dumps({"type": "file", "file": rulefile_name}))
+            for record in records:
+                print(json.dumps(record))
+        elif report_format == "json":
+            documents.append(rule_mgr.report_document(rulefile_name, records))
+        else:
+            if file_num:
+                print()
+            rule_mgr.print_report(rulefile_name, records)
+
+    if report_format == "ndjson":
+        if totals is not None:
+            print(json.dumps(totals.as_record()))
+    elif report_format == "json":
+        if totals is None:
+            print(json.dumps(documents[0]))
+        else:
+            summary = totals.as_record()
+            del summary["type"]
+            print(json.dumps({"files": documents, "summary": summary}))
+    elif totals is not None:
+        print()
+        totals.print_summary()
+
+
+def report_records(rule_mgr, rulefile_name, stream = False):
+    """
+    Examines a rule file, generating the facts reported by `report` as
+    records: dicts with a "type" entry and the facts of that type.
+
+    Records come in this order: one "header" record, one "section"
+    record per mod section, one "summary" record, then any
+    "duplicate_name", "similar_names", "order_cycle", "duplicate_bodies"
+    and "similar_bodies" records. The "similar_names", "order_cycle"
+    and "similar_bodies" records take far longer to find than the others,
+    and are only generated with the --similar-names, --order-cycles and
+    --similar-bodies options.
+
+    Parameters
+    ----------
+    rulefile_name : string
+        path of the rule file.
+    stream : bool, optional
+        generate header and section records as the file is scanned,
+        instead of from its (possibly cached) section table.
+
+    Yields
+    ------
+    record : dict
+        facts of one kind.
+
+    """
+    with contextlib.ExitStack() as stack:
+        if stream:
+            buf = stack.enter_context(sections.mapped_file(rulefile_name))
+            section_iter = sections.iter_sections(buf)
+        else:
+            table = stack.enter_context(rule_mgr.section_table_factory(rulefile_name))
+            buf, section_iter = table.buf, iter(table.sections)
+
+        header = next(section_iter)
+        section_list = [header]
+        yield {"type": "header", "present": len(header) > 0}
+
+        # Group sections by name to find duplicate names.
+        sections_by_name = dict()
+        for section in section_iter:
+            section_list.append(section)
+            sections_by_name.setdefault(section.name, list()).append(section)
+            yield {
+                "type": "section",
+                "name": section.name,
+                "mod_name": section.mod_name,
+                "author": section.author,
+                "line_number": section.name_line,
+            }
+        table = sections.SectionTable(buf, section_list)
+        mod_sections = table.sections[1:]
+        num_sections = len(mod_sections)
+
+        # Check whether sections appear in rulefile in lexical order.
+        yield {
+            "type": "summary",
+            "num_sections": num_sections,
+            "sorted": sections.is_sorted(mod_sections) if num_sections else None,
+        }
+        if (num_sections == 0):
+            return
+
+        def located(section):
+            return {"name": section.name, "line_number": section.name_line}
+
+        # Locations of sections with duplicated names.
+        for name, versions in sections_by_name.items():
+            if len(versions) > 1:
+                _logger.debug(f"report: duplicate_section: name {name}, versions {versions}")
+                yield {
+                    "type": "duplicate_name",
+                    "name": name,
+                    "line_numbers": [version.name_line for version in versions],
+                }
+
+        # Names that look like misspellings of each other.
+        if rule_mgr.args.similar_names:
+            names = list(sections_by_name)
+            for distance, i, j in similarity.similar_names(names, rule_mgr.args.name_distance):
+                yield {
+                    "type": "similar_names",
+                    "sections": [located(sections_by_name[names[i]][0]), located(sections_by_name[names[j]][0])],
+                    "distance": distance,
+                }
+
+        # Each section is decoded once, for both its rules and its body.
+        texts = [table.text(section) for section in table.sections]
+
+        # Contradictory [Order] rules.
+        if rule_mgr.args.order_cycles:
+            rule_list, _ = rules.parse_rules(table, texts)
+            for plugins, edges in loadorder.LoadOrderGraph.from_rules(rule_list).cycles():
+                yield {
+                    "type": "order_cycle",
+                    "plugins": plugins,
+                    "rules": [
+                        {"section": rule.section, "line_number": rule.line_number, "before": source, "after": target}
+                        for source, target, rule in edges
+                    ],
+                }
+
+        # Sections with the same, or nearly the same, rules.
+        bodies = [similarity.normalized_body(text) for text in texts[1:]]
+        for group in similarity.exact_duplicates(bodies):
+            yield {"type": "duplicate_bodies", "sections": [located(mod_sections[i]) for i in group]}
+        if not rule_mgr.args.similar_bodies:
+            return
+        for i, j, ratio in similarity.near_duplicates(bodies):
+            yield {
+                "type": "similar_bodies",
+                "sections": [located(mod_sections[i]), located(mod_sections[j])],
+                "similarity": ratio,
+            }
+
+
+def print_report(rule_mgr, rulefile_label, records):
+    """Prints the records of report_records as a human-readable report."""
+    header = next(records)
+    section_names = list()
+    findings = dict()
+    for record in records:
+        if record["type"] == "section":
+            section_names.append(record["name"])
+        elif record["type"] == "summary":
+            summary = record
+        else:
+            findings.setdefault(record["type"], list()).append(record)
+    num_sections = summary["num_sections"]
+
+    if (not header["present"]) and (num_sections == 0):
+        print(f"{rulefile_label} is empty.")
+        return
+
+    print(f"{rulefile_label} report:")
+    print(f"\tHeader: {header['present'] and 'Yes' or 'No'}")
+    print(f"\t{num_sections} Mod Section{(num_sections != 1) and 's' or ''}")
+
+    if (num_sections == 0):
+        return            
+
+    print(f"\tSections Sorted: {summary['sorted'] and 'Yes' or 'No'}")
+
+    def location(section):
+        return f"{section['name']} line {section['line_number']}"
+
+    # List locations of sections with duplicated names.
+    duplicate_names = findings.get("duplicate_name", [])
+    ndups = len(duplicate_names)
+    if (ndups == 0):
+        print("\t0 Duplicate Section Names")
+    else:
+        print(f"\t{ndups} Duplicate Section Name{(ndups != 1) and 's' or ''}:")
+        for record in duplicate_names:
+            line_number_list = ", ".join(f"line {line_number}" for line_number in record["line_numbers"])
+            print(f"\t\t{record['name']}: {line_number_list}")
+
+    # List names that look like misspellings of each other, if any.
+    similar_names = findings.get("similar_names", [])
+    nsimnames = len(similar_names)
+    if nsimnames > 0:
+        print(f"\t{nsimnames} Similar Section Name{(nsimnames != 1) and 's' or ''}:")
+        for record in similar_names:
+            distance = record["distance"]
+            difference = (distance == 0) and "case or spacing" or f"{distance} edit{(distance != 1) and 's' or ''}"
+            first, second = record["sections"]
+            print(f"\t\t{location(first)}, {location(second)}: {difference}")
+
+    # List contradictory [Order] rules, if any.
+    cycles = findings.get("order_cycle", [])
+    ncycles = len(cycles)
+    if ncycles > 0:
+        print(f"\t{ncycles} Order Cycle{(ncycles != 1) and 's' or ''}:")
+        for record in cycles:
+            print(f"\t\t{', '.join(record['plugins'])}:")
+            for rule in record["rules"]:
+                print(f"\t\t\t{rule['section']}: line {rule['line_number']}: {rule['before']} before {rule['after']}")
+
+    # List sections with the same, or nearly the same, rules, if any.
+    duplicate_bodies = findings.get("duplicate_bodies", [])
+    ndupbodies = len(duplicate_bodies)
+    if ndupbodies > 0:
+        print(f"\t{ndupbodies} Duplicate Section Bod{(ndupbodies != 1) and 'ies' or 'y'}:")
+        for record in duplicate_bodies:
+            print("\t\t" + ", ".join(location(section) for section in record["sections"]))
+    similar_bodies = findings.get("similar_bodies", [])
+    nsimilar = len(similar_bodies)
+    if nsimilar > 0:
+        print(f"\t{nsimilar} Similar Section Pair{(nsimilar != 1) and 's' or ''}:")
+        for record in similar_bodies:
+            first, second = record["sections"]
+            print(f"\t\t{location(first)}, {location(second)}: {record['similarity']:.0%} similar")
+
+    # List names and line numbers of all sections found.
+    if rule_mgr.args.sections:
+        print("\n\tSections found:")
+        for name in section_names:
+            print(f"\t\t{name}")
+
+
+def report_document(rule_mgr, rulefile_label, records):
+    """Collects the records of report_records into one JSON-ready dict."""
+    document = {"file": rulefile_label, "header": None, "num_sections": None, "sorted": None}
+    lists = {
+        "duplicate_name": "duplicate_names",
+        "similar_names": "similar_names",
+        "order_cycle": "order_cycles",
+        "duplicate_bodies": "duplicate_bodies",
+        "similar_bodies": "similar_bodies",
+        "section": "sections",
+    }
+    for key in lists.values():
+        document[key] = list()
+    for record in records:
+        record_type = record.pop("type")
+        if record_type == "header":
+            document["header"] = record["present"]
+        elif record_type == "summary":
+            document.update(record)
+        else:
+            document[lists[record_type]].append(record)
+    return document
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+The show subcommand: prints sections looked up in a section index.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from mlox_rule_mgr import index
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.description = """
+The show command prints every section with the given name, looking it up in the
+section index of the rule file. The index is built or rebuilt if it is missing
+or out of date.
+"""
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "mlox_file",
+        help = "rule file containing the section"
+    )
+    parser.add_argument(
+        "section_name",
+        help = "section name, as in \"mod_name [author]\""
+    )
+    parser.add_argument(
+        "-i", "--index-file",
+        help = "index file (default: mlox_file.idx)"
+    )
+
+
+def show(rule_mgr):
+    """
+    usage: show [-h] [-i INDEX_FILE] mlox_file section_name
+
+    positional arguments:
+      mlox_file             rule file containing the section
+      section_name          section name, as in "mod_name [author]"
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      -i INDEX_FILE, --index-file INDEX_FILE
+                            index file (default: mlox_file.idx)
+
+    Returns
+    -------
+    None.
+
+    """
+    rulefile_name = os.path.realpath(rule_mgr.args.mlox_file)
+    section_index = rule_mgr.load_section_index(rulefile_name, rule_mgr.args.index_file)
+    entries = section_index.lookup(rule_mgr.args.section_name)
+    if not entries:
+        print(f"{rule_mgr.args.mlox_file} has no section named '{rule_mgr.args.section_name}'.")
+        return
+    for entry in entries:
+        sys.stdout.write(index.read_section(rulefile_name, entry))
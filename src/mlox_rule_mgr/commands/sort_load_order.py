@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+The sort-load-order subcommand: sorts a load order by the ordering rules
+of rule files.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import logging
+import sys
+
+from mlox_rule_mgr import loadorder, rules
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.description = """
+The sort-load-order command sorts a list of plugins so that they follow the
+[Order] rules of the rule files, with [NearStart] plugins as early and [NearEnd]
+plugins as late as possible. Otherwise plugins keep their order in the list.
+Cyclic [Order] rules are broken at the plugin that would otherwise come first.
+"""
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "plugin_list",
+        help = "file listing plugins in their current load order, one per line"
+    )
+    parser.add_argument(
+        "mlox_files",
+        nargs = "+", help = "rule files to apply"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help = "write the sorted load order to OUTPUT instead of stdout"
+    )
+
+
+def sort_load_order(rule_mgr):
+    """
+    usage: sort-load-order [-h] [-o OUTPUT] plugin_list mlox_files [mlox_files ...]
+
+    positional arguments:
+      plugin_list           file listing plugins in their current load order, one per line
+      mlox_files            rule files to apply
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      -o OUTPUT, --output OUTPUT
+                            write the sorted load order to OUTPUT instead of stdout
+
+    Sorts the plugins so that they satisfy the [Order] rules of the rule
+    files, with [NearStart] plugins as early and [NearEnd] plugins as late
+    as possible, and otherwise in their current order.
+
+    Returns
+    -------
+    None.
+
+    """
+    plugins = loadorder.read_plugin_list(rule_mgr.args.plugin_list)
+    rulefile_names = rule_mgr.expand_rulefile_names(rule_mgr.args.mlox_files)
+    rule_list, _ = rule_mgr.parse_rulefiles(rulefile_names)
+
+    graph = loadorder.LoadOrderGraph(plugins)
+    graph.add_rules(rule_list)
+    _logger.debug(f"{len(graph)} plugins, {graph.num_edges} ordering constraints")
+    order, broken = graph.sort()
+    for plugin in broken:
+        _logger.warning(f"cyclic order rules: loading '{plugin}' before plugins it should follow")
+
+    text = "".join(f"{plugin}\n" for plugin in order)
+    if rule_mgr.args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(rule_mgr.args.output, "w", encoding = "utf-8") as f:
+            f.write(text)
+
+
+def parse_rulefiles(rule_mgr, rulefile_names):
+    """
+    Parses the rules of several rule files with one parser, so plugin
+    names are shared between them.
+
+    Returns
+    -------
+    (rules, errors) : tuple
+        list of Rule of all rule files in order, and list of RuleError.
+
+    """
+    parser = rules.RuleParser()
+    rule_list = list()
+    for rulefile_name in rulefile_names:
+        _logger.info(f"reading rulefile '{rulefile_name}'")
+        with rule_mgr.section_table_factory(rulefile_name) as table:
+            rule_list.extend(parser.parse_table(table))
+    return rule_list, parser.errors
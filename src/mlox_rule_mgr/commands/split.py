@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+The split subcommand: writes each section of a rule file to its own file.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import contextlib
+import logging
+import os
+
+from mlox_rule_mgr import cli, manifest, sections, writer
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "mlox_file",
+        help = "rule file to split"
+    )
+    parser.add_argument(
+        "-d", "--directory",
+        help = "output directory"
+    )
+    parser.add_argument(
+        "-t", "--threads",
+        type = int,
+        default = writer.DEFAULT_THREADS,
+        help = f"number of threads writing section files (default: {writer.DEFAULT_THREADS})"
+    )
+    parser.add_argument(
+        "--fsync",
+        action = "store_true",
+        help = "fsync the output directory after writing all section files"
+    )
+    parser.add_argument(
+        "--incremental",
+        action = "store_true",
+        help = "only rewrite section files whose content changed, and remove files of deleted sections"
+    )
+
+
+def split(rule_mgr):
+    return rule_mgr.split_2()
+
+
+def split_1(rule_mgr):
+    """
+    usage: split [-h] [-d DIRECTORY] mlox_file
+
+    positional arguments:
+      mlox_file              rule file to split
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      -d DIRECTORY, --directory DIRECTORY
+                            output directory
+
+    Returns
+    -------
+    None.
+
+    """
+    rulefile_name = os.path.realpath(rule_mgr.args.mlox_file)
+    directory = rule_mgr.args.directory
+    if directory is None:
+        directory = os.path.dirname(os.path.realpath(rulefile_name))
+    if not os.path.exists(directory):
+        _logger.warn(f"specified output directory '{directory}' does not exist")
+        return
+
+    _logger.debug(f"rulefile: {rulefile_name}")
+
+    # Try to read rulefile.
+    profiler = rule_mgr.profiler
+    with open(rulefile_name, "r", encoding="utf-8") as in_f:
+        with profiler.phase("parse"):
+            sections = rule_mgr.parse_rulefile_1(in_f)
+        if profiler.enabled:
+            profiler.count("files_opened")
+            profiler.count("bytes_read", os.fstat(in_f.fileno()).st_size)
+            for section_versions in sections.values():
+                profiler.count("sections", len(section_versions))
+                profiler.count("lines", sum(len(section) for section in section_versions))
+
+        _logger.debug(f"output directory: {directory}")
+        for name, section_versions in sections.items():
+            sectionfile_name = os.path.join(directory, f"{name}.txt")
+            with open(sectionfile_name, "w", encoding="utf-8") as out_f:
+                for i, section in enumerate(section_versions):
+                    _logger.info(f"saving section '{name}' version {i}")
+                    with profiler.phase("coalesce"):
+                        text = cli.coalesce_lines(section)
+                    with profiler.phase("write"):
+                        out_f.write(text)
+                        out_f.write(os.linesep)
+                if profiler.enabled:
+                    profiler.count("files_written")
+                    profiler.count("bytes_written", out_f.tell())
+
+
+def split_2(rule_mgr, previous_files = None):
+    """
+    usage: split [-h] [-d DIRECTORY] [-t THREADS] [--fsync] [--incremental] mlox_file
+
+    Same as split_1, but finds section boundaries in a memory map of
+    mlox_file and writes each section file straight from the map, from a
+    pool of THREADS writer threads. With --fsync, the output directory is
+    fsynced once all files are written.
+
+    With --incremental, a manifest of content digests is kept in the
+    output directory; only section files whose content changed are
+    rewritten, and files of sections that no longer exist are removed.
+
+    Parameters
+    ----------
+    previous_files : dict, optional
+        with --incremental, manifest entries of the previous split, to
+        reuse instead of reading the manifest file.
+
+    Returns
+    -------
+    files : dict
+        with --incremental, manifest entries of this split; otherwise
+        None.
+
+    """
+    rulefile_name = os.path.realpath(rule_mgr.args.mlox_file)
+    directory = rule_mgr.args.directory
+    if directory is None:
+        directory = os.path.dirname(os.path.realpath(rulefile_name))
+    if not os.path.exists(directory):
+        _logger.warn(f"specified output directory '{directory}' does not exist")
+        return
+
+    _logger.debug(f"rulefile: {rulefile_name}")
+
+    # Try to read rulefile.
+    fsync_directory = directory if rule_mgr.args.fsync else None
+    output_manifest = None
+    if getattr(rule_mgr.args, "incremental", False):
+        output_manifest = manifest.OutputManifest(directory, previous = previous_files)
+    profiler = rule_mgr.profiler
+    with contextlib.ExitStack() as stack:
+        with profiler.phase("scan"):
+            table = stack.enter_context(
+                rule_mgr.section_table_factory(rulefile_name, sections.sectionname_regex, cli.safe_section_key)
+            )
+        section_versions = dict()
+        for section in table:
+            section_versions.setdefault(section.name, list()).append(section)
+        if profiler.enabled:
+            profiler.count("files_opened")
+            profiler.count("sections", len(table.sections))
+            last = table.sections[-1]
+            profiler.count("lines", last.start_line - 1 + table.data(last).count(b"\n"))
+            profiler.count("bytes_read", len(table.buf))
+
+        _logger.debug(f"output directory: {directory}")
+        with profiler.phase("write"), \
+                writer.FileWriter(rule_mgr.args.threads, fsync_directory = fsync_directory) as file_writer:
+            for name, versions in section_versions.items():
+                chunks = list()
+                for section in versions:
+                    chunks.extend(sections.text_output_chunks(table.buf, section.start, section.end))
+                if output_manifest is not None and not output_manifest.needs_write(f"{name}.txt", chunks):
+                    continue
+                for i in range(len(versions)):
+                    _logger.info(f"saving section '{name}' version {i}")
+                file_writer.submit(os.path.join(directory, f"{name}.txt"), chunks)
+        _logger.info(file_writer.throughput())
+        profiler.count("files_written", file_writer.files_written)
+        profiler.count("bytes_written", file_writer.bytes_written)
+    if output_manifest is not None:
+        output_manifest.commit()
+        print(f"split: {output_manifest.summary()}")
+        return output_manifest.files
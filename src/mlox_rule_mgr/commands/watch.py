@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+The watch subcommand: reruns an incremental merge or split whenever its
+input files change.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from mlox_rule_mgr import watch as polling
+from mlox_rule_mgr import writer
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.description = """
+The watch command runs an incremental merge or split, then polls its input files
+and reruns it whenever they change, until interrupted (Ctrl-C).
+"""
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "--interval",
+        type = float,
+        default = polling.DEFAULT_INTERVAL,
+        help = f"seconds between polls (default: {polling.DEFAULT_INTERVAL})"
+    )
+    parser.add_argument(
+        "--debounce",
+        type = float,
+        default = polling.DEFAULT_DEBOUNCE,
+        help = f"seconds to wait for edits to settle before rebuilding (default: {polling.DEFAULT_DEBOUNCE})"
+    )
+    watch_subparsers = parser.add_subparsers(
+        title = "watched commands",
+        dest = "watch_command",
+        required = True,
+    )
+    watch_merge_cmd = watch_subparsers.add_parser(
+        "merge",
+        help = "keep a merged file up to date"
+    )
+    watch_merge_cmd.add_argument(
+        "base_mlox_file",
+        help = "target file to merge subsequent mlox rule files into"
+    )
+    watch_merge_cmd.add_argument(
+        "mlox_files",
+        nargs = "+", help = "rule files, glob patterns or split directories to merge"
+    )
+    watch_split_cmd = watch_subparsers.add_parser(
+        "split",
+        help = "keep a split directory up to date"
+    )
+    watch_split_cmd.add_argument(
+        "mlox_file",
+        help = "rule file to split"
+    )
+    watch_split_cmd.add_argument(
+        "-d", "--directory",
+        help = "output directory"
+    )
+    watch_split_cmd.add_argument(
+        "-t", "--threads",
+        type = int,
+        default = writer.DEFAULT_THREADS,
+        help = f"number of threads writing section files (default: {writer.DEFAULT_THREADS})"
+    )
+    watch_split_cmd.set_defaults(fsync = False, incremental = True)
+
+
+def watch(rule_mgr):
+    """
+    usage: watch [-h] [--interval SECONDS] [--debounce SECONDS] {merge,split} ...
+
+    Runs an incremental merge or split, then reruns it whenever its
+    input files change, until interrupted. The state of each build is
+    kept in memory for the next one. A failed rerun is logged, and
+    watching goes on.
+
+    Returns
+    -------
+    None.
+
+    """
+    if rule_mgr.args.watch_command == "merge":
+        basefile_name = os.path.abspath(rule_mgr.args.base_mlox_file)
+        def list_files():
+            # Don't trigger on our own output.
+            return [
+                rulefile_name for rulefile_name in rule_mgr.expand_rulefile_names(rule_mgr.args.mlox_files)
+                if os.path.abspath(rulefile_name) != basefile_name
+            ]
+        build = rule_mgr.merge_incremental
+    else:
+        def list_files():
+            return [rule_mgr.args.mlox_file]
+        build = rule_mgr.split_2
+
+    watcher = polling.PollingWatcher(list_files, rule_mgr.args.interval, rule_mgr.args.debounce)
+    state = build()
+    _logger.info(f"watching {len(watcher.stats)} files")
+    try:
+        while True:
+            changed = watcher.wait()
+            _logger.info(f"{len(changed)} file{(len(changed) != 1) and 's' or ''} changed, rebuilding")
+            start_time = time.perf_counter()
+            try:
+                state = build(state)
+            except Exception as e:
+                # E.g. a file removed or half-written by an editor's save: keep
+                # watching, and rebuild from the files on disk on the next change.
+                _logger.error(f"rebuild failed, waiting for the next change: {e}")
+                state = None
+                continue
+            _logger.info(f"rebuilt in {time.perf_counter() - start_time:.3f} s")
+    except KeyboardInterrupt:
+        _logger.info("stopped watching")
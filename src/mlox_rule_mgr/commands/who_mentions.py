@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+The who-mentions subcommand: lists the rules mentioning a plugin, looked
+up in a plugin index.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import argparse
+import logging
+import os
+
+from mlox_rule_mgr import index, rules
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def add_arguments(parser):
+    parser.description = """
+The who-mentions command lists every rule that mentions a plugin, by name or
+through a wildcard pattern such as "Morrowind Patch *.esm", looking it up in the
+plugin index of the rule file. Plugin names are matched case-insensitively.
+The index is built or rebuilt if it is missing or out of date.
+"""
+    parser.formatter_class = argparse.RawDescriptionHelpFormatter
+    parser.add_argument(
+        "mlox_file",
+        help = "rule file to search"
+    )
+    parser.add_argument(
+        "plugin",
+        help = "plugin name, e.g. \"Morrowind.esm\""
+    )
+    parser.add_argument(
+        "-i", "--index-file",
+        help = "index file (default: mlox_file.plugins.idx)"
+    )
+
+
+def who_mentions(rule_mgr):
+    """
+    usage: who-mentions [-h] [-i INDEX_FILE] mlox_file plugin
+
+    positional arguments:
+      mlox_file             rule file to search
+      plugin                plugin name, e.g. "Morrowind.esm"
+
+    optional arguments:
+      -h, --help            show this help message and exit
+      -i INDEX_FILE, --index-file INDEX_FILE
+                            index file (default: mlox_file.plugins.idx)
+
+    Prints the section, rule and line number of every rule that mentions
+    the plugin, by name or through a wildcard pattern, looked up in the
+    plugin index of the rule file.
+
+    Returns
+    -------
+    None.
+
+    """
+    rulefile_name = os.path.realpath(rule_mgr.args.mlox_file)
+    plugin_index = rule_mgr.load_plugin_index(rulefile_name, rule_mgr.args.index_file)
+    mentions = plugin_index.lookup_matching(rule_mgr.args.plugin)
+    if not mentions:
+        print(f"{rule_mgr.args.plugin} is not mentioned in {rule_mgr.args.mlox_file}.")
+        return
+    nmentions = len(mentions)
+    print(f"{rule_mgr.args.plugin} is mentioned in {nmentions} rule{(nmentions != 1) and 's' or ''}:")
+    for section, kind, line_number, pattern in mentions:
+        via = f" as {pattern}" if pattern is not None else ""
+        print(f"\t{section}: line {line_number} [{kind}]{via}")
+
+
+def load_plugin_index(rule_mgr, rulefile_name, index_name = None, rebuild = False):
+    """
+    Returns the plugin index of a rule file, reading its sidecar index
+    file if it is up to date, and (re)building and saving it otherwise.
+
+    Parameters
+    ----------
+    rulefile_name : string
+        path of the rule file.
+    index_name : string, optional
+        path of the index file; defaults to rulefile_name + ".plugins.idx".
+    rebuild : bool, optional
+        rebuild the index even if it is up to date.
+
+    Returns
+    -------
+    plugin_index : index.PluginIndex
+        plugin index of the rule file.
+
+    """
+    if index_name is None:
+        index_name = index.default_plugin_index_path(rulefile_name)
+    if not rebuild:
+        plugin_index = index.PluginIndex.read(index_name)
+        if plugin_index is not None and plugin_index.is_current(rulefile_name):
+            return plugin_index
+    _logger.debug(f"building plugin index '{index_name}'")
+    source = index.source_signature(rulefile_name)
+    with rule_mgr.section_table_factory(rulefile_name) as table:
+        rule_list, _ = rules.parse_rules(table)
+    plugin_index = index.PluginIndex.from_rules(rule_list, source)
+    try:
+        plugin_index.write(index_name)
+    except OSError as e:
+        _logger.warning(f"cannot write plugin index '{index_name}': {e}")
+    return plugin_index
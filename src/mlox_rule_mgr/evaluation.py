@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Batch evaluation of [Conflict], [Requires] and [Patch] rules over many load
+orders.
+
+Plugin presence is a boolean matrix of load orders by plugins, and each rule
+expression becomes a vectorised boolean operation over its columns, so every
+load order is evaluated at once. Sub-expressions shared between rules are
+evaluated once.
+
+Load orders don't say anything about plugin sizes, versions or descriptions,
+so [SIZE ...], [VER ...] and [DESC ...] expressions are taken to be true when
+their plugin is present.
+
+Needs numpy (pip install mlox_rule_mgr[evaluate]).
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import logging
+
+import numpy
+
+from mlox_rule_mgr import matching
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+EVALUATED_RULES = frozenset(("CONFLICT", "REQUIRES", "PATCH"))
+
+
+class PresenceMatrix(object):
+    """
+    Which plugins each of a list of load orders contains.
+
+    Parameters
+    ----------
+    load_orders : list of lists of strings
+        plugin names of each load order.
+
+    Attributes
+    ----------
+    matrix : numpy.ndarray
+        boolean matrix of load orders by plugin ids.
+    plugins : list of strings
+        plugin names, indexed by id.
+    ids : dict
+        maps lower-case plugin names to ids.
+
+    """
+    def __init__(self, load_orders):
+        self.plugins = list()
+        self.ids = dict()
+        rows = list()
+        columns = list()
+        for row, plugins in enumerate(load_orders):
+            for plugin in plugins:
+                key = plugin.lower()
+                plugin_id = self.ids.get(key)
+                if plugin_id is None:
+                    plugin_id = self.ids[key] = len(self.plugins)
+                    self.plugins.append(plugin)
+                rows.append(row)
+                columns.append(plugin_id)
+        # Rules look at columns, so store them contiguously.
+        self.matrix = numpy.zeros((len(load_orders), len(self.plugins)), dtype = bool, order = "F")
+        self.matrix[rows, columns] = True
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+
+class RuleEvaluator(object):
+    """
+    Evaluates rules over all load orders of a PresenceMatrix at once.
+
+    Parameters
+    ----------
+    presence : PresenceMatrix
+        plugins of the load orders.
+    rule_list : list of Rule, optional
+        rules to be evaluated; their wildcard patterns are matched against
+        the plugins of presence up front.
+
+    """
+    def __init__(self, presence, rule_list = ()):
+        self.presence = presence
+        self._none = numpy.zeros(len(presence), dtype = bool)
+        self._values = dict()
+        self._pattern_ids = dict()
+        matcher = matching.PluginMatcher()
+        for rule in rule_list:
+            for plugin in rule.plugins():
+                if plugin not in self._pattern_ids and matching.is_wildcard(plugin):
+                    self._pattern_ids[plugin] = list()
+                    matcher.add(plugin)
+        if len(matcher):
+            for plugin, patterns in matcher.match_all(presence.plugins).items():
+                for pattern in patterns:
+                    self._pattern_ids[pattern].append(presence.ids[plugin.lower()])
+
+    def evaluate(self, expr):
+        """
+        Returns a boolean vector telling, for each load order, whether an
+        expression (a plugin name or Expr) is true.
+        """
+        value = self._values.get(expr)
+        if value is not None:
+            return value
+        if isinstance(expr, str):
+            plugin_ids = self._pattern_ids.get(expr)
+            if plugin_ids is None:
+                plugin_id = self.presence.ids.get(expr.lower())
+                plugin_ids = [] if plugin_id is None else [plugin_id]
+            if not plugin_ids:
+                value = self._none
+            elif len(plugin_ids) == 1:
+                value = self.presence.matrix[:, plugin_ids[0]]
+            else:
+                value = self.presence.matrix[:, plugin_ids].any(axis = 1)
+        elif not expr.args:
+            # Malformed, e.g. an empty [ALL]; already reported by the parser.
+            value = self._none
+        elif expr.op == "ALL":
+            value = numpy.logical_and.reduce([self.evaluate(operand) for operand in expr.args])
+        elif expr.op == "ANY":
+            value = numpy.logical_or.reduce([self.evaluate(operand) for operand in expr.args])
+        elif expr.op == "NOT":
+            value = ~self.evaluate(expr.args[0])
+        else:
+            # SIZE, VER and DESC: only presence can be checked.
+            value = self.evaluate(expr.args[-1])
+        self._values[expr] = value
+        return value
+
+    def fires(self, rule):
+        """
+        Returns a boolean vector telling for which load orders a rule fires:
+        a [Conflict] when two or more of its expressions are true, a
+        [Requires] when its first expression is true but not its second, and
+        a [Patch] when one of its expressions is true but not the other.
+        """
+        values = [self.evaluate(item) for item in rule.items]
+        if rule.kind == "CONFLICT":
+            return numpy.add.reduce(values, dtype = numpy.int32) >= 2 if values else self._none
+        if len(values) != 2:
+            return self._none
+        if rule.kind == "REQUIRES":
+            return values[0] & ~values[1]
+        if rule.kind == "PATCH":
+            return values[0] ^ values[1]
+        raise ValueError(f"cannot evaluate [{rule.kind}] rules")
+
+
+def evaluate_rules(rule_list, load_orders):
+    """
+    Evaluates the [Conflict], [Requires] and [Patch] rules of a list of rules
+    over many load orders.
+
+    Parameters
+    ----------
+    rule_list : list of Rule
+        rules; other kinds of rules are ignored.
+    load_orders : list of lists of strings
+        plugin names of each load order.
+
+    Returns
+    -------
+    (rules, hits) : tuple
+        the evaluated rules, and a boolean matrix of load orders by rules
+        telling which rules fire for which load orders.
+
+    """
+    evaluated_rules = [rule for rule in rule_list if rule.kind in EVALUATED_RULES]
+    presence = PresenceMatrix(load_orders)
+    evaluator = RuleEvaluator(presence, evaluated_rules)
+    hits = numpy.zeros((len(presence), len(evaluated_rules)), dtype = bool, order = "F")
+    for column, rule in enumerate(evaluated_rules):
+        hits[:, column] = evaluator.fires(rule)
+    return evaluated_rules, hits
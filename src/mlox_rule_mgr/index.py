@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Sidecar indexes of rule files.
+
+A section index maps each "mod_name [author]" section name to the byte
+offset, length and line number of every section with that name, so one
+section can be read with a single seek instead of parsing the whole file.
+
+A plugin index maps each plugin name (or wildcard pattern), in lower case,
+to the section, rule kind and line number of every rule that mentions it.
+
+Indexes record the size and modification time of the rule file and are
+rebuilt when they no longer match.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import json
+import logging
+import os
+import re
+
+from mlox_rule_mgr import matching
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+# Bumped whenever scanning a rule file can give different sections.
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".idx"
+PLUGIN_INDEX_SUFFIX = ".plugins.idx"
+
+section_name_regex = re.compile(r"\s*(?P<mod_name>.*?)\s*\[(?P<author>.*)\]\s*$")
+
+
+def default_index_path(rulefile_name):
+    return rulefile_name + INDEX_SUFFIX
+
+
+def default_plugin_index_path(rulefile_name):
+    return rulefile_name + PLUGIN_INDEX_SUFFIX
+
+
+def normalize_section_name(name):
+    """
+    Spells a section name the way section keys are spelled, so that e.g.
+    "mod2   [author2]" finds "mod2 [author2]".
+    """
+    match = section_name_regex.match(name)
+    if match is None:
+        return name.strip()
+    return f"{match.group('mod_name')} [{match.group('author')}]"
+
+
+def normalize_plugin_name(name):
+    """Plugin names are matched case-insensitively, as by mlox."""
+    return name.strip().lower()
+
+
+def source_signature(rulefile_name):
+    stat = os.stat(rulefile_name)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_index_data(index_name):
+    """Reads an index file, returning None if it is missing or unusable."""
+    try:
+        with open(index_name, "r", encoding = "utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        _logger.warning(f"ignoring unreadable index '{index_name}': {e}")
+        return None
+    if data.get("version") != INDEX_VERSION:
+        return None
+    return data
+
+
+def write_index_data(index_name, data):
+    data = dict(data, version = INDEX_VERSION)
+    tmp_name = f"{index_name}.{os.getpid()}.tmp"
+    with open(tmp_name, "w", encoding = "utf-8") as f:
+        json.dump(data, f, separators = (",", ":"))
+    os.replace(tmp_name, index_name)
+
+
+class SectionIndex(object):
+    """
+    Section-name index of a rule file.
+
+    Parameters
+    ----------
+    source : dict
+        source_signature() of the rule file when the index was built.
+    entries : dict
+        maps section names to lists of [offset, length, line_number].
+
+    """
+    def __init__(self, source, entries):
+        self.source = source
+        self.entries = entries
+
+    @classmethod
+    def from_table(cls, table, source):
+        entries = dict()
+        for section in table.sections[1:]:
+            entries.setdefault(section.name, list()).append([section.start, len(section), section.line_number])
+        return cls(source, entries)
+
+    @classmethod
+    def read(cls, index_name):
+        """Reads an index file, returning None if it is missing or unusable."""
+        data = read_index_data(index_name)
+        if data is None or "sections" not in data:
+            return None
+        return cls(data["source"], data["sections"])
+
+    def write(self, index_name):
+        write_index_data(index_name, {"source": self.source, "sections": self.entries})
+
+    def is_current(self, rulefile_name):
+        return self.source == source_signature(rulefile_name)
+
+    def lookup(self, name):
+        """
+        Returns [offset, length, line_number] entries of all sections named
+        name, in file order.
+        """
+        return self.entries.get(normalize_section_name(name), [])
+
+    def __len__(self):
+        return sum(len(versions) for versions in self.entries.values())
+
+
+class PluginIndex(object):
+    """
+    Inverted plugin-name index of the rules of a rule file.
+
+    Parameters
+    ----------
+    source : dict
+        source_signature() of the rule file when the index was built.
+    entries : dict
+        maps normalized plugin names to lists of [section, rule kind,
+        line_number].
+
+    """
+    def __init__(self, source, entries):
+        self.source = source
+        self.entries = entries
+        self._matcher = None
+
+    @classmethod
+    def from_rules(cls, rule_list, source):
+        entries = dict()
+        for rule in rule_list:
+            mention = [rule.section, rule.kind, rule.line_number]
+            seen = set()
+            for plugin in rule.plugins():
+                name = normalize_plugin_name(plugin)
+                # One mention per rule, even if a plugin appears twice in it.
+                if name not in seen:
+                    seen.add(name)
+                    entries.setdefault(name, list()).append(mention)
+        return cls(source, entries)
+
+    @classmethod
+    def read(cls, index_name):
+        """Reads an index file, returning None if it is missing or unusable."""
+        data = read_index_data(index_name)
+        if data is None or "plugins" not in data:
+            return None
+        return cls(data["source"], data["plugins"])
+
+    def write(self, index_name):
+        write_index_data(index_name, {"source": self.source, "plugins": self.entries})
+
+    def is_current(self, rulefile_name):
+        return self.source == source_signature(rulefile_name)
+
+    def lookup(self, plugin):
+        """
+        Returns [section, rule kind, line_number] entries of all rules that
+        mention plugin, in file order.
+        """
+        return self.entries.get(normalize_plugin_name(plugin), [])
+
+    def matcher(self):
+        """Returns a PluginMatcher of the wildcard patterns in the index."""
+        if self._matcher is None:
+            self._matcher = matching.PluginMatcher(name for name in self.entries if matching.is_wildcard(name))
+        return self._matcher
+
+    def lookup_matching(self, plugin):
+        """
+        Same as lookup, but also finds rules that mention plugin through a
+        wildcard pattern. Returns [section, rule kind, line_number, pattern]
+        entries in file order, where pattern is None for rules naming plugin
+        itself.
+        """
+        name = normalize_plugin_name(plugin)
+        mentions = [mention + [None] for mention in self.entries.get(name, [])]
+        for pattern in self.matcher().match(name):
+            if pattern != name:
+                mentions.extend(mention + [pattern] for mention in self.entries[pattern])
+        mentions.sort(key = lambda mention: mention[2])
+        return mentions
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def read_section(rulefile_name, entry, encoding = "utf-8"):
+    """Reads the text of one indexed section with a single seek."""
+    offset, length, _ = entry
+    with open(rulefile_name, "rb") as f:
+        f.seek(offset)
+        return f.read(length).decode(encoding)
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Load-order evaluation from [Order], [NearStart] and [NearEnd] rules.
+
+Plugins of a load order are interned to integer ids, and the ordering rules
+become a graph with one edge per "must load before" relation between
+consecutive installed plugins of an [Order] rule, stored as compressed
+adjacency arrays. Sorting is a topological sort that, among the plugins
+free to go next, picks [NearStart] plugins first and [NearEnd] plugins
+last, and otherwise keeps the order of the given load order. Cycles are
+broken at the plugin that would have come first among those of a cycle
+that no other unsorted plugin must come before.
+
+Contradictory [Order] rules are found as the strongly connected components
+of the graph, in time linear in its size.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import array
+import heapq
+import logging
+
+from mlox_rule_mgr import matching
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+NEAR_START = 0
+NEAR_NONE = 1
+NEAR_END = 2
+
+
+def read_plugin_list(filename, encoding = "utf-8"):
+    """
+    Reads a load order: one plugin name per line, ignoring blank lines and
+    lines starting with "#" or ";".
+    """
+    plugins = list()
+    with open(filename, "r", encoding = encoding) as f:
+        for line in f:
+            line = line.strip()
+            if line and line[0] not in "#;":
+                plugins.append(line)
+    return plugins
+
+
+class LoadOrderGraph(object):
+    """
+    Ordering graph over a list of plugins.
+
+    Parameters
+    ----------
+    plugins : iterable of strings
+        plugin names in their current load order. Names are matched
+        case-insensitively; repeated names are ignored.
+    expand_wildcards : bool, optional
+        whether wildcard patterns in rules stand for the plugins they match,
+        or are plugin names like any other.
+
+    Attributes
+    ----------
+    plugins : list of strings
+        plugin names, indexed by id.
+    ids : dict
+        maps lower-case plugin names to ids.
+
+    """
+    def __init__(self, plugins, expand_wildcards = True):
+        self.expand_wildcards = expand_wildcards
+        self.plugins = list()
+        self.ids = dict()
+        for plugin in plugins:
+            key = plugin.lower()
+            if key not in self.ids:
+                self.ids[key] = len(self.plugins)
+                self.plugins.append(plugin)
+        num_plugins = len(self.plugins)
+        self._sources = array.array("i")
+        self._targets = array.array("i")
+        # Edge i comes from rule self._edge_rules[i].
+        self._edge_rules = list()
+        self._near = array.array("b", [NEAR_NONE]) * num_plugins
+        self._near_rank = array.array("i", [0]) * num_plugins
+        self._num_near = 0
+
+    @classmethod
+    def from_rules(cls, rule_list):
+        """
+        Builds the graph of every plugin name and pattern mentioned by the
+        ordering rules of a list of rules, in order of first mention.
+        """
+        ordering_rules = [rule for rule in rule_list if rule.kind in ("ORDER", "NEARSTART", "NEAREND")]
+        graph = cls((item for rule in ordering_rules for item in rule.items), expand_wildcards = False)
+        graph.add_rules(ordering_rules)
+        return graph
+
+    def __len__(self):
+        return len(self.plugins)
+
+    @property
+    def num_edges(self):
+        return len(self._sources)
+
+    def _pattern_ids(self, rule_list):
+        """
+        Maps each plugin name and pattern of the ordering rules to the ids
+        of the plugins it stands for.
+        """
+        pattern_ids = dict()
+        matcher = matching.PluginMatcher()
+        for rule in rule_list:
+            for item in rule.items:
+                if item in pattern_ids:
+                    continue
+                if self.expand_wildcards and matching.is_wildcard(item):
+                    pattern_ids[item] = list()
+                    matcher.add(item)
+                else:
+                    plugin_id = self.ids.get(item.lower())
+                    pattern_ids[item] = [] if plugin_id is None else [plugin_id]
+        if len(matcher):
+            for plugin, patterns in matcher.match_all(self.plugins).items():
+                plugin_id = self.ids[plugin.lower()]
+                for pattern in patterns:
+                    pattern_ids[pattern].append(plugin_id)
+        return pattern_ids
+
+    def add_rules(self, rule_list):
+        """
+        Adds the [Order], [NearStart] and [NearEnd] rules of a list of
+        rules; other rules are ignored.
+        """
+        ordering_rules = [rule for rule in rule_list if rule.kind in ("ORDER", "NEARSTART", "NEAREND")]
+        pattern_ids = self._pattern_ids(ordering_rules)
+        sources = self._sources
+        targets = self._targets
+        edge_rules = self._edge_rules
+        near = self._near
+        near_rank = self._near_rank
+        for rule in ordering_rules:
+            if rule.kind == "ORDER":
+                previous_ids = ()
+                for item in rule.items:
+                    item_ids = pattern_ids[item]
+                    if not item_ids:
+                        # Plugins that aren't installed don't break the chain.
+                        continue
+                    for source in previous_ids:
+                        for target in item_ids:
+                            if source != target:
+                                sources.append(source)
+                                targets.append(target)
+                                edge_rules.append(rule)
+                    previous_ids = item_ids
+            else:
+                placement = NEAR_START if rule.kind == "NEARSTART" else NEAR_END
+                for item in rule.items:
+                    for plugin_id in pattern_ids[item]:
+                        # The first placement rule for a plugin wins.
+                        if near[plugin_id] == NEAR_NONE:
+                            near[plugin_id] = placement
+                            # Earlier entries have higher priority: nearer
+                            # the start for [NearStart], nearer the end for
+                            # [NearEnd].
+                            if placement == NEAR_START:
+                                near_rank[plugin_id] = self._num_near
+                            else:
+                                near_rank[plugin_id] = -self._num_near
+                            self._num_near += 1
+
+    def adjacency(self):
+        """
+        Returns the graph as compressed adjacency arrays (offsets, targets,
+        edges): the successors of plugin i are targets[offsets[i]:offsets[i
+        + 1]], added by the edges (indexes into the edge list) at the same
+        positions of edges.
+        """
+        num_plugins = len(self.plugins)
+        offsets = array.array("i", [0]) * (num_plugins + 1)
+        for source in self._sources:
+            offsets[source + 1] += 1
+        for i in range(num_plugins):
+            offsets[i + 1] += offsets[i]
+        fill = array.array("i", offsets[:-1])
+        targets = array.array("i", [0]) * len(self._sources)
+        edges = array.array("i", [0]) * len(self._sources)
+        for edge, (source, target) in enumerate(zip(self._sources, self._targets)):
+            position = fill[source]
+            targets[position] = target
+            edges[position] = edge
+            fill[source] = position + 1
+        return offsets, targets, edges
+
+    def edge(self, edge):
+        """Returns (source id, target id, rule) of an edge."""
+        return self._sources[edge], self._targets[edge], self._edge_rules[edge]
+
+    def priority(self, plugin_id):
+        """Sort key of a plugin among plugins free to be loaded next."""
+        near = self._near[plugin_id]
+        if near == NEAR_NONE:
+            return (near, 0, plugin_id)
+        return (near, self._near_rank[plugin_id], plugin_id)
+
+    def sort(self):
+        """
+        Sorts the plugins topologically.
+
+        Returns
+        -------
+        (order, broken) : tuple
+            plugin names in load order, and names of plugins loaded early to
+            break a cycle.
+
+        """
+        num_plugins = len(self.plugins)
+        offsets, targets, _ = self.adjacency()
+        indegree = array.array("i", [0]) * num_plugins
+        for target in targets:
+            indegree[target] += 1
+        priority = [self.priority(plugin_id) for plugin_id in range(num_plugins)]
+        ready = [priority[plugin_id] for plugin_id in range(num_plugins) if indegree[plugin_id] == 0]
+        heapq.heapify(ready)
+        # A cycle is broken inside a strongly connected component that no
+        # unsorted plugin outside it must come before, so that no rule
+        # outside the cycle is broken with it.
+        components = strongly_connected_components(offsets, targets)
+        component_of = array.array("i", [0]) * num_plugins
+        for component_id, component in enumerate(components):
+            for plugin_id in component:
+                component_of[plugin_id] = component_id
+        # Number of edges into each component from unsorted plugins outside it.
+        component_indegree = array.array("i", [0]) * len(components)
+        for source in range(num_plugins):
+            for position in range(offsets[source], offsets[source + 1]):
+                if component_of[source] != component_of[targets[position]]:
+                    component_indegree[component_of[targets[position]]] += 1
+        # Plugins of such components, for picking where to break cycles;
+        # sorted plugins are skipped lazily.
+        breakable = [
+            priority[plugin_id]
+            for component_id, component in enumerate(components)
+            if component_indegree[component_id] == 0 and len(component) > 1
+            for plugin_id in component
+        ]
+        heapq.heapify(breakable)
+        done = array.array("b", [0]) * num_plugins
+        order = list()
+        broken = list()
+        while len(order) < num_plugins:
+            if not ready:
+                # Everything left is on or after a cycle.
+                while done[breakable[0][2]]:
+                    heapq.heappop(breakable)
+                key = heapq.heappop(breakable)
+                broken.append(self.plugins[key[2]])
+                _logger.debug(f"breaking cycle at '{self.plugins[key[2]]}'")
+                indegree[key[2]] = 0
+                ready.append(key)
+            plugin_id = heapq.heappop(ready)[2]
+            if done[plugin_id]:
+                continue
+            done[plugin_id] = 1
+            order.append(self.plugins[plugin_id])
+            for position in range(offsets[plugin_id], offsets[plugin_id + 1]):
+                target = targets[position]
+                indegree[target] -= 1
+                if indegree[target] == 0 and not done[target]:
+                    heapq.heappush(ready, priority[target])
+                component_id = component_of[target]
+                if component_id != component_of[plugin_id]:
+                    component_indegree[component_id] -= 1
+                    if component_indegree[component_id] == 0 and len(components[component_id]) > 1:
+                        for member in components[component_id]:
+                            heapq.heappush(breakable, priority[member])
+        return order, broken
+
+    def cycles(self):
+        """
+        Finds the groups of plugins whose [Order] rules contradict each
+        other.
+
+        Returns
+        -------
+        cycles : list of (plugins, edges) tuples
+            for each strongly connected component of more than one plugin,
+            the names of its plugins, and the (source name, target name, rule)
+            of the edges between them, by line number.
+
+        """
+        offsets, targets, edges = self.adjacency()
+        cycles = list()
+        for component in strongly_connected_components(offsets, targets):
+            if len(component) < 2:
+                continue
+            component.sort()
+            members = set(component)
+            component_edges = list()
+            for source in component:
+                for position in range(offsets[source], offsets[source + 1]):
+                    if targets[position] in members:
+                        rule = self._edge_rules[edges[position]]
+                        component_edges.append((self.plugins[source], self.plugins[targets[position]], rule))
+            component_edges.sort(key = lambda edge: edge[2].line_number)
+            cycles.append(([self.plugins[plugin_id] for plugin_id in component], component_edges))
+        cycles.sort(key = lambda cycle: self.ids[cycle[0][0].lower()])
+        return cycles
+
+
+def strongly_connected_components(offsets, targets):
+    """
+    Finds the strongly connected components of a graph given as compressed
+    adjacency arrays (see LoadOrderGraph.adjacency), with an iterative
+    version of Tarjan's algorithm.
+
+    Returns
+    -------
+    components : list of lists of ints
+        node ids of each component, in reverse topological order of the
+        components.
+
+    """
+    num_nodes = len(offsets) - 1
+    index = array.array("i", [-1]) * num_nodes
+    lowlink = array.array("i", [0]) * num_nodes
+    on_stack = array.array("b", [0]) * num_nodes
+    next_position = array.array("i", offsets[:-1])
+    stack = list()
+    components = list()
+    counter = 0
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        path = [root]
+        while path:
+            node = path[-1]
+            position = next_position[node]
+            if position < offsets[node + 1]:
+                next_position[node] = position + 1
+                target = targets[position]
+                if index[target] == -1:
+                    index[target] = lowlink[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = 1
+                    path.append(target)
+                elif on_stack[target] and index[target] < lowlink[node]:
+                    lowlink[node] = index[target]
+                continue
+            path.pop()
+            if path and lowlink[node] < lowlink[path[-1]]:
+                lowlink[path[-1]] = lowlink[node]
+            if lowlink[node] == index[node]:
+                component = list()
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Manifests of generated files, for incremental rebuilds.
+
+A split manifest records a content digest and the size and modification time
+of each file a command wrote, so that the next run can skip files whose
+content has not changed (and that nobody has touched since), and remove files
+it no longer produces. A merge manifest records the same for each input of a
+merged file, along with where its segment went in the output.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import collections
+import contextlib
+import hashlib
+import json
+import logging
+import os
+
+from mlox_rule_mgr import sections
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+MANIFEST_VERSION = 1
+SPLIT_MANIFEST_NAME = ".mlox_split_manifest.json"
+
+
+def chunks_digest(chunks):
+    digest = hashlib.blake2b(digest_size = 20)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(manifest_name):
+    """Reads a manifest file, returning an empty manifest if unusable."""
+    try:
+        with open(manifest_name, "r", encoding = "utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return dict()
+    except (OSError, ValueError) as e:
+        _logger.warning(f"ignoring unreadable manifest '{manifest_name}': {e}")
+        return dict()
+    if data.get("version") != MANIFEST_VERSION:
+        return dict()
+    return data
+
+
+def write_manifest(manifest_name, data):
+    data = dict(data, version = MANIFEST_VERSION)
+    tmp_name = f"{manifest_name}.{os.getpid()}.tmp"
+    with open(tmp_name, "w", encoding = "utf-8") as f:
+        json.dump(data, f, indent = 1, sort_keys = True)
+    os.replace(tmp_name, manifest_name)
+
+
+def stat_entry(stat):
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def summarize(counts):
+    return (
+        f"{counts['added']} added, {counts['changed']} changed,"
+        f" {counts['removed']} removed, {counts['unchanged']} unchanged"
+    )
+
+
+def stat_entry_of(entry):
+    return {"size": entry.get("size"), "mtime_ns": entry.get("mtime_ns")}
+
+
+class OutputManifest(object):
+    """
+    Tracks which files of an output directory need (re)writing.
+
+    Parameters
+    ----------
+    directory : string
+        output directory.
+    manifest_name : string, optional
+        file name of the manifest within directory.
+    previous : dict, optional
+        file entries of the previous run; read from the manifest file if not
+        given.
+
+    Attributes
+    ----------
+    counts : collections.Counter
+        numbers of "added", "changed", "removed" and "unchanged" files.
+    files : dict
+        file entries of this run, by file name.
+
+    """
+    def __init__(self, directory, manifest_name = SPLIT_MANIFEST_NAME, previous = None):
+        self.directory = directory
+        self.manifest_name = os.path.join(directory, manifest_name)
+        if previous is None:
+            previous = read_manifest(self.manifest_name).get("files", dict())
+        self.previous = previous
+        self.files = dict()
+        self.counts = collections.Counter()
+        self._written = list()
+        self._stats = dict()
+        with os.scandir(directory) as dir_entries:
+            for dir_entry in dir_entries:
+                if dir_entry.name in previous:
+                    with contextlib.suppress(OSError):
+                        self._stats[dir_entry.name] = stat_entry(dir_entry.stat())
+
+    def needs_write(self, filename, chunks):
+        """
+        Tells whether a file has to be written, and records it.
+
+        Parameters
+        ----------
+        filename : string
+            file name within the output directory.
+        chunks : list of bytes-like objects
+            new contents of the file.
+
+        """
+        digest = chunks_digest(chunks)
+        entry = self.previous.get(filename)
+        if entry is None:
+            self.counts["added"] += 1
+        elif entry["digest"] == digest and self._stats.get(filename) == stat_entry_of(entry):
+            self.counts["unchanged"] += 1
+            self.files[filename] = entry
+            return False
+        else:
+            self.counts["changed"] += 1
+        self.files[filename] = {"digest": digest}
+        self._written.append(filename)
+        return True
+
+    def commit(self):
+        """
+        Removes files that were not produced this time, and saves the
+        manifest. Call once all files are written.
+        """
+        for filename in self._written:
+            self.files[filename].update(stat_entry(os.stat(os.path.join(self.directory, filename))))
+        for filename in self.previous:
+            if filename not in self.files:
+                _logger.info(f"removing '{filename}'")
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.directory, filename))
+                self.counts["removed"] += 1
+        write_manifest(self.manifest_name, {"files": self.files})
+
+    def summary(self):
+        return summarize(self.counts)
+
+
+class MergedOutput(object):
+    """
+    Rebuilds a file made of one segment per input file, reusing the segments
+    of unchanged inputs from the previous output.
+
+    The manifest records, for each input, its size, modification time and
+    content digest, and the byte range its segment occupies in the output.
+    Inputs whose size and modification time did not change are not read at
+    all.
+
+    Parameters
+    ----------
+    output_name : string
+        path of the output file.
+    previous : dict, optional
+        manifest data of the previous build; read from the manifest file if
+        not given.
+
+    Attributes
+    ----------
+    counts : collections.Counter
+        numbers of "added", "changed", "removed" and "unchanged" inputs of the
+        last rebuild.
+
+    """
+    suffix = ".manifest.json"
+
+    def __init__(self, output_name, previous = None):
+        self.output_name = output_name
+        self.manifest_name = output_name + self.suffix
+        if previous is None:
+            previous = read_manifest(self.manifest_name)
+        self.previous = previous
+        self.counts = collections.Counter()
+
+    def _previous_inputs(self):
+        # Segments can only be reused if the output is what was built last.
+        try:
+            output_stat = stat_entry(os.stat(self.output_name))
+        except FileNotFoundError:
+            return dict()
+        if self.previous.get("output") != output_stat:
+            return dict()
+        return self.previous.get("inputs", dict())
+
+    def rebuild(self, input_names, render):
+        """
+        Writes the output, then saves the manifest.
+
+        Parameters
+        ----------
+        input_names : list of strings
+            paths of the input files, in output order.
+        render : function
+            maps the contents of an input file (bytes) to its segment of the
+            output (bytes).
+
+        """
+        self.counts = collections.Counter()
+        previous_inputs = self._previous_inputs()
+        inputs = dict()
+        tmp_name = f"{self.output_name}.{os.getpid()}.tmp"
+        try:
+            with contextlib.ExitStack() as stack:
+                old_output = b""
+                if previous_inputs:
+                    old_output = stack.enter_context(sections.mapped_file(self.output_name))
+                out_f = stack.enter_context(open(tmp_name, "wb"))
+                offset = 0
+                for input_name in input_names:
+                    key = os.path.abspath(input_name)
+                    entry = previous_inputs.get(key)
+                    input_stat = stat_entry(os.stat(input_name))
+                    if entry is not None and stat_entry_of(entry) == input_stat:
+                        digest = entry["digest"]
+                    else:
+                        _logger.info(f"reading rulefile '{input_name}'")
+                        with open(input_name, "rb") as in_f:
+                            data = in_f.read()
+                        digest = chunks_digest([data])
+                    if entry is not None and entry["digest"] == digest:
+                        self.counts["unchanged"] += 1
+                        segment = old_output[entry["offset"]:entry["offset"] + entry["length"]]
+                    else:
+                        self.counts["added" if entry is None else "changed"] += 1
+                        segment = render(data)
+                    out_f.write(segment)
+                    inputs[key] = dict(input_stat, digest = digest, offset = offset, length = len(segment))
+                    offset += len(segment)
+            os.replace(tmp_name, self.output_name)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_name)
+            raise
+        self.counts["removed"] = sum(1 for key in previous_inputs if key not in inputs)
+        self.previous = {
+            "output": stat_entry(os.stat(self.output_name)),
+            "inputs": inputs,
+            "version": MANIFEST_VERSION,
+        }
+        write_manifest(self.manifest_name, self.previous)
+
+    def summary(self):
+        return summarize(self.counts)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Matching of plugin names against the wildcard patterns of rule files.
+
+Rule files may name plugins with patterns, where "*" matches any text, "?"
+matches one character and "<VER>" matches a version number, as in
+"Morrowind Rebirth <VER> - Morrowind Patch *.esm". Names are matched
+case-insensitively.
+
+PluginMatcher compiles a whole set of patterns at once: plain names go in a
+dictionary, and wildcard patterns go in a trie keyed by their literal prefix
+(the text before the first wildcard), so a plugin name is only tried against
+the few patterns whose prefix it starts with.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import logging
+import re
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+# Version numbers such as "1", "1.6.5", "2_0" or "1.2b", as matched by mlox.
+# Separators are required between digit runs: were they optional, a long
+# run of digits could be split in exponentially many ways on a failed match.
+VER_REGEX = r"\d+(?:[_.-]\d+)*[a-z]?"
+
+wildcard_regex = re.compile(r"\*|\?|<ver>", re.IGNORECASE)
+
+
+def is_wildcard(pattern):
+    return wildcard_regex.search(pattern) is not None
+
+
+def split_pattern(pattern):
+    """
+    Splits a pattern into its lower-case literal prefix and a regular
+    expression matching the rest of a lower-case name.
+    """
+    pattern = pattern.lower()
+    parts = list()
+    pos = 0
+    prefix = None
+    for wildcard in wildcard_regex.finditer(pattern):
+        literal = pattern[pos:wildcard.start()]
+        if prefix is None:
+            prefix = literal
+        else:
+            parts.append(re.escape(literal))
+        token = wildcard.group()
+        parts.append(".*" if token == "*" else "." if token == "?" else VER_REGEX)
+        pos = wildcard.end()
+    if prefix is None:
+        return pattern, None
+    parts.append(re.escape(pattern[pos:]))
+    return prefix, re.compile("".join(parts), re.DOTALL)
+
+
+class PluginMatcher(object):
+    """
+    Finds every pattern, of a set of plugin-name patterns, that matches a
+    plugin name.
+
+    Parameters
+    ----------
+    patterns : iterable of strings, optional
+        plugin names and wildcard patterns.
+
+    """
+    def __init__(self, patterns = ()):
+        # Lower-case name -> patterns spelled that way, for plain names.
+        self._literals = dict()
+        # Trie of literal prefixes; the None key of a node holds the
+        # (regex, pattern) pairs of patterns whose prefix ends there.
+        self._trie = dict()
+        self._patterns = set()
+        for pattern in patterns:
+            self.add(pattern)
+
+    @classmethod
+    def from_rules(cls, rule_list):
+        """Compiles the plugin names of parsed rules."""
+        matcher = cls()
+        for rule in rule_list:
+            for plugin in rule.plugins():
+                matcher.add(plugin)
+        return matcher
+
+    def add(self, pattern):
+        if pattern in self._patterns:
+            return
+        self._patterns.add(pattern)
+        prefix, regex = split_pattern(pattern)
+        if regex is None:
+            self._literals.setdefault(prefix, list()).append(pattern)
+            return
+        node = self._trie
+        for char in prefix:
+            node = node.setdefault(char, dict())
+        node.setdefault(None, list()).append((regex, pattern))
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def match(self, plugin):
+        """
+        Returns the patterns matching a plugin name: plain names first, then
+        wildcard patterns by increasing prefix length.
+        """
+        name = plugin.lower()
+        matches = list(self._literals.get(name, ()))
+        node = self._trie
+        pos = 0
+        end = len(name)
+        while True:
+            candidates = node.get(None)
+            if candidates is not None:
+                for regex, pattern in candidates:
+                    if regex.fullmatch(name, pos) is not None:
+                        matches.append(pattern)
+            if pos == end:
+                break
+            node = node.get(name[pos])
+            if node is None:
+                break
+            pos += 1
+        return matches
+
+    def match_all(self, plugins):
+        """Returns {plugin: matching patterns} for the plugins that match."""
+        matches = dict()
+        for plugin in plugins:
+            plugin_matches = self.match(plugin)
+            if plugin_matches:
+                matches[plugin] = plugin_matches
+        return matches
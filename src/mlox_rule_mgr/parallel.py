@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Scanning and examining of many rule files at once in a process pool.
+
+Workers scan (or load from the parse cache) the section tables of rule files
+and send back plain tuples, which are much cheaper to pass between processes
+than section text. Results come back in the order the files were given.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import concurrent.futures
+import functools
+import logging
+import os
+
+from mlox_rule_mgr import cache, sections
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+def resolve_jobs(jobs):
+    """Maps a --jobs value to a number of workers; 0 means one per CPU."""
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(jobs, 1)
+
+
+def _scan_rulefile(rulefile_name, section_regex, naming, cache_dir):
+    if cache_dir is None:
+        table_factory = sections.section_table_factory
+    else:
+        table_factory = functools.partial(cache.cached_section_table_factory, cache.ParseCache(cache_dir))
+    with table_factory(rulefile_name, section_regex, naming) as table:
+        return [section.astuple() for section in table.sections]
+
+
+def scan_rulefiles(
+    rulefile_names,
+    jobs,
+    parse_cache = None,
+    section_regex = sections.section_name_regex_2,
+    naming = sections.section_key,
+):
+    """
+    Scans the section tables of rule files in a process pool.
+
+    Parameters
+    ----------
+    rulefile_names : list of strings
+        paths of the rule files.
+    jobs : int
+        number of worker processes.
+    parse_cache : cache.ParseCache, optional
+        parse cache for the workers to use.
+    section_regex, naming : optional
+        as for sections.iter_sections; naming must be a module-level function.
+
+    Returns
+    -------
+    section_lists : list of lists of Section
+        sections of each rule file, in the order of rulefile_names.
+
+    """
+    cache_dir = parse_cache.directory if parse_cache is not None else None
+    scan = functools.partial(_scan_rulefile, section_regex = section_regex, naming = naming, cache_dir = cache_dir)
+    workers = min(jobs, len(rulefile_names))
+    _logger.debug(f"scanning {len(rulefile_names)} rulefiles with {workers} workers")
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        return [sections.sections_from_tuples(rows) for rows in executor.map(scan, rulefile_names)]
+
+
+def map_rulefiles(function, rulefile_names, jobs):
+    """
+    Calls a function on each of several rule files in a process pool.
+
+    Parameters
+    ----------
+    function : callable
+        picklable (e.g. module-level) function of a rule file name, whose
+        result is picklable.
+    rulefile_names : list of strings
+        paths of the rule files.
+    jobs : int
+        number of worker processes.
+
+    Yields
+    ------
+    result
+        result of function for each rule file, in the order of
+        rulefile_names, as soon as it and those before it are ready.
+
+    """
+    workers = min(jobs, len(rulefile_names))
+    _logger.debug(f"examining {len(rulefile_names)} rulefiles with {workers} workers")
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        yield from executor.map(function, rulefile_names)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Wall-time and counter instrumentation of rule-file operations.
+
+A Profiler adds up the wall time spent in named phases (globbing, reading,
+section matching, coalescing, writing) and named counters (lines, sections,
+bytes read and written, files opened). When profiling is off, the
+NULL_PROFILER takes its place: its phases are a shared do-nothing context
+manager and its counters do nothing, and callers skip counts that cost
+anything to compute by checking `enabled`.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import collections
+import contextlib
+import json
+import logging
+import time
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+PROFILE_FORMATS = ("text", "json")
+
+
+class Profiler(object):
+    """
+    Adds up wall time by phase, and counts by counter name.
+
+    Attributes
+    ----------
+    phases : dict
+        maps phase names to [seconds, calls], in order of first use.
+    counters : collections.Counter
+        counts by name.
+
+    """
+    enabled = True
+
+    def __init__(self):
+        self.phases = dict()
+        self.counters = collections.Counter()
+        self._start_time = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager timing one run of a phase."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, [0.0, 0])
+            totals[0] += time.perf_counter() - start_time
+            totals[1] += 1
+
+    def count(self, name, n = 1):
+        self.counters[name] += n
+
+    def as_dict(self):
+        return {
+            "total_seconds": time.perf_counter() - self._start_time,
+            "phases": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in self.phases.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def emit(self, profile_format, stream):
+        """Writes the phases and counters to stream, as text or JSON."""
+        profile = self.as_dict()
+        if profile_format == "json":
+            json.dump(profile, stream)
+            stream.write("\n")
+            return
+        stream.write(f"profile: {profile['total_seconds']:.3f} s total\n")
+        for name, phase in profile["phases"].items():
+            calls = phase["calls"]
+            stream.write(f"\t{name}: {phase['seconds']:.3f} s, {calls} call{(calls != 1) and 's' or ''}\n")
+        for name, count in sorted(profile["counters"].items()):
+            stream.write(f"\t{name}: {count}\n")
+
+
+class NullProfiler(object):
+    """Stands in for a Profiler when profiling is off."""
+    enabled = False
+
+    _null_phase = contextlib.nullcontext()
+
+    def phase(self, name):
+        return self._null_phase
+
+    def count(self, name, n = 1):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+Parser for the mlox rule grammar.
+
+Builds a compact syntax tree of the rules found in each section of a rule
+file:
+
+- ordering rules ([Order], [NearStart], [NearEnd]) hold a tuple of plugin
+  names;
+- other rules ([Conflict], [Requires], [Patch], [Note]) hold an optional
+  message and a tuple of expressions, where an expression is either a plugin
+  name or an Expr for [ALL ...], [ANY ...], [NOT ...], [SIZE n plugin],
+  [VER op version plugin] or [DESC /regex/ plugin];
+- [Version ...] rules hold their argument text.
+
+Plugin names are interned strings, so each distinct name is stored once no
+matter how many rules mention it. Syntax problems do not stop parsing; they
+are collected as RuleError records.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import collections
+import logging
+import re
+import sys
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+ORDERING_RULES = frozenset(("ORDER", "NEARSTART", "NEAREND"))
+EXPRESSION_RULES = frozenset(("CONFLICT", "REQUIRES", "PATCH", "NOTE"))
+RULE_KINDS = ORDERING_RULES | EXPRESSION_RULES | frozenset(("VERSION",))
+EXPRESSION_OPS = frozenset(("ALL", "ANY", "NOT", "SIZE", "VER", "DESC"))
+
+# Number of expressions each rule kind takes: (minimum, maximum).
+_rule_arity = {
+    "CONFLICT": (2, None),
+    "REQUIRES": (2, 2),
+    "PATCH": (2, 2),
+    "NOTE": (1, None),
+}
+
+rule_header_regex = re.compile(r"\[(?P<kind>[A-Za-z]+)(?P<arg>[^\]]*)\](?P<rest>.*)")
+expression_token_regex = re.compile(
+    r"""\s*(?:
+        \[(?P<op>ALL|ANY|NOT)\b
+      | \[SIZE\s+(?P<size>!?\d+)\s+
+      | \[VER\s+(?P<ver_op>[<>=])\s*(?P<version>[^\s\]]+)\s+
+      | \[DESC\s+(?P<desc_negated>!?)/(?P<desc>.*?)/\s+
+      | (?P<close>\])
+      | (?P<plugin>[^\s\[\]].*?\.(?:esp|esm))(?=\s|\]|$)
+    )""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+RuleError = collections.namedtuple("RuleError", "section line_number message")
+
+
+class Expr(object):
+    """
+    Rule expression node.
+
+    Attributes
+    ----------
+    op : string
+        one of "ALL", "ANY", "NOT", "SIZE", "VER" or "DESC".
+    args : tuple
+        operands. For ALL, ANY and NOT these are expressions; SIZE has
+        (size, negated, plugin), VER has (operator, version, plugin) and
+        DESC has (pattern, negated, plugin).
+
+    """
+    __slots__ = ("op", "args")
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+
+    def __eq__(self, other):
+        if not isinstance(other, Expr):
+            return NotImplemented
+        return (self.op, self.args) == (other.op, other.args)
+
+    def __hash__(self):
+        return hash((self.op, self.args))
+
+    def __repr__(self):
+        return f"Expr({self.op!r}, {self.args!r})"
+
+    @property
+    def operands(self):
+        """Sub-expressions of the node (the plugin, for SIZE, VER and DESC)."""
+        if self.op in ("ALL", "ANY", "NOT"):
+            return self.args
+        return self.args[-1:]
+
+
+class Rule(object):
+    """
+    One rule of a rule file.
+
+    Attributes
+    ----------
+    kind : string
+        upper-case rule keyword, e.g. "ORDER" or "CONFLICT".
+    section : string
+        name of the section containing the rule.
+    line_number : int
+        1-based line number of the rule keyword.
+    message : string or None
+        message text of expression rules.
+    items : tuple
+        plugin names of ordering rules, or expressions of expression rules.
+    arg : string
+        text following the keyword inside the brackets, e.g. the date of a
+        [Version ...] rule.
+
+    """
+    __slots__ = ("kind", "section", "line_number", "message", "items", "arg")
+
+    def __init__(self, kind, section, line_number, message = None, items = (), arg = ""):
+        self.kind = kind
+        self.section = section
+        self.line_number = line_number
+        self.message = message
+        self.items = items
+        self.arg = arg
+
+    def __eq__(self, other):
+        if not isinstance(other, Rule):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __repr__(self):
+        return f"Rule{self.astuple()!r}"
+
+    def astuple(self):
+        return (self.kind, self.section, self.line_number, self.message, self.items, self.arg)
+
+    def plugins(self):
+        """Generates every plugin name mentioned by the rule."""
+        return iter_plugins(self.items)
+
+
+def iter_plugins(exprs):
+    """Generates every plugin name in a sequence of expressions."""
+    stack = list(reversed(exprs))
+    while stack:
+        expr = stack.pop()
+        if isinstance(expr, str):
+            yield expr
+        else:
+            stack.extend(reversed(expr.operands))
+
+
+class RuleParser(object):
+    """
+    Parses rule text into Rule objects, collecting syntax problems in
+    `errors` instead of raising.
+    """
+    def __init__(self):
+        self.errors = list()
+        self._names = dict()
+
+    def intern(self, name):
+        # A local table is cheaper than sys.intern for repeated lookups, and
+        # still hands out one string object per distinct name.
+        interned = self._names.get(name)
+        if interned is None:
+            interned = self._names[name] = sys.intern(name)
+        return interned
+
+    def error(self, section, line_number, message):
+        _logger.debug(f"{section}: line {line_number}: {message}")
+        self.errors.append(RuleError(section, line_number, message))
+
+    def parse_lines(self, lines, first_line = 1, section = "_header"):
+        """
+        Parses the rules in a sequence of lines.
+
+        Parameters
+        ----------
+        lines : iterable of strings
+            lines of rule text.
+        first_line : int, optional
+            1-based line number of the first line.
+        section : string, optional
+            name of the section the lines belong to.
+
+        Returns
+        -------
+        rules : list of Rule
+            rules in the order they appear.
+
+        """
+        rules = list()
+        kind = None
+        rule = None
+        message = list()
+        items = list()
+        stack = list()
+
+        def finish():
+            if rule is None:
+                return
+            if stack:
+                self.error(section, rule.line_number, f"unclosed [{stack[-1][0]} in [{rule.kind}] rule")
+                del stack[:]
+            rule.message = "\n".join(message) if message else None
+            rule.items = tuple(items)
+            arity = _rule_arity.get(rule.kind)
+            if arity is not None:
+                minimum, maximum = arity
+                if len(items) < minimum or (maximum is not None and len(items) > maximum):
+                    self.error(section, rule.line_number, f"[{rule.kind}] rule has {len(items)} expressions")
+            rules.append(rule)
+
+        for line_number, line in enumerate(lines, first_line):
+            comment = line.find(";")
+            if comment >= 0:
+                line = line[:comment]
+            line = line.rstrip()
+            if not line or line.isspace():
+                continue
+
+            if line[0] == "[":
+                header_match = rule_header_regex.match(line)
+                if header_match and header_match.group("kind").upper() not in EXPRESSION_OPS:
+                    finish()
+                    message = list()
+                    items = list()
+                    kind = header_match.group("kind").upper()
+                    if kind not in RULE_KINDS:
+                        self.error(section, line_number, f"unknown rule [{header_match.group('kind')}]")
+                        rule = None
+                        continue
+                    rule = Rule(kind, section, line_number, arg = header_match.group("arg").strip())
+                    rest = header_match.group("rest").strip()
+                    if rest:
+                        if kind in EXPRESSION_RULES:
+                            message.append(rest)
+                        else:
+                            self.error(section, line_number, f"unexpected text after [{kind}]")
+                    continue
+
+            if rule is None:
+                if kind is None:
+                    self.error(section, line_number, "text outside of any rule")
+                # Otherwise the lines of an unknown rule are skipped.
+                continue
+
+            if kind in ORDERING_RULES:
+                items.append(self.intern(line.strip()))
+            elif kind in EXPRESSION_RULES:
+                if line[0] in " \t" and not items and not stack:
+                    message.append(line.strip())
+                else:
+                    self._parse_expressions(line, items, stack, section, line_number)
+            else:
+                self.error(section, line_number, f"unexpected text in [{kind}] rule")
+
+        finish()
+        return rules
+
+    def _parse_expressions(self, line, items, stack, section, line_number):
+        # The stack holds [op, operands, extra] for each open bracket.
+        pos = 0
+        end = len(line)
+        while pos < end:
+            token = expression_token_regex.match(line, pos)
+            if token is None:
+                if not line[pos:].isspace():
+                    self.error(section, line_number, f"cannot parse {line[pos:].strip()!r}")
+                return
+            pos = token.end()
+            group = token.lastgroup
+            if group == "plugin":
+                node = self.intern(token.group("plugin"))
+            elif group == "op":
+                stack.append([token.group("op").upper(), list(), None])
+                continue
+            elif group == "size":
+                size = token.group("size")
+                stack.append(["SIZE", list(), (int(size.lstrip("!")), size.startswith("!"))])
+                continue
+            elif group == "version":
+                stack.append(["VER", list(), (token.group("ver_op"), token.group("version"))])
+                continue
+            elif group == "desc":
+                stack.append(["DESC", list(), (token.group("desc"), bool(token.group("desc_negated")))])
+                continue
+            else:
+                # Closing bracket.
+                if not stack:
+                    self.error(section, line_number, "unmatched ]")
+                    continue
+                op, operands, extra = stack.pop()
+                if op in ("ALL", "ANY"):
+                    if not operands:
+                        self.error(section, line_number, f"empty [{op}]")
+                    node = Expr(op, tuple(operands))
+                elif op == "NOT":
+                    if len(operands) != 1:
+                        self.error(section, line_number, f"[NOT] takes one expression, not {len(operands)}")
+                    node = Expr(op, tuple(operands))
+                else:
+                    if len(operands) != 1 or not isinstance(operands[0], str):
+                        self.error(section, line_number, f"[{op}] takes one plugin name")
+                        continue
+                    node = Expr(op, extra + (operands[0],))
+            if stack:
+                stack[-1][1].append(node)
+            else:
+                items.append(node)
+
+    def parse_table(self, table, texts = None):
+        """
+        Parses the rules in every section of a SectionTable.
+
+        Parameters
+        ----------
+        table : sections.SectionTable
+            sections to parse.
+        texts : list of strings, optional
+            decoded text of each section of table, for callers that need it
+            too; decoded here otherwise.
+
+        Returns
+        -------
+        rules : list of Rule
+            rules of all sections, in file order.
+
+        """
+        rules = list()
+        for section_num, section in enumerate(table):
+            if len(section) == 0:
+                continue
+            text = table.text(section) if texts is None else texts[section_num]
+            lines = text.splitlines()
+            rules.extend(self.parse_lines(lines, section.start_line, section.name))
+        return rules
+
+
+def parse_rules(table, texts = None):
+    """
+    Parses the rules of a SectionTable, given the decoded text of its
+    sections if already at hand.
+
+    Returns
+    -------
+    (rules, errors) : tuple
+        list of Rule in file order, and list of RuleError.
+
+    """
+    parser = RuleParser()
+    rules = parser.parse_table(table, texts)
+    return rules, parser.errors
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Compact, offset-based section tables over memory-mapped rule files.
+
+A section is stored as byte offsets and line numbers into the source file,
+plus its interned name, so that tables stay small no matter how large the
+rule file is. Section text is only sliced out of the mapped file on demand.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import contextlib
+import functools
+import logging
+import mmap
+import os
+import re
+import sys
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+# Byte-oriented versions of the regexes used by MloxRuleManager.
+comment_regex = re.compile(rb"\s*;+\s*")
+sectionname_regex = re.compile(rb"\s*;+\s*@(.*)")
+section_name_regex_2 = re.compile(rb"\s*;+\s*@(?P<mod_name>.*?)\s*(?: \[(?P<author>.*)\])")
+
+# Line ends, as in universal-newline mode.
+line_end_regex = re.compile(rb"\r\n?|\n")
+lone_cr_regex = re.compile(rb"\r(?!\n)")
+
+# Characters that \s matches in the text regexes of MloxRuleManager, but not
+# in bytes regexes, and the first bytes of their UTF-8 encodings.
+UNICODE_SPACES = "\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000"
+unicode_space_regex = re.compile(b"|".join(re.escape(space.encode("utf-8")) for space in UNICODE_SPACES))
+_unicode_space_lead_bytes = sorted({space.encode("utf-8")[:1] for space in UNICODE_SPACES})
+
+
+@functools.lru_cache(maxsize = None)
+def text_regex(regex):
+    """Returns the text version of a bytes regex."""
+    return re.compile(regex.pattern.decode("ascii"), regex.flags)
+
+
+class _DecodedLineMatch(object):
+    """
+    Match of a text regex against a decoded line, standing in for a match
+    of the bytes regex: groups are encoded back into the bytes they came
+    from.
+    """
+    __slots__ = ("match",)
+
+    def __init__(self, match):
+        self.match = match
+
+    def group(self, group = 0):
+        text = self.match.group(group)
+        return None if text is None else text.encode("utf-8", "surrogateescape")
+
+
+def has_unicode_spaces(buf):
+    """Whether buf holds any of UNICODE_SPACES, encoded as UTF-8."""
+    find = buf.find
+    return any(find(lead) >= 0 for lead in _unicode_space_lead_bytes) and unicode_space_regex.search(buf) is not None
+
+
+def unicode_space_matcher(regex):
+    """
+    Returns a function like regex.match(buf, pos, endpos) that matches lines
+    holding any of UNICODE_SPACES with the text version of regex instead.
+    """
+    match_bytes = regex.match
+    match_text = text_regex(regex).match
+    search_unicode_space = unicode_space_regex.search
+
+    def match(buf, pos, endpos):
+        if search_unicode_space(buf, pos, endpos) is None:
+            return match_bytes(buf, pos, endpos)
+        text_match = match_text(bytes(buf[pos:endpos]).decode("utf-8", "surrogateescape"))
+        return text_match and _DecodedLineMatch(text_match)
+    return match
+
+
+def section_key(match):
+    """
+    Names a section by mod name and author, as in "mod_name [author]".
+
+    Parameters
+    ----------
+    match : re.Match
+        match of section_name_regex_2 against a section-name line.
+
+    Returns
+    -------
+    (name, mod_name, author) : tuple of strings
+        interned section name, mod name and author.
+
+    """
+    mod_name = sys.intern(match.group("mod_name").decode("utf-8"))
+    author = sys.intern(match.group("author").decode("utf-8"))
+    return sys.intern(f"{mod_name} [{author}]"), mod_name, author
+
+
+# Bytes that str.strip() treats as whitespace when decoded.  Any other byte
+# below 0x80 is never whitespace; bytes from 0x80 up may start a multi-byte
+# whitespace character, so spans with those at their edges are decoded.
+_text_whitespace = frozenset(b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")
+
+
+def stripped_span(buf, start, end):
+    """
+    Trims whitespace from both ends of buf[start:end] without copying.
+
+    Returns
+    -------
+    (start, end) : tuple of int, or None
+        trimmed offsets, or None if the span has to be decoded to strip it
+        exactly as str.strip() would.
+
+    """
+    while start < end and buf[start] in _text_whitespace:
+        start += 1
+    while end > start and buf[end - 1] in _text_whitespace:
+        end -= 1
+    if start < end and (buf[start] >= 0x80 or buf[end - 1] >= 0x80):
+        return None
+    return start, end
+
+
+def text_output_chunks(buf, start, end, encoding = "utf-8", linesep = os.linesep):
+    """
+    Renders buf[start:end] the way `split` has always written sections.
+
+    The result is byte-identical to writing coalesce_lines(lines) followed by
+    os.linesep to a text-mode file, where lines were read in text mode. In
+    the common case (no carriage returns, ASCII edges, "\n" line separator)
+    the section is returned as a memoryview slice of buf, without copying.
+
+    Returns
+    -------
+    chunks : list of bytes-like objects
+        chunks to be written in order.
+
+    """
+    span = None
+    if linesep == "\n" and buf.find(b"\r", start, end) < 0:
+        span = stripped_span(buf, start, end)
+    if span is not None:
+        start, end = span
+        return [memoryview(buf)[start:end], b"\n"]
+
+    # Slow path: decode, normalise newlines as text mode reading would,
+    # strip, and translate newlines as text mode writing would.
+    text = bytes(buf[start:end]).decode(encoding)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = text.strip() + linesep
+    if linesep != "\n":
+        text = text.replace("\n", linesep)
+    return [text.encode(encoding)]
+
+
+def section_sort_key(section):
+    return section.name
+
+
+def is_sorted(section_list):
+    """Tells whether sections are in alphabetical order of section name."""
+    return all(
+        previous.name <= section.name
+        for previous, section in zip(section_list, section_list[1:])
+    )
+
+
+class Section(object):
+    """
+    Location of one section within a rule file.
+
+    Attributes
+    ----------
+    name : string
+        interned section name ("_header" for the header section).
+    mod_name : string
+        interned mod name.
+    author : string
+        interned author.
+    line_number : int
+        0-based line number of the section-name line, as in the section
+        info of MloxRuleManager.parse_rulefile_2.
+    start_line : int
+        1-based line number of the first line of the section.
+    start : int
+        byte offset of the start of the section.
+    end : int
+        byte offset just past the end of the section.
+
+    """
+    __slots__ = ("name", "mod_name", "author", "line_number", "start_line", "start", "end")
+
+    def __init__(self, name, mod_name, author, line_number, start_line, start, end):
+        self.name = name
+        self.mod_name = mod_name
+        self.author = author
+        self.line_number = line_number
+        self.start_line = start_line
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def name_line(self):
+        """1-based line number of the section-name line, as commands report it."""
+        return self.line_number + 1
+
+    def __eq__(self, other):
+        if not isinstance(other, Section):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __repr__(self):
+        return f"Section{self.astuple()!r}"
+
+    def astuple(self):
+        return (self.name, self.mod_name, self.author, self.line_number, self.start_line, self.start, self.end)
+
+
+def sections_from_tuples(rows):
+    """
+    Rebuilds Section records from Section.astuple() tuples, e.g. after
+    unpickling, interning their names again.
+    """
+    names = dict()
+    def intern(name):
+        interned = names.get(name)
+        if interned is None:
+            interned = names[name] = sys.intern(name)
+        return interned
+    return [
+        Section(intern(name), intern(mod_name), intern(author), *locations)
+        for name, mod_name, author, *locations in rows
+    ]
+
+
+def iter_sections(buf, section_regex = section_name_regex_2, naming = section_key):
+    """
+    Generates the sections of a rule file held in a bytes-like buffer.
+
+    Lines are matched in place, so no line strings are created; only the
+    names of sections are decoded. As when reading in universal-newline
+    mode, "\n", "\r\n" and a lone "\r" all end a line. Lines holding any of
+    UNICODE_SPACES are decoded and matched by the text version of the
+    regexes, so that they are matched as MloxRuleManager matches them.
+
+    Parameters
+    ----------
+    buf : bytes-like object
+        contents of the rule file, e.g. an mmap.
+    section_regex : re.Pattern, optional
+        bytes regex matching section-name lines.
+    naming : callable, optional
+        maps a section_regex match to a (name, mod_name, author) tuple.
+
+    Yields
+    ------
+    section : Section
+        each section in file order, starting with the "_header" section.
+
+    """
+    size = len(buf)
+    find = buf.find
+    match_section = section_regex.match
+    match_comment = comment_regex.match
+    # A lone "\r" is rare, so lines are found with the faster buf.find,
+    # unless the file has one.
+    search_line_end = None
+    if find(b"\r") >= 0 and lone_cr_regex.search(buf):
+        search_line_end = line_end_regex.search
+    # Likewise for spaces that only text regexes take for \s.
+    if has_unicode_spaces(buf):
+        match_section = unicode_space_matcher(section_regex)
+        match_comment = unicode_space_matcher(comment_regex)
+
+    section = Section("_header", "_header", "", 1, 1, 0, size)
+    # Offset and line number of a run of comment lines that might belong to
+    # the next section.
+    comment_start = None
+    comment_line = None
+
+    pos = 0
+    line_num = 0
+    while pos < size:
+        if search_line_end is None:
+            eol = find(b"\n", pos)
+            next_pos = eol + 1
+        else:
+            line_end = search_line_end(buf, pos)
+            eol, next_pos = (line_end.start(), line_end.end()) if line_end else (-1, size)
+        if eol < 0:
+            eol = next_pos = size
+        section_name_match = match_section(buf, pos, eol)
+        if section_name_match:
+            if comment_start is None:
+                comment_start = pos
+                comment_line = line_num + 1
+            section.end = comment_start
+            yield section
+            name, mod_name, author = naming(section_name_match)
+            section = Section(name, mod_name, author, line_num, comment_line, comment_start, size)
+            comment_start = None
+        elif match_comment(buf, pos, eol):
+            if comment_start is None:
+                comment_start = pos
+                comment_line = line_num + 1
+        else:
+            comment_start = None
+        pos = next_pos
+        line_num += 1
+
+    section.end = size
+    yield section
+
+
+class SectionTable(object):
+    """
+    Sections of a rule file, backed by a (usually memory-mapped) buffer.
+
+    Parameters
+    ----------
+    buf : bytes-like object
+        contents of the rule file.
+    sections : list of Section
+        sections of the file in file order, starting with the header.
+
+    """
+    def __init__(self, buf, sections):
+        self.buf = buf
+        self.sections = sections
+
+    @property
+    def header(self):
+        return self.sections[0]
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def data(self, section):
+        """Returns the raw bytes of a section."""
+        return self.buf[section.start:section.end]
+
+    def text(self, section, encoding = "utf-8"):
+        """Returns the decoded text of a section."""
+        return self.data(section).decode(encoding)
+
+
+@contextlib.contextmanager
+def mapped_file(filename):
+    """
+    Memory-maps a file read-only; empty files map to an empty bytes object.
+    """
+    with open(filename, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            buf = b""
+        try:
+            yield buf
+        finally:
+            if isinstance(buf, mmap.mmap):
+                try:
+                    buf.close()
+                except BufferError:
+                    # A memoryview is still alive, e.g. in a traceback; the
+                    # map is released when it is collected.
+                    _logger.debug(f"deferring unmap of '{filename}'")
+
+
+@contextlib.contextmanager
+def section_table_factory(filename, section_regex = section_name_regex_2, naming = section_key):
+    """
+    Scans a rule file into a SectionTable over a memory map of the file.
+    """
+    with mapped_file(filename) as buf:
+        yield SectionTable(buf, list(iter_sections(buf, section_regex, naming)))
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+Detection of duplicate and near-duplicate section bodies, and of similar
+section names.
+
+A section body is normalized by dropping comment and blank lines (including
+the section name line), lower-casing and collapsing whitespace, so the same
+rules pasted under another name, with other comments or spacing, normalize
+to the same text. Exact duplicates are found by hashing normalized bodies.
+
+Near duplicates are found with MinHash signatures of the sets of word pairs
+("shingles") of each body, and locality-sensitive hashing: signatures are cut
+into bands, and only sections sharing a band are compared. Signatures use one
+hash per shingle (one-permutation hashing with densification) instead of one
+per shingle and permutation, and candidates are checked with their exact
+Jaccard similarity. Boilerplate shingles found in a large share of all
+sections are left out of signatures, so that they don't make every short
+section a candidate for every other.
+
+Similar names are names within a small edit distance of each other, after
+normalizing case and spacing. Candidates come from a pigeonhole index: a name
+cut into k + 1 segments keeps at least one of them intact, near the same
+position, under k edits, so only names sharing such a segment are compared.
+As segments of common words and author names are shared by many names,
+candidates are then checked against their sets of character pairs, which k
+edits change by at most 2k pairs each way (first as bits of an integer,
+then exactly), before their edit distance is computed.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import collections
+import hashlib
+import logging
+import re
+import zlib
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+NEAR_DUPLICATE_THRESHOLD = 0.7
+# Bodies with fewer shingles are too short to be called similar.
+MIN_SHINGLES = 3
+# Shingles found in more bodies than this share (and this number) are
+# boilerplate.
+COMMON_SHINGLE_SHARE = 0.01
+COMMON_SHINGLE_COUNT = 20
+# Larger LSH buckets are not compared pairwise.
+MAX_BUCKET_SIZE = 200
+
+SIGNATURE_BITS = 5
+SIGNATURE_SIZE = 1 << SIGNATURE_BITS
+BANDS = 8
+ROWS = SIGNATURE_SIZE // BANDS
+
+DEFAULT_NAME_DISTANCE = 2
+GRAM_MASK_BITS = 128
+
+digits_regex = re.compile(r"\d+")
+
+_VALUE_BITS = 32 - SIGNATURE_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+
+
+def normalized_body(text):
+    """Normalizes the text of a section for comparison with other sections."""
+    lines = list()
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith(";"):
+            lines.append(" ".join(line.lower().split()))
+    return "\n".join(lines)
+
+
+def body_digest(body):
+    return hashlib.blake2b(body.encode("utf-8"), digest_size = 16).digest()
+
+
+def shingles(body):
+    """Returns the set of hashes of consecutive word pairs of a body."""
+    words = body.split()
+    if len(words) < 2:
+        return {zlib.crc32(word.encode("utf-8")) for word in words}
+    return {
+        zlib.crc32(f"{first} {second}".encode("utf-8"))
+        for first, second in zip(words, words[1:])
+    }
+
+
+def minhash_signature(shingle_set):
+    """
+    Returns the MinHash signature of a set of shingle hashes: the minimum of
+    the hash values falling in each of SIGNATURE_SIZE bins, with empty bins
+    borrowing from the next non-empty one.
+    """
+    signature = [None] * SIGNATURE_SIZE
+    for shingle in shingle_set:
+        # Spread the bits of the hash before splitting it into bin and value.
+        mixed = (shingle * 0x9E3779B1) & 0xFFFFFFFF
+        bin_number = mixed >> _VALUE_BITS
+        value = mixed & _VALUE_MASK
+        current = signature[bin_number]
+        if current is None or value < current:
+            signature[bin_number] = value
+    if None in signature and shingle_set:
+        # Walk backwards (circularly) from a non-empty bin, so each empty bin
+        # knows the nearest non-empty bin to its right.
+        start = max(bin_number for bin_number in range(SIGNATURE_SIZE) if signature[bin_number] is not None)
+        nearest = signature[start]
+        distance = 0
+        for step in range(1, SIGNATURE_SIZE):
+            bin_number = (start - step) % SIGNATURE_SIZE
+            distance += 1
+            if signature[bin_number] is None:
+                # Offset borrowed values so they only match the same borrowing.
+                signature[bin_number] = -(nearest + distance * (_VALUE_MASK + 1))
+            else:
+                nearest = signature[bin_number]
+                distance = 0
+    return signature
+
+
+def jaccard(first, second):
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def exact_duplicates(bodies):
+    """
+    Groups identical non-empty bodies.
+
+    Returns
+    -------
+    groups : list of lists of ints
+        indexes of bodies in each group of two or more identical bodies, in
+        order of their first body.
+
+    """
+    groups = dict()
+    for i, body in enumerate(bodies):
+        if body:
+            groups.setdefault(body_digest(body), list()).append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def near_duplicates(bodies, threshold = NEAR_DUPLICATE_THRESHOLD):
+    """
+    Finds pairs of different bodies with a Jaccard similarity of their
+    shingles of at least threshold.
+
+    Returns
+    -------
+    pairs : list of (i, j, similarity) tuples
+        indexes i < j of similar bodies, by i and j. Of several identical
+        bodies, only the first is paired.
+
+    """
+    seen = set()
+    shingle_sets = dict()
+    frequencies = collections.Counter()
+    for i, body in enumerate(bodies):
+        if not body or body in seen:
+            continue
+        seen.add(body)
+        shingle_set = shingles(body)
+        if len(shingle_set) >= MIN_SHINGLES:
+            shingle_sets[i] = shingle_set
+            frequencies.update(shingle_set)
+    max_frequency = max(COMMON_SHINGLE_COUNT, COMMON_SHINGLE_SHARE * len(shingle_sets))
+    common = {shingle for shingle, frequency in frequencies.items() if frequency > max_frequency}
+
+    buckets = dict()
+    for i, shingle_set in shingle_sets.items():
+        signature_set = shingle_set - common if common else shingle_set
+        if not signature_set:
+            # Nothing but boilerplate; only exact duplicates are of interest.
+            continue
+        signature = minhash_signature(signature_set)
+        for band in range(BANDS):
+            key = (band, tuple(signature[band * ROWS:(band + 1) * ROWS]))
+            buckets.setdefault(key, list()).append(i)
+
+    candidates = set()
+    for bucket in buckets.values():
+        if len(bucket) > MAX_BUCKET_SIZE:
+            _logger.debug(f"skipping near-duplicate bucket of {len(bucket)} bodies")
+            continue
+        for position, i in enumerate(bucket):
+            for j in bucket[position + 1:]:
+                candidates.add((i, j))
+    _logger.debug(f"{len(candidates)} near-duplicate candidates among {len(shingle_sets)} bodies")
+
+    pairs = list()
+    for i, j in sorted(candidates):
+        similarity = jaccard(shingle_sets[i], shingle_sets[j])
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+    return pairs
+
+
+def normalized_name(name):
+    return " ".join(name.lower().split())
+
+
+def name_grams(name):
+    """Returns the set of pairs of consecutive characters of a name."""
+    return frozenset(name[i:i + 2] for i in range(len(name) - 1))
+
+
+def gram_mask(grams):
+    """
+    Returns the character pairs of a name hashed into the bits of an
+    integer. A pair of one name not in another sets at most one bit of the
+    first that is not set in the second.
+    """
+    mask = 0
+    for gram in grams:
+        mask |= 1 << (hash(gram) % GRAM_MASK_BITS)
+    return mask
+
+
+def edit_distance(first, second, max_distance):
+    """
+    Returns the Levenshtein distance between two strings, or max_distance +
+    1 if it is larger than max_distance. Only the band of the distance
+    matrix within max_distance of its diagonal is computed.
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    if len(first) > len(second):
+        first, second = second, first
+    too_far = max_distance + 1
+    second_length = len(second)
+    previous = [min(j, too_far) for j in range(second_length + 1)]
+    for i, first_char in enumerate(first, 1):
+        low = max(1, i - max_distance)
+        high = min(second_length, i + max_distance)
+        current = [too_far] * (second_length + 1)
+        if low == 1:
+            current[0] = min(i, too_far)
+        best = current[low - 1]
+        for j in range(low, high + 1):
+            value = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (first_char != second[j - 1]),
+            )
+            current[j] = value if value < too_far else too_far
+            if value < best:
+                best = value
+        if best > max_distance:
+            return too_far
+        previous = current
+    return previous[second_length]
+
+
+class NameIndex(object):
+    """
+    Index of strings for finding those within an edit distance of a query.
+
+    Parameters
+    ----------
+    max_distance : int
+        largest edit distance searched for.
+
+    """
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        # (length, segment number, segment text) -> ids of strings.
+        self._segments = dict()
+        # Strings too short to cut into segments, by length.
+        self._short = dict()
+        # Length -> segments of strings of that length.
+        self._segment_lists = dict()
+
+    def segments(self, length):
+        """Returns (start, size) of the segments of strings of a length."""
+        segments = self._segment_lists.get(length)
+        if segments is not None:
+            return segments
+        count = self.max_distance + 1
+        size, longer = divmod(length, count)
+        segments = list()
+        start = 0
+        for number in range(count):
+            segment_size = size + (number >= count - longer)
+            segments.append((start, segment_size))
+            start += segment_size
+        self._segment_lists[length] = segments
+        return segments
+
+    def add(self, string_id, string):
+        length = len(string)
+        if length <= self.max_distance:
+            self._short.setdefault(length, list()).append(string_id)
+            return
+        for number, (start, size) in enumerate(self.segments(length)):
+            key = (length, number, string[start:start + size])
+            self._segments.setdefault(key, list()).append(string_id)
+
+    def candidates(self, string):
+        """
+        Returns the ids of indexed strings that might be within
+        max_distance of string.
+        """
+        max_distance = self.max_distance
+        found = set()
+        for length in range(len(string) - max_distance, len(string) + max_distance + 1):
+            if length <= max_distance:
+                found.update(self._short.get(length, ()))
+                continue
+            shift = len(string) - length
+            for number, (start, size) in enumerate(self.segments(length)):
+                # Segment number keeps its place if the edits before it
+                # (at most number) and after it (at most max_distance -
+                # number) make up for the difference in length.
+                first = max(start - number, start + shift - (max_distance - number), 0)
+                last = min(start + number, start + shift + (max_distance - number), len(string) - size)
+                for position in range(first, last + 1):
+                    found.update(self._segments.get((length, number, string[position:position + size]), ()))
+        return found
+
+
+def similar_names(names, max_distance = DEFAULT_NAME_DISTANCE):
+    """
+    Finds pairs of names that differ only in case and spacing, or by at most
+    max_distance edits. Names differing only in their numbers, as in "mod1
+    [author1]" and "mod2 [author2]", are taken to be deliberately different.
+
+    Parameters
+    ----------
+    names : list of strings
+        distinct names.
+    max_distance : int, optional
+        largest number of edits between similar names.
+
+    Returns
+    -------
+    pairs : list of (distance, i, j) tuples
+        indexes i < j of similar names and their edit distance after
+        normalization, most similar first.
+
+    """
+    pairs = list()
+    keys = [normalized_name(name) for name in names]
+    numberless_keys = [digits_regex.sub("", key) for key in keys]
+    grams = [name_grams(key) for key in keys]
+    masks = [gram_mask(key_grams) for key_grams in grams]
+    # An edit removes at most two character pairs of a name; pairs found
+    # elsewhere in it count only once.
+    max_lost_grams = 2 * max_distance
+    first_ids = dict()
+    index = NameIndex(max_distance)
+    for name_id, key in enumerate(keys):
+        first_id = first_ids.get(key)
+        if first_id is not None:
+            pairs.append((0, first_id, name_id))
+            continue
+        first_ids[key] = name_id
+        # Names sharing a segment with this one often share little else, so
+        # they are checked first by their character pairs, hashed then exact.
+        mask = masks[name_id]
+        not_mask = ~mask
+        candidates = [
+            other_id for other_id in index.candidates(key)
+            if bin(masks[other_id] & not_mask).count("1") <= max_lost_grams
+            and bin(mask & ~masks[other_id]).count("1") <= max_lost_grams
+        ]
+        key_grams = grams[name_id]
+        for other_id in candidates:
+            if numberless_keys[name_id] == numberless_keys[other_id]:
+                continue
+            if (len(key_grams - grams[other_id]) > max_lost_grams
+                    or len(grams[other_id] - key_grams) > max_lost_grams):
+                continue
+            distance = edit_distance(key, keys[other_id], max_distance)
+            if distance <= max_distance:
+                pairs.append((distance, other_id, name_id))
+        index.add(name_id, key)
+
+    def similarity(pair):
+        distance, i, j = pair
+        return distance / max(len(names[i]), len(names[j]))
+    pairs.sort(key = lambda pair: (pair[0], similarity(pair), pair[1], pair[2]))
+    return pairs
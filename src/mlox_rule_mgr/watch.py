@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Polling file watcher, for rebuilding outputs when rule files change.
+
+The watcher stats the files it is given in batches, one directory scan per
+directory, and reports changes once a burst of edits has settled down.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import contextlib
+import logging
+import os
+import time
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 0.3
+
+
+def stat_files(filenames):
+    """
+    Returns {filename: (size, mtime_ns)} of the existing files among
+    filenames, scanning each of their directories once.
+    """
+    by_directory = dict()
+    for filename in filenames:
+        directory, name = os.path.split(filename)
+        by_directory.setdefault(directory, dict())[name] = filename
+
+    stats = dict()
+    for directory, names in by_directory.items():
+        try:
+            dir_entries = os.scandir(directory or os.curdir)
+        except OSError:
+            continue
+        with dir_entries:
+            for dir_entry in dir_entries:
+                filename = names.get(dir_entry.name)
+                if filename is None:
+                    continue
+                with contextlib.suppress(OSError):
+                    stat = dir_entry.stat()
+                    stats[filename] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+class PollingWatcher(object):
+    """
+    Watches a changing set of files by polling.
+
+    Parameters
+    ----------
+    list_files : function
+        returns the paths of the files to watch; called on every poll, so
+        that new files are noticed.
+    interval : float, optional
+        seconds between polls.
+    debounce : float, optional
+        seconds without further changes after which a burst of changes is
+        reported.
+
+    """
+    def __init__(self, list_files, interval = DEFAULT_INTERVAL, debounce = DEFAULT_DEBOUNCE):
+        self.list_files = list_files
+        self.interval = interval
+        self.debounce = debounce
+        self.stats = stat_files(list_files())
+
+    def poll(self):
+        """Returns the set of files added, removed or modified since the last poll."""
+        stats = stat_files(self.list_files())
+        changed = {
+            filename for filename in stats.keys() | self.stats.keys()
+            if stats.get(filename) != self.stats.get(filename)
+        }
+        self.stats = stats
+        return changed
+
+    def wait(self):
+        """
+        Blocks until some files changed and then stayed unchanged for
+        debounce seconds, and returns the set of changed files.
+        """
+        changed = set()
+        last_change = None
+        while True:
+            time.sleep(self.interval)
+            new_changes = self.poll()
+            now = time.monotonic()
+            if new_changes:
+                _logger.debug(f"changed: {sorted(new_changes)}")
+                changed |= new_changes
+                last_change = now
+            elif changed and now - last_change >= self.debounce:
+                return changed
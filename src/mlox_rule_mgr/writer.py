@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent writing of many small output files.
+
+Writing thousands of section files one after another is dominated by the
+latency of opening and closing each file, so FileWriter overlaps them in a
+bounded thread pool.
+
+@author: Kaben Nanlohy <kaben.nanlohy@gmail.com>
+"""
+
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+_logger = logging.getLogger(__name__)
+
+
+DEFAULT_THREADS = 8
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def fsync_directory(directory):
+    """Flushes directory entries to disk, where the platform allows it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError as e:
+        _logger.debug(f"cannot open directory '{directory}' for fsync: {e}")
+        return
+    try:
+        os.fsync(fd)
+    except OSError as e:
+        _logger.debug(f"cannot fsync directory '{directory}': {e}")
+    finally:
+        os.close(fd)
+
+
+class FileWriter(object):
+    """
+    Writes whole files from a bounded thread pool.
+
+    Parameters
+    ----------
+    threads : int, optional
+        number of writer threads.
+    buffer_size : int, optional
+        write buffer size of each file.
+    fsync_directory : string, optional
+        directory to fsync once all files are written.
+
+    Attributes
+    ----------
+    files_written, bytes_written : int
+        totals so far.
+
+    """
+    def __init__(self, threads = DEFAULT_THREADS, buffer_size = DEFAULT_BUFFER_SIZE, fsync_directory = None):
+        self.threads = max(threads, 1)
+        self.buffer_size = buffer_size
+        self.fsync_directory = fsync_directory
+        self.files_written = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        # Bounds the number of files waiting to be written.
+        self._slots = threading.BoundedSemaphore(self.threads * 4)
+        self._futures = list()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers = self.threads)
+        self._start_time = time.perf_counter()
+        self.elapsed = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+        # Don't mask the original error with errors of other files.
+        for future in self._futures:
+            future.cancel()
+        self._executor.shutdown(wait = True)
+
+    def submit(self, filename, chunks):
+        """
+        Queues a file to be written, blocking while too many are queued.
+
+        Parameters
+        ----------
+        filename : string
+            path of the file to (over)write.
+        chunks : list of bytes-like objects
+            file contents.
+
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, filename, chunks)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _write(self, filename, chunks):
+        size = 0
+        with open(filename, "wb", buffering = self.buffer_size) as f:
+            for chunk in chunks:
+                size += f.write(chunk)
+        with self._lock:
+            self.files_written += 1
+            self.bytes_written += size
+
+    def close(self):
+        """
+        Waits for all files to be written, raising the first error, then
+        fsyncs the output directory if asked to.
+        """
+        self._executor.shutdown(wait = True)
+        futures, self._futures = self._futures, list()
+        for future in futures:
+            if not future.cancelled():
+                future.result()
+        if self.fsync_directory is not None:
+            fsync_directory(self.fsync_directory)
+        self.elapsed = time.perf_counter() - self._start_time
+
+    def throughput(self):
+        """Describes files and bytes written per second."""
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._start_time
+        elapsed = max(elapsed, 1e-9)
+        megabytes = self.bytes_written / (1024 * 1024)
+        return (
+            f"wrote {self.files_written} files, {megabytes:.2f} MB in {elapsed:.3f} s"
+            f" ({self.files_written / elapsed:.0f} files/s, {megabytes / elapsed:.2f} MB/s)"
+        )
@@ -8,4 +8,14 @@
     - https://docs.pytest.org/en/stable/writing_plugins.html
 """
 
-# import pytest
+import pytest
+
+from mlox_rule_mgr import cache
+
+
+@pytest.fixture(autouse = True)
+def parse_cache_dir(tmp_path, monkeypatch):
+    """Keeps the parse cache of each test in its own temporary directory."""
+    cache_dir = tmp_path / "parse_cache"
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(cache_dir))
+    return cache_dir
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+
+from mlox_rule_mgr import cache, cli, sections
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+testfile_dir = os.path.abspath(os.path.join(this_dir, '..', 'specs', 'testfiles'))
+
+
+def _count_scans(monkeypatch):
+    scans = []
+    iter_sections = sections.iter_sections
+    def counting_iter_sections(*args, **kwargs):
+        scans.append(args)
+        return iter_sections(*args, **kwargs)
+    monkeypatch.setattr(sections, "iter_sections", counting_iter_sections)
+    return scans
+
+
+def test_cached_section_table_factory_hitAndMiss(tmp_path, monkeypatch):
+    testfile_path = tmp_path / "report_tester.txt"
+    shutil.copy(os.path.join(testfile_dir, "report_tester.txt"), testfile_path)
+    parse_cache = cache.ParseCache(str(tmp_path / "cache"))
+    scans = _count_scans(monkeypatch)
+
+    with sections.section_table_factory(str(testfile_path)) as table:
+        expected_sections = table.sections
+
+    with cache.cached_section_table_factory(parse_cache, str(testfile_path)) as table:
+        assert table.sections == expected_sections
+    with cache.cached_section_table_factory(parse_cache, str(testfile_path)) as table:
+        assert table.sections == expected_sections
+        assert table.text(table.sections[1]).startswith(";;;")
+    assert len(scans) == 2
+
+    # Changing the file invalidates the entry.
+    with open(testfile_path, "a", encoding = "utf-8") as f:
+        f.write(";; @new_mod [author]\n")
+    with cache.cached_section_table_factory(parse_cache, str(testfile_path)) as table:
+        assert table.sections[-1].name == "new_mod [author]"
+    assert len(scans) == 3
+
+
+def test_cached_section_table_factory_keyedOnScanFlavor(tmp_path):
+    testfile_path = os.path.join(testfile_dir, "report_tester.txt")
+    parse_cache = cache.ParseCache(str(tmp_path / "cache"))
+
+    with cache.cached_section_table_factory(parse_cache, testfile_path) as table:
+        names = [section.name for section in table]
+    with cache.cached_section_table_factory(
+        parse_cache, testfile_path, sections.sectionname_regex, cli.safe_section_key
+    ) as table:
+        safe_names = [section.name for section in table]
+    assert names[1] == "mod2 [author2]"
+    assert safe_names[1] == "mod2author2"
+
+
+def test_ParseCache_prune(tmp_path):
+    parse_cache = cache.ParseCache(str(tmp_path), max_bytes = 250, max_age = 1000)
+    for i, age in enumerate([5000, 30, 20, 10]):
+        path = tmp_path / f"{i}{cache.ParseCache.suffix}"
+        path.write_bytes(b"x" * 100)
+        mtime = path.stat().st_mtime - age
+        os.utime(path, (mtime, mtime))
+
+    parse_cache.prune()
+
+    # Entry 0 is too old, and entry 1 is least recently used.
+    assert sorted(os.listdir(tmp_path)) == [f"2{cache.ParseCache.suffix}", f"3{cache.ParseCache.suffix}"]
+
+
+def test_MloxRuleManager_report_noCache(parse_cache_dir, capsys):
+    testfile_path = os.path.join(testfile_dir, "single_section.txt")
+    cli.main(args = ["--no-cache", "report", testfile_path])
+    assert not parse_cache_dir.exists()
+    cli.main(args = ["report", testfile_path])
+    assert len(os.listdir(parse_cache_dir)) == 1
@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import json
 import os
+import shutil
+import sys
 
+import pytest
+
+import mlox_rule_mgr
 from mlox_rule_mgr import cli
 
 __author__ = "Kaben Nanlohy"
@@ -191,6 +197,47 @@ def test_MloxRuleManager_parse_rulefile():
     assert section_dict == expected_section_dict
 
 
+def test_MloxRuleManager_iter_sections():
+    args = []
+    rule_mgr = cli.MloxRuleManager(args)
+
+    report_tester_fnam = os.path.join(testfile_dir, "report_tester.txt")
+    with open(report_tester_fnam, 'r', encoding = 'utf-8') as report_tester_f:
+        section_dict = rule_mgr.parse_rulefile_2(report_tester_f)
+    with open(report_tester_fnam, 'r', encoding = 'utf-8') as report_tester_f:
+        sections = list(rule_mgr.iter_sections(report_tester_f))
+
+    expected_sections = [
+        (name, version)
+        for name, versions in section_dict.items()
+        for version in versions
+    ]
+    expected_sections.sort(key = lambda entry: entry[1]["line_number"])
+    assert sections == expected_sections
+
+
+def test_MloxRuleManager_iter_sections_isStreaming():
+    args = []
+    rule_mgr = cli.MloxRuleManager(args)
+
+    lines_read = []
+    def reader():
+        report_tester_fnam = os.path.join(testfile_dir, "report_tester.txt")
+        with open(report_tester_fnam, 'r', encoding = 'utf-8') as report_tester_f:
+            for line in report_tester_f:
+                lines_read.append(line)
+                yield line
+
+    sections = rule_mgr.iter_sections(reader())
+    name, header_info = next(sections)
+    assert name == "_header"
+    # Only lines up to the first section name have been read.
+    assert len(lines_read) == 10
+    name, section_info = next(sections)
+    assert name == "mod2 [author2]"
+    assert section_info["line_number"] == 9
+
+
 def test_MloxRuleManager_report_emptyFile(capsys):
     testfile_path = os.path.join(testfile_dir, "empty.txt")
     cli.main(args = ["report", testfile_path])
@@ -374,7 +421,7 @@ def test_MloxRuleManager_report_duplicateSectionNames(capsys):
 	2 Mod Sections
 	Sections Sorted: Yes
 	1 Duplicate Section Name:
-		mod2 [author2]: line 1, line 9
+		mod2 [author2]: line 2, line 10
 """.strip()
 
 
@@ -387,7 +434,7 @@ def test_MloxRuleManager_report_duplicateSectionNames_withSectionsFlag(capsys):
 	2 Mod Sections
 	Sections Sorted: Yes
 	1 Duplicate Section Name:
-		mod2 [author2]: line 1, line 9
+		mod2 [author2]: line 2, line 10
 
 	Sections found:
 		mod2 [author2]
@@ -404,8 +451,8 @@ def test_MloxRuleManager_report_combined(capsys):
 	6 Mod Sections
 	Sections Sorted: No
 	2 Duplicate Section Names:
-		mod2 [author2]: line 9, line 49
-		abc_mod [author1]: line 17, line 28
+		mod2 [author2]: line 10, line 50
+		abc_mod [author1]: line 18, line 29
 
 	Sections found:
 		mod2 [author2]
@@ -415,3 +462,402 @@ def test_MloxRuleManager_report_combined(capsys):
 		mod2 [author2]
 		mod2 [otherauthor]
 """.strip()
+
+
+def _split_files(directory):
+    contents = dict()
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'rb') as f:
+            contents[name] = f.read()
+    return contents
+
+
+def _check_split_matches_split_1(testfile_path, tmp_path):
+    split_1_dir = tmp_path / "split_1"
+    split_dir = tmp_path / "split"
+    split_1_dir.mkdir()
+    split_dir.mkdir()
+
+    args = cli.parse_args(["split", "-d", str(split_1_dir), testfile_path])
+    cli.MloxRuleManager(args).split_1()
+    cli.main(args = ["split", "-d", str(split_dir), "--threads", "3", "--fsync", testfile_path])
+
+    expected_files = _split_files(split_1_dir)
+    assert expected_files
+    assert _split_files(split_dir) == expected_files
+
+
+def test_MloxRuleManager_split_matchesSplit1(tmp_path):
+    testfile_path = os.path.join(testfile_dir, "report_tester.txt")
+    _check_split_matches_split_1(testfile_path, tmp_path)
+
+
+def test_MloxRuleManager_split_matchesSplit1_mloxBaseExcerpt(tmp_path):
+    testfile_path = os.path.join(this_dir, "..", "untitled1.txt")
+    _check_split_matches_split_1(testfile_path, tmp_path)
+
+
+def test_MloxRuleManager_split_matchesSplit1_crlf(tmp_path):
+    with open(os.path.join(testfile_dir, "report_tester.txt"), 'rb') as f:
+        text = f.read()
+    testfile_path = tmp_path / "crlf.txt"
+    testfile_path.write_bytes(text.replace(b"\n", b"\r\n") + "\u00a0\r\n".encode("utf-8"))
+    _check_split_matches_split_1(str(testfile_path), tmp_path)
+
+
+def test_MloxRuleManager_split_matchesSplit1_cr(tmp_path):
+    with open(os.path.join(testfile_dir, "report_tester.txt"), 'rb') as f:
+        text = f.read()
+    testfile_path = tmp_path / "cr.txt"
+    testfile_path.write_bytes(text.replace(b"\n", b"\r"))
+    _check_split_matches_split_1(str(testfile_path), tmp_path)
+    assert len(os.listdir(tmp_path / "split")) > 1
+
+
+def test_MloxRuleManager_split_matchesSplit1_unicodeSpaces(tmp_path):
+    testfile_path = tmp_path / "spaces.txt"
+    testfile_path.write_text(
+        ";; header\n\n\u00a0; @A [b]\n[Order]\na.esp\nb.esp\n\n"
+        "\u3000;;;;\n;\u2003@C\u00a0[d]\n[Note]\n C.\n\x1c; comment\n",
+        encoding = 'utf-8',
+    )
+    _check_split_matches_split_1(str(testfile_path), tmp_path)
+    assert sorted(os.listdir(tmp_path / "split")) == ["Ab.txt", "Cd.txt", "_header.txt"]
+
+
+def test_MloxRuleManager_split_incremental(tmp_path, capsys):
+    rulefile_path = tmp_path / "rules.txt"
+    rulefile_path.write_text(
+        ";; @mod1 [author1]\n[ORDER]\nmod2.esp\nmod1.esp\n\n"
+        ";; @mod2 [author2]\n[NOTE]\n mod2 note\nmod2.esp\n\n"
+        ";; @mod3 [author3]\n[NOTE]\n mod3 note\nmod3.esp\n",
+        encoding = 'utf-8',
+    )
+    split_dir = tmp_path / "split"
+    split_dir.mkdir()
+    split_args = ["split", "--incremental", "-d", str(split_dir), str(rulefile_path)]
+
+    cli.main(args = split_args)
+    assert "split: 4 added, 0 changed, 0 removed, 0 unchanged" in capsys.readouterr().out
+    first_files = _split_files(split_dir)
+    mod1_mtime = os.stat(split_dir / "mod1author1.txt").st_mtime_ns
+
+    rulefile_path.write_text(
+        ";; @mod1 [author1]\n[ORDER]\nmod2.esp\nmod1.esp\n\n"
+        ";; @mod2 [author2]\n[NOTE]\n changed note\nmod2.esp\n\n"
+        ";; @mod4 [author4]\n[NOTE]\n mod4 note\nmod4.esp\n",
+        encoding = 'utf-8',
+    )
+    cli.main(args = split_args)
+    assert "split: 1 added, 1 changed, 1 removed, 2 unchanged" in capsys.readouterr().out
+    assert os.stat(split_dir / "mod1author1.txt").st_mtime_ns == mod1_mtime
+    assert not (split_dir / "mod3author3.txt").exists()
+    split_files = _split_files(split_dir)
+    assert split_files["mod1author1.txt"] == first_files["mod1author1.txt"]
+    assert b"changed note" in split_files["mod2author2.txt"]
+    assert "mod4author4.txt" in split_files
+
+    # A section file edited by hand is rewritten even though its section
+    # did not change.
+    (split_dir / "mod1author1.txt").write_bytes(b"edited\n")
+    cli.main(args = split_args)
+    assert "split: 0 added, 1 changed, 0 removed, 3 unchanged" in capsys.readouterr().out
+    assert _split_files(split_dir)["mod1author1.txt"] == first_files["mod1author1.txt"]
+
+
+def test_MloxRuleManager_merge(tmp_path):
+    merged_path = tmp_path / "merged.txt"
+    cli.main(args = [
+        "merge", str(merged_path),
+        os.path.join(testfile_dir, "unique_unsorted_sections.txt"),
+        os.path.join(testfile_dir, "single_section.txt"),
+    ])
+
+    with open(os.path.join(testfile_dir, "single_section.txt"), 'r', encoding = 'utf-8') as f:
+        expected_text = f.read().strip() + os.linesep
+    with open(os.path.join(testfile_dir, "unique_unsorted_sections.txt"), 'r', encoding = 'utf-8') as f:
+        expected_text += f.read().strip() + os.linesep
+    assert merged_path.read_text(encoding = 'utf-8') == expected_text
+
+
+def test_MloxRuleManager_merge_incremental(tmp_path, capsys):
+    split_dir = tmp_path / "split"
+    split_dir.mkdir()
+    cli.main(args = ["split", "-d", str(split_dir), os.path.join(testfile_dir, "report_tester.txt")])
+    merged_path = tmp_path / "merged.txt"
+    expected_path = tmp_path / "expected.txt"
+
+    def check_merge(summary):
+        capsys.readouterr()
+        cli.main(args = ["merge", "--incremental", str(merged_path), str(split_dir)])
+        assert f"merge: {summary}" in capsys.readouterr().out
+        cli.main(args = ["merge", str(expected_path), str(split_dir / "*.txt")])
+        assert merged_path.read_bytes() == expected_path.read_bytes()
+
+    check_merge("5 added, 0 changed, 0 removed, 0 unchanged")
+    check_merge("0 added, 0 changed, 0 removed, 5 unchanged")
+
+    (split_dir / "uniquemodauthor3.txt").write_text(";; @unique_mod [author3]\n[Note]\n edited\n", encoding = 'utf-8')
+    (split_dir / "newmodauthor9.txt").write_text(";; @new_mod [author9]\n", encoding = 'utf-8')
+    os.remove(split_dir / "mod2otherauthor.txt")
+    check_merge("1 added, 1 changed, 1 removed, 3 unchanged")
+
+    # Touched but unchanged files are read, but their segments are reused.
+    os.utime(split_dir / "_header.txt", ns = (0, 0))
+    check_merge("0 added, 0 changed, 0 removed, 5 unchanged")
+
+    # A merged file modified outside of merge is rebuilt from scratch.
+    merged_path.write_text("junk", encoding = 'utf-8')
+    check_merge("5 added, 0 changed, 0 removed, 0 unchanged")
+
+
+def test_MloxRuleManager_merge_sorted(tmp_path, capsys):
+    merged_path = tmp_path / "merged.txt"
+    cli.main(args = [
+        "merge", "--sorted", str(merged_path),
+        os.path.join(testfile_dir, "unique_unsorted_sections.txt"),
+        os.path.join(testfile_dir, "report_tester.txt"),
+        os.path.join(testfile_dir, "single_section_with_header.txt"),
+    ])
+    merged_text = merged_path.read_text(encoding = 'utf-8')
+    assert merged_text.startswith(";;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;;\n; Oops I am unorganized\n")
+    assert "; This is also part of the header\n\n;;;;;;;;;;;;;;;\n;; @abc_mod [author1]\n" in merged_text
+    capsys.readouterr()
+
+    cli.main(args = ["report", "--sections", str(merged_path)])
+    assert capsys.readouterr().out.strip() == f"""
+{merged_path} report:
+	Header: Yes
+	9 Mod Sections
+	Sections Sorted: Yes
+	3 Duplicate Section Names:
+		abc_mod [author1]: line 15, line 26
+		mod1 [author1]: line 42, line 49
+		mod2 [author2]: line 56, line 64
+	2 Duplicate Section Bodies:
+		abc_mod [author2] line 34, mod2 [author2] line 56
+		mod1 [author1] line 42, mod1 [author1] line 49, mod2 [author2] line 64
+
+	Sections found:
+		abc_mod [author1]
+		abc_mod [author1]
+		abc_mod [author2]
+		mod1 [author1]
+		mod1 [author1]
+		mod2 [author2]
+		mod2 [author2]
+		mod2 [otherauthor]
+		unique_mod [author3]
+""".strip()
+
+
+def test_MloxRuleManager_merge_sorted_intoInputFile(tmp_path):
+    merged_path = tmp_path / "unique_unsorted_sections.txt"
+    with open(os.path.join(testfile_dir, "unique_unsorted_sections.txt"), 'rb') as f:
+        merged_path.write_bytes(f.read())
+
+    cli.main(args = ["merge", "--sorted", str(merged_path), str(merged_path)])
+    with open(os.path.join(testfile_dir, "unique_sorted_sections.txt"), 'r', encoding = 'utf-8') as f:
+        expected_text = f.read()
+    assert merged_path.read_text(encoding = 'utf-8').split() == expected_text.split()
+
+
+def test_MloxRuleManager_merge_report(tmp_path, capsys):
+    merged_path = tmp_path / "merged.txt"
+    header_path = os.path.join(testfile_dir, "single_section_with_header.txt")
+    duplicates_path = os.path.join(testfile_dir, "duplicate_sections.txt")
+    cli.main(args = ["merge", "--report", str(merged_path), header_path, duplicates_path])
+
+    assert not merged_path.exists()
+    assert capsys.readouterr().out.strip() == f"""
+merge report:
+	2 Rule Files
+	3 Mod Sections
+	1 Duplicate Section Name:
+		mod2 [author2]: {duplicates_path} line 2, {duplicates_path} line 10
+	1 Misplaced Header:
+		{header_path}: lines 1-5
+""".strip()
+
+
+def test_MloxRuleManager_merge_report_sorted(tmp_path, capsys):
+    merged_path = tmp_path / "merged.txt"
+    cli.main(args = [
+        "merge", "--report", "--sorted", str(merged_path),
+        os.path.join(testfile_dir, "unique_sorted_sections.txt"),
+        os.path.join(testfile_dir, "single_section_with_ruleheader.txt"),
+    ])
+
+    assert not merged_path.exists()
+    assert capsys.readouterr().out.strip() == """
+merge report:
+	2 Rule Files
+	3 Mod Sections
+	1 Duplicate Section Name:
+		mod1 [author1]: {} line 11, {} line 10
+	0 Misplaced Headers
+""".strip().format(
+        os.path.join(testfile_dir, "single_section_with_ruleheader.txt"),
+        os.path.join(testfile_dir, "unique_sorted_sections.txt"),
+    )
+
+
+def test_MloxRuleManager_merge_sorted_withJobs(tmp_path):
+    rulefile_names = [
+        os.path.join(testfile_dir, name)
+        for name in ["unique_unsorted_sections.txt", "report_tester.txt", "single_section_with_header.txt"]
+    ]
+    serial_path = tmp_path / "serial.txt"
+    parallel_path = tmp_path / "parallel.txt"
+    cli.main(args = ["merge", "--sorted", str(serial_path)] + rulefile_names)
+    cli.main(args = ["--no-cache", "merge", "--sorted", "--jobs", "2", str(parallel_path)] + rulefile_names)
+    assert parallel_path.read_bytes() == serial_path.read_bytes()
+
+
+def test_MloxRuleManager_merge_report_withJobs(tmp_path, capsys):
+    merged_path = tmp_path / "merged.txt"
+    rulefile_pattern = os.path.join(testfile_dir, "*.txt")
+    cli.main(args = ["merge", "--report", str(merged_path), rulefile_pattern])
+    serial_report = capsys.readouterr().out
+    cli.main(args = ["merge", "--report", "--jobs", "3", str(merged_path), rulefile_pattern])
+    assert capsys.readouterr().out == serial_report
+
+
+def test_MloxRuleManager_report_json(capsys):
+    testfile_path = os.path.join(testfile_dir, "report_tester.txt")
+    cli.main(args = ["report", "--format", "json", testfile_path])
+    document = json.loads(capsys.readouterr().out)
+    assert document == {
+        "file": testfile_path,
+        "header": True,
+        "num_sections": 6,
+        "sorted": False,
+        "duplicate_names": [
+            {"name": "mod2 [author2]", "line_numbers": [10, 50]},
+            {"name": "abc_mod [author1]", "line_numbers": [18, 29]},
+        ],
+        "similar_names": [],
+        "order_cycles": [],
+        "duplicate_bodies": [],
+        "similar_bodies": [],
+        "sections": [
+            {"name": "mod2 [author2]", "mod_name": "mod2", "author": "author2", "line_number": 10},
+            {"name": "abc_mod [author1]", "mod_name": "abc_mod", "author": "author1", "line_number": 18},
+            {"name": "abc_mod [author1]", "mod_name": "abc_mod", "author": "author1", "line_number": 29},
+            {"name": "unique_mod [author3]", "mod_name": "unique_mod", "author": "author3", "line_number": 37},
+            {"name": "mod2 [author2]", "mod_name": "mod2", "author": "author2", "line_number": 50},
+            {"name": "mod2 [otherauthor]", "mod_name": "mod2", "author": "otherauthor", "line_number": 57},
+        ],
+    }
+
+
+def test_MloxRuleManager_report_ndjson(capsys):
+    testfile_path = os.path.join(testfile_dir, "report_tester.txt")
+    cli.main(args = ["report", "--format", "ndjson", testfile_path])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["type"] for record in records] == (
+        ["file", "header"] + ["section"] * 6 + ["summary"] + ["duplicate_name"] * 2
+    )
+    assert records[0] == {"type": "file", "file": testfile_path}
+    assert records[2] == {
+        "type": "section", "name": "mod2 [author2]", "mod_name": "mod2", "author": "author2", "line_number": 10
+    }
+    assert records[8] == {"type": "summary", "num_sections": 6, "sorted": False}
+
+
+def test_MloxRuleManager_report_records_streamsSections():
+    args = cli.parse_args(["--no-cache", "report", "unused.txt"])
+    rule_mgr = cli.MloxRuleManager(args)
+    records = rule_mgr.report_records(os.path.join(testfile_dir, "report_tester.txt"), stream = True)
+    assert next(records) == {"type": "header", "present": True}
+    assert next(records)["line_number"] == 10
+    records.close()
+
+
+def test_MloxRuleManager_report_ndjson_emptyFile(capsys):
+    testfile_path = os.path.join(testfile_dir, "empty.txt")
+    cli.main(args = ["report", "--format", "ndjson", testfile_path])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records[1:] == [
+        {"type": "header", "present": False},
+        {"type": "summary", "num_sections": 0, "sorted": None},
+    ]
+
+
+def test_MloxRuleManager_report_manyFiles(capsys):
+    pattern = os.path.join(testfile_dir, "unique_*_sections.txt")
+    duplicates_path = os.path.join(testfile_dir, "duplicate_sections.txt")
+    sorted_path = os.path.join(testfile_dir, "unique_sorted_sections.txt")
+    unsorted_path = os.path.join(testfile_dir, "unique_unsorted_sections.txt")
+    cli.main(args = ["report", "-j", "2", pattern, duplicates_path])
+    assert capsys.readouterr().out == (
+        f"{duplicates_path} report:\n"
+        "\tHeader: No\n"
+        "\t2 Mod Sections\n"
+        "\tSections Sorted: Yes\n"
+        "\t1 Duplicate Section Name:\n"
+        "\t\tmod2 [author2]: line 2, line 10\n"
+        "\n"
+        f"{sorted_path} report:\n"
+        "\tHeader: No\n"
+        "\t2 Mod Sections\n"
+        "\tSections Sorted: Yes\n"
+        "\t0 Duplicate Section Names\n"
+        "\n"
+        f"{unsorted_path} report:\n"
+        "\tHeader: No\n"
+        "\t2 Mod Sections\n"
+        "\tSections Sorted: No\n"
+        "\t0 Duplicate Section Names\n"
+        "\n"
+        "report summary:\n"
+        "\t3 Rule Files\n"
+        "\t6 Mod Sections\n"
+        "\t1 File With Duplicate Section Names:\n"
+        f"\t\t{duplicates_path}\n"
+        "\t1 Unsorted File:\n"
+        f"\t\t{unsorted_path}\n"
+        "\t2 Duplicate Section Names Across Files:\n"
+        f"\t\tabc_mod [author2]: {sorted_path} line 2, {unsorted_path} line 9\n"
+        f"\t\tmod1 [author1]: {sorted_path} line 10, {unsorted_path} line 2\n"
+    )
+
+
+def test_MloxRuleManager_report_manyFiles_json(capsys):
+    pattern = os.path.join(testfile_dir, "unique_*_sections.txt")
+    cli.main(args = ["report", "--format", "json", pattern])
+    document = json.loads(capsys.readouterr().out)
+    assert [report["file"] for report in document["files"]] == [
+        os.path.join(testfile_dir, "unique_sorted_sections.txt"),
+        os.path.join(testfile_dir, "unique_unsorted_sections.txt"),
+    ]
+    summary = document["summary"]
+    assert summary["num_files"] == 2
+    assert summary["num_sections"] == 4
+    assert summary["files_with_duplicates"] == []
+    assert summary["unsorted_files"] == [os.path.join(testfile_dir, "unique_unsorted_sections.txt")]
+    assert [duplicate["name"] for duplicate in summary["cross_file_duplicates"]] == [
+        "abc_mod [author2]", "mod1 [author1]"
+    ]
+
+
+def test_MloxRuleManager_report_literalAndMissingFiles(tmp_path, capsys, caplog):
+    # A file whose name has glob characters is reported as it is.
+    bracketed_path = tmp_path / "rules[1].txt"
+    shutil.copyfile(os.path.join(testfile_dir, "unique_sorted_sections.txt"), bracketed_path)
+    cli.main(args = ["report", str(bracketed_path)])
+    assert capsys.readouterr().out.startswith(f"{bracketed_path} report:\n")
+    with pytest.raises(SystemExit) as e:
+        cli.main(args = ["report", str(bracketed_path), str(tmp_path / "missing.txt")])
+    assert e.value.code == 1
+    assert f"no rule files match '{tmp_path / 'missing.txt'}'" in caplog.text
+
+
+def test_MloxRuleManager_evaluate_withoutNumpy(tmp_path, monkeypatch, caplog):
+    # An entry of None makes importing the module raise ImportError.
+    monkeypatch.setitem(sys.modules, "mlox_rule_mgr.evaluation", None)
+    monkeypatch.delattr(mlox_rule_mgr, "evaluation", raising = False)
+    with pytest.raises(SystemExit) as excinfo:
+        cli.main(args = ["evaluate", str(tmp_path / "rules.txt"), str(tmp_path)])
+    assert excinfo.value.code == 1
+    assert "evaluate needs numpy" in caplog.text
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from mlox_rule_mgr import cli, rules
+
+numpy = pytest.importorskip("numpy")
+evaluation = pytest.importorskip("mlox_rule_mgr.evaluation")
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+RULE_LINES = [
+    "[Conflict]", " a and b don't mix", "a.esp", "b.esp", "[ALL c.esp d.esp]",
+    "[Requires]", "patch.esp", "[ANY a.esp b.esp]",
+    "[Patch]", "a-b patch.esp", "[ALL a.esp b.esp]",
+    "[Requires]", "[NOT a.esp]", "Fallback *.esp",
+    "[Note]", " ignored", "a.esp",
+    "[Order]", "a.esp", "b.esp",
+]
+
+LOAD_ORDERS = [
+    ["a.esp", "B.ESP"],
+    ["a.esp", "c.esp", "d.esp", "patch.esp"],
+    ["patch.esp", "Fallback 2.esp"],
+    ["a.esp", "b.esp", "a-b patch.esp"],
+    [],
+]
+
+
+def test_evaluate_rules():
+    rule_list = rules.RuleParser().parse_lines(RULE_LINES, section = "mod [author]")
+    evaluated_rules, hits = evaluation.evaluate_rules(rule_list, LOAD_ORDERS)
+    assert [rule.kind for rule in evaluated_rules] == ["CONFLICT", "REQUIRES", "PATCH", "REQUIRES"]
+    assert hits.tolist() == [
+        [True, False, True, False],
+        [True, False, False, False],
+        [False, True, False, False],
+        [True, False, False, False],
+        [False, False, False, True],
+    ]
+
+
+def test_evaluate_rules_matchesPythonLoop():
+    rng = numpy.random.default_rng(0)
+    plugins = [f"p{i}.esp" for i in range(12)]
+    load_orders = [[plugin for plugin in plugins if rng.random() < 0.4] for _ in range(200)]
+    rule_lines = list()
+    for _ in range(50):
+        a, b, c = rng.choice(plugins, 3, replace = False)
+        rule_lines.extend(["[Conflict]", a, b, f"[NOT {c}]", "[Requires]", a, f"[ANY {b} {c}]", "[Patch]", a, b])
+    rule_list = rules.RuleParser().parse_lines(rule_lines, section = "mod [author]")
+    evaluated_rules, hits = evaluation.evaluate_rules(rule_list, load_orders)
+
+    for row, load_order in enumerate(load_orders):
+        present = set(load_order)
+        for column, rule in enumerate(evaluated_rules):
+            if rule.kind == "CONFLICT":
+                a, b, c = rule.items[0], rule.items[1], rule.items[2].args[0]
+                expected = (a in present) + (b in present) + (c not in present) >= 2
+            elif rule.kind == "REQUIRES":
+                a, (b, c) = rule.items[0], rule.items[1].args
+                expected = a in present and not (b in present or c in present)
+            else:
+                expected = (rule.items[0] in present) != (rule.items[1] in present)
+            assert hits[row, column] == expected
+
+
+def test_MloxRuleManager_evaluate(tmp_path, capsys):
+    rulefile_path = tmp_path / "rules.txt"
+    rulefile_path.write_text(";; @mod [author]\n" + "\n".join(RULE_LINES) + "\n", encoding = 'utf-8')
+    load_order_dir = tmp_path / "load_orders"
+    load_order_dir.mkdir()
+    for i, load_order in enumerate(LOAD_ORDERS):
+        (load_order_dir / f"user{i}.txt").write_text("".join(f"{plugin}\n" for plugin in load_order), encoding = 'utf-8')
+
+    cli.main(args = ["evaluate", "--per-load-order", str(rulefile_path), str(load_order_dir)])
+    assert capsys.readouterr().out == (
+        "evaluate report:\n"
+        "\t5 Load Orders\n"
+        "\t4 Conflict/Requires/Patch Rules\n"
+        "\t4 Rules Fired:\n"
+        "\t\tmod [author]: line 2 [CONFLICT]: 3 load orders\n"
+        "\t\tmod [author]: line 7 [REQUIRES]: 1 load order\n"
+        "\t\tmod [author]: line 10 [PATCH]: 1 load order\n"
+        "\t\tmod [author]: line 13 [REQUIRES]: 1 load order\n"
+        "\n\tLoad Orders:\n"
+        f"\t\t{load_order_dir / 'user0.txt'}: 2 rules: line 2, line 10\n"
+        f"\t\t{load_order_dir / 'user1.txt'}: 1 rule: line 2\n"
+        f"\t\t{load_order_dir / 'user2.txt'}: 1 rule: line 7\n"
+        f"\t\t{load_order_dir / 'user3.txt'}: 1 rule: line 2\n"
+        f"\t\t{load_order_dir / 'user4.txt'}: 1 rule: line 13\n"
+    )
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+
+from mlox_rule_mgr import cli, index
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+testfile_dir = os.path.abspath(os.path.join(this_dir, '..', 'specs', 'testfiles'))
+
+
+def test_normalize_section_name():
+    assert index.normalize_section_name("mod2   [author2]") == "mod2 [author2]"
+    assert index.normalize_section_name(" mod2 [author2] ") == "mod2 [author2]"
+    assert index.normalize_section_name("no author") == "no author"
+
+
+def test_MloxRuleManager_index(tmp_path):
+    testfile_path = tmp_path / "report_tester.txt"
+    shutil.copy(os.path.join(testfile_dir, "report_tester.txt"), testfile_path)
+    cli.main(args = ["index", str(testfile_path)])
+
+    section_index = index.SectionIndex.read(str(testfile_path) + ".idx")
+    assert section_index.is_current(str(testfile_path))
+    assert len(section_index) == 6
+    assert section_index.lookup("abc_mod [author1]") == [[297, 111, 17], [408, 166, 28]]
+
+
+def test_MloxRuleManager_show(tmp_path, capsys):
+    testfile_path = tmp_path / "report_tester.txt"
+    shutil.copy(os.path.join(testfile_dir, "report_tester.txt"), testfile_path)
+    cli.main(args = ["show", str(testfile_path), "unique_mod  [author3]"])
+    assert capsys.readouterr().out == (
+        ";;;;;;;;;;;;;;;;;;;;\n;;; @unique_mod [author3]\n\n[Order]\nfun_mod.esp\nunique_mod.esp\n\n"
+        "[Requires]\nunique_fun_mod.esp\n[ALL fun_mod.esp\n     unique_mod.esp]\n\t \n\n"
+    )
+    assert os.path.exists(str(testfile_path) + ".idx")
+
+
+def test_MloxRuleManager_show_rebuildsStaleIndex(tmp_path, capsys):
+    testfile_path = tmp_path / "report_tester.txt"
+    shutil.copy(os.path.join(testfile_dir, "report_tester.txt"), testfile_path)
+    cli.main(args = ["index", str(testfile_path)])
+    with open(testfile_path, "a", encoding = "utf-8") as f:
+        f.write("\n;;;;\n;; @new_mod [author]\n[Order]\na.esp\nb.esp\n")
+    capsys.readouterr()
+
+    cli.main(args = ["show", str(testfile_path), "new_mod [author]"])
+    assert capsys.readouterr().out == ";;;;\n;; @new_mod [author]\n[Order]\na.esp\nb.esp\n"
+
+
+def test_MloxRuleManager_show_missingSection(tmp_path, capsys):
+    testfile_path = tmp_path / "single_section.txt"
+    shutil.copy(os.path.join(testfile_dir, "single_section.txt"), testfile_path)
+    cli.main(args = ["show", str(testfile_path), "mod2 [author2]"])
+    assert capsys.readouterr().out.strip() == f"{testfile_path} has no section named 'mod2 [author2]'."
+
+
+def test_MloxRuleManager_whoMentions(tmp_path, capsys):
+    testfile_path = tmp_path / "report_tester.txt"
+    shutil.copy(os.path.join(testfile_dir, "report_tester.txt"), testfile_path)
+    cli.main(args = ["who-mentions", str(testfile_path), "Unique_Mod.ESP"])
+    assert capsys.readouterr().out == (
+        "Unique_Mod.ESP is mentioned in 3 rules:\n"
+        "\tunique_mod [author3]: line 39 [ORDER]\n"
+        "\tunique_mod [author3]: line 43 [REQUIRES]\n"
+        "\tmod2 [otherauthor]: line 59 [ORDER]\n"
+    )
+
+    plugin_index = index.PluginIndex.read(str(testfile_path) + ".plugins.idx")
+    assert plugin_index.is_current(str(testfile_path))
+    assert plugin_index.lookup("abc_mod.esp") == [
+        ["mod2 [author2]", "CONFLICT", 12],
+        ["abc_mod [author1]", "ORDER", 20],
+        ["abc_mod [author1]", "PATCH", 24],
+        ["abc_mod [author1]", "ORDER", 32],
+    ]
+
+    cli.main(args = ["who-mentions", str(testfile_path), "nobody.esp"])
+    assert capsys.readouterr().out == f"nobody.esp is not mentioned in {testfile_path}.\n"
+
+
+def test_MloxRuleManager_whoMentions_rebuildsStaleIndex(tmp_path, capsys):
+    testfile_path = tmp_path / "rules.txt"
+    testfile_path.write_text(";; @mod1 [author1]\n[Order]\nmod1.esp\nmod2.esp\n", encoding = 'utf-8')
+    cli.main(args = ["who-mentions", str(testfile_path), "mod3.esp"])
+    assert "not mentioned" in capsys.readouterr().out
+
+    testfile_path.write_text(";; @mod1 [author1]\n[Order]\nmod1.esp\nmod3.esp\n", encoding = 'utf-8')
+    cli.main(args = ["who-mentions", str(testfile_path), "mod3.esp"])
+    assert capsys.readouterr().out == "mod3.esp is mentioned in 1 rule:\n\tmod1 [author1]: line 2 [ORDER]\n"
+
+
+def test_MloxRuleManager_whoMentions_wildcards(tmp_path, capsys):
+    testfile_path = tmp_path / "rules.txt"
+    testfile_path.write_text(
+        ";; @mod1 [author1]\n[Order]\nMorrowind Patch *.esm\nmod1.esp\n\n"
+        ";; @mod2 [author2]\n[Note]\n note\nMorrowind Patch v1.6.5.esm\n",
+        encoding = 'utf-8',
+    )
+    cli.main(args = ["who-mentions", str(testfile_path), "Morrowind Patch v1.6.5.esm"])
+    assert capsys.readouterr().out == (
+        "Morrowind Patch v1.6.5.esm is mentioned in 2 rules:\n"
+        "\tmod1 [author1]: line 2 [ORDER] as morrowind patch *.esm\n"
+        "\tmod2 [author2]: line 7 [NOTE]\n"
+    )
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import time
+
+from mlox_rule_mgr import cli, loadorder, rules
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+testfile_dir = os.path.abspath(os.path.join(this_dir, '..', 'specs', 'testfiles'))
+
+
+def _parse(text):
+    return rules.RuleParser().parse_lines(text.splitlines(), section = "mod [author]")
+
+
+def test_LoadOrderGraph_sort():
+    graph = loadorder.LoadOrderGraph(["d.esp", "c.esp", "B.esp", "a.esp", "b.esp", "e.esp", "Morrowind.esm"])
+    assert graph.plugins == ["d.esp", "c.esp", "B.esp", "a.esp", "e.esp", "Morrowind.esm"]
+    graph.add_rules(_parse(
+        "[Order]\na.esp\nmissing.esp\nb.esp\nc.esp\n"
+        "[NearStart]\nmorrowind.esm\n"
+        "[NearEnd]\nd.esp\n"
+        "[Note]\n note\ne.esp\n"
+    ))
+    assert graph.num_edges == 2
+    assert graph.sort() == (["Morrowind.esm", "a.esp", "B.esp", "c.esp", "e.esp", "d.esp"], [])
+
+
+def test_LoadOrderGraph_sort_nearEndPriority():
+    # As in mlox, the first [NearEnd] plugin has the highest priority, and
+    # loads last.
+    graph = loadorder.LoadOrderGraph(["Mashed Lists.esp", "a.esp", "multipatch.esp", "z.esp", "b.esp"])
+    graph.add_rules(_parse("[NearEnd]\nmultipatch.esp\nMashed Lists.esp\n[NearEnd]\nz.esp\n[NearStart]\nb.esp\na.esp\n"))
+    assert graph.sort() == (["b.esp", "a.esp", "z.esp", "Mashed Lists.esp", "multipatch.esp"], [])
+
+
+def test_LoadOrderGraph_sort_wildcards():
+    graph = loadorder.LoadOrderGraph(["Patch 1.2.esp", "Patch 2.esp", "Base.esm", "Other.esp"])
+    graph.add_rules(_parse("[Order]\nBase.esm\nPatch <VER>.esp\nOther.esp\n"))
+    assert graph.num_edges == 4
+    assert graph.sort() == (["Base.esm", "Patch 1.2.esp", "Patch 2.esp", "Other.esp"], [])
+
+
+def test_LoadOrderGraph_sort_breaksCycles():
+    graph = loadorder.LoadOrderGraph(["x.esp", "a.esp", "b.esp", "c.esp"])
+    graph.add_rules(_parse("[Order]\na.esp\nb.esp\nc.esp\n[Order]\nc.esp\na.esp\n"))
+    order, broken = graph.sort()
+    assert order == ["x.esp", "a.esp", "b.esp", "c.esp"]
+    assert broken == ["a.esp"]
+
+
+def test_LoadOrderGraph_sort_breaksOnlyCycles():
+    # c.esp would come first, but isn't on the cycle, and must follow a.esp.
+    graph = loadorder.LoadOrderGraph(["a.esp", "b.esp", "c.esp"])
+    graph.add_rules(_parse("[Order]\na.esp\nb.esp\n[Order]\nb.esp\na.esp\n[Order]\na.esp\nc.esp\n[NearStart]\nc.esp\n"))
+    order, broken = graph.sort()
+    assert order.index("a.esp") < order.index("c.esp")
+    assert broken == ["a.esp"]
+
+
+def test_LoadOrderGraph_sort_isFast():
+    rng = random.Random(0)
+    plugins = [f"plugin{i}.esp" for i in range(5000)]
+    rule_lines = list()
+    for _ in range(5000):
+        rule_lines.append("[Order]")
+        rule_lines.extend(rng.sample(plugins, 3))
+    rule_list = rules.RuleParser().parse_lines(rule_lines, section = "mod [author]")
+    start_time = time.perf_counter()
+    graph = loadorder.LoadOrderGraph(reversed(plugins))
+    graph.add_rules(rule_list)
+    order, _ = graph.sort()
+    assert time.perf_counter() - start_time < 1.0
+    assert sorted(order) == sorted(plugins)
+
+
+def test_MloxRuleManager_sortLoadOrder(tmp_path, capsys):
+    plugin_list_path = tmp_path / "loadorder.txt"
+    plugin_list_path.write_text(
+        "# my load order\nmod1.esp\nmod3.esp\n\nabc_mod.esp\nmod2.esp\n",
+        encoding = 'utf-8',
+    )
+    cli.main(args = [
+        "sort-load-order", str(plugin_list_path), os.path.join(testfile_dir, "report_tester.txt"),
+    ])
+    assert capsys.readouterr().out == "abc_mod.esp\nmod3.esp\nmod2.esp\nmod1.esp\n"
+
+    output_path = tmp_path / "sorted.txt"
+    cli.main(args = [
+        "sort-load-order", "-o", str(output_path), str(plugin_list_path),
+        os.path.join(testfile_dir, "report_tester.txt"),
+    ])
+    assert output_path.read_text(encoding = 'utf-8') == "abc_mod.esp\nmod3.esp\nmod2.esp\nmod1.esp\n"
+
+
+def test_strongly_connected_components():
+    rng = random.Random(2)
+    num_nodes = 60
+    edge_list = [(rng.randrange(num_nodes), rng.randrange(num_nodes)) for _ in range(70)]
+    graph = loadorder.LoadOrderGraph([f"{i}.esp" for i in range(num_nodes)])
+    graph.add_rules([rules.Rule("ORDER", "s", 1, None, (f"{a}.esp", f"{b}.esp")) for a, b in edge_list])
+    offsets, targets, _ = graph.adjacency()
+    components = loadorder.strongly_connected_components(offsets, targets)
+    assert sorted(node for component in components for node in component) == list(range(num_nodes))
+
+    reachable = [{node} for node in range(num_nodes)]
+    changed = True
+    while changed:
+        changed = False
+        for a, b in edge_list:
+            if not reachable[b] <= reachable[a]:
+                reachable[a] |= reachable[b]
+                changed = True
+    for component in components:
+        for node in component:
+            assert {other for other in reachable[node] if node in reachable[other]} == set(component)
+
+
+def test_LoadOrderGraph_cycles():
+    rule_list = rules.RuleParser().parse_lines([
+        "[Order]", "a.esp", "b.esp", "c.esp",
+        "[Order]", "Patch *.esp", "x.esp",
+        "[Order]", "x.esp", "patch *.esp",
+        "[NearEnd]", "b.esp",
+        "[Order]", "C.esp", "A.esp",
+    ], section = "mod [author]")
+    cycles = loadorder.LoadOrderGraph.from_rules(rule_list).cycles()
+    assert [(plugins, [(a, b, rule.line_number) for a, b, rule in edges]) for plugins, edges in cycles] == [
+        (["a.esp", "b.esp", "c.esp"], [("a.esp", "b.esp", 1), ("b.esp", "c.esp", 1), ("c.esp", "a.esp", 13)]),
+        (["Patch *.esp", "x.esp"], [("Patch *.esp", "x.esp", 5), ("x.esp", "Patch *.esp", 8)]),
+    ]
+
+
+def test_MloxRuleManager_report_orderCycles(tmp_path, capsys):
+    testfile_path = tmp_path / "cycles.txt"
+    testfile_path.write_text(
+        ";; @mod1 [author1]\n[Order]\nmod1.esp\nmod2.esp\n\n"
+        ";; @mod2 [author2]\n[Order]\nmod2.esp\nmod1.esp\n",
+        encoding = 'utf-8',
+    )
+    cli.main(args = ["report", "--order-cycles", str(testfile_path)])
+    assert capsys.readouterr().out == (
+        f"{testfile_path} report:\n"
+        "\tHeader: No\n"
+        "\t2 Mod Sections\n"
+        "\tSections Sorted: Yes\n"
+        "\t0 Duplicate Section Names\n"
+        "\t1 Order Cycle:\n"
+        "\t\tmod1.esp, mod2.esp:\n"
+        "\t\t\tmod1 [author1]: line 2: mod1.esp before mod2.esp\n"
+        "\t\t\tmod2 [author2]: line 7: mod2.esp before mod1.esp\n"
+    )
+    cli.main(args = ["report", str(testfile_path)])
+    assert "Order Cycle" not in capsys.readouterr().out
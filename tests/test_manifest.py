@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+from mlox_rule_mgr import manifest
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+def test_read_manifest_missingOrUnusable(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    assert manifest.read_manifest(str(manifest_path)) == {}
+    manifest_path.write_text("{not json", encoding = 'utf-8')
+    assert manifest.read_manifest(str(manifest_path)) == {}
+    manifest_path.write_text('{"version": 0, "files": {}}', encoding = 'utf-8')
+    assert manifest.read_manifest(str(manifest_path)) == {}
+
+
+def test_OutputManifest(tmp_path):
+    output_manifest = manifest.OutputManifest(str(tmp_path))
+    assert output_manifest.needs_write("a.txt", [b"a\n"])
+    assert output_manifest.needs_write("b.txt", [b"b", b"\n"])
+    (tmp_path / "a.txt").write_bytes(b"a\n")
+    (tmp_path / "b.txt").write_bytes(b"b\n")
+    output_manifest.commit()
+    assert output_manifest.summary() == "2 added, 0 changed, 0 removed, 0 unchanged"
+
+    # Same content split into different chunks is still unchanged.
+    output_manifest = manifest.OutputManifest(str(tmp_path))
+    assert not output_manifest.needs_write("a.txt", [b"a", b"\n"])
+    output_manifest.commit()
+    assert output_manifest.summary() == "0 added, 0 changed, 1 removed, 1 unchanged"
+    assert not (tmp_path / "b.txt").exists()
+    assert set(manifest.read_manifest(output_manifest.manifest_name)["files"]) == {"a.txt"}
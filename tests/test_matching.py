@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import fnmatch
+import random
+import time
+
+from mlox_rule_mgr import matching, rules
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+def test_split_pattern():
+    assert matching.split_pattern("Morrowind.esm") == ("morrowind.esm", None)
+    prefix, regex = matching.split_pattern("Morrowind Patch *.esm")
+    assert prefix == "morrowind patch "
+    assert regex.pattern == r".*\.esm"
+    prefix, regex = matching.split_pattern("*Rebirth <VER>?.esp")
+    assert prefix == ""
+    assert regex.fullmatch("morrowind rebirth 5.0a!.esp")
+
+
+def test_PluginMatcher():
+    matcher = matching.PluginMatcher([
+        "Morrowind.esm",
+        "morrowind.ESM",
+        "Morrowind Patch *.esm",
+        "Morrowind Rebirth <VER> - Morrowind Patch *.esm",
+        "*.esm",
+        "Mod?.esp",
+        "Morrowind.esm",
+    ])
+    assert len(matcher) == 6
+    assert matcher.match("MORROWIND.esm") == ["Morrowind.esm", "morrowind.ESM", "*.esm"]
+    assert matcher.match("Morrowind Patch v1.6.5.esm") == ["*.esm", "Morrowind Patch *.esm"]
+    assert matcher.match("Morrowind Rebirth 5.0b - Morrowind Patch Compatible.esm") == [
+        "*.esm",
+        "Morrowind Rebirth <VER> - Morrowind Patch *.esm",
+    ]
+    assert matcher.match("Morrowind Rebirth beta - Morrowind Patch Compatible.esm") == ["*.esm"]
+    assert matcher.match("Mod1.esp") == ["Mod?.esp"]
+    assert matcher.match("Mod12.esp") == []
+    assert matcher.match_all(["Mod1.esp", "Other.esp"]) == {"Mod1.esp": ["Mod?.esp"]}
+
+
+def test_PluginMatcher_versionDigits():
+    matcher = matching.PluginMatcher(["Foo <VER>.esp"])
+    assert matcher.match("Foo 1234567890.esp") == ["Foo <VER>.esp"]
+    # Fails fast, rather than backtracking over ways to split the digits.
+    start = time.perf_counter()
+    assert matcher.match("Foo " + "1" * 60 + "!.esp") == []
+    assert time.perf_counter() - start < 0.5
+
+
+def test_PluginMatcher_agreesWithFnmatch():
+    rng = random.Random(1)
+    alphabet = "ab.?*"
+    patterns = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(300)}
+    names = {"".join(rng.choice("ab.") for _ in range(rng.randint(0, 6))) for _ in range(300)}
+    matcher = matching.PluginMatcher(patterns)
+    for name in names:
+        expected = {pattern for pattern in patterns if fnmatch.fnmatchcase(name, pattern)}
+        assert set(matcher.match(name)) == expected
+
+
+def test_PluginMatcher_fromRules():
+    parser = rules.RuleParser()
+    rule_list = parser.parse_lines([
+        "[Order]",
+        "Morrowind Patch *.esm",
+        "mod1.esp",
+        "[Requires]",
+        "mod2.esp",
+        "[ANY Mod? Patch.esp mod1.esp]",
+    ], section = "mod [author]")
+    matcher = matching.PluginMatcher.from_rules(rule_list)
+    assert len(matcher) == 4
+    assert matcher.match("Morrowind Patch v1.6.esm") == ["Morrowind Patch *.esm"]
+    assert matcher.match("ModX Patch.esp") == ["Mod? Patch.esp"]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+
+from mlox_rule_mgr import cli, profiling
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+testfile_dir = os.path.abspath(os.path.join(this_dir, '..', 'specs', 'testfiles'))
+
+
+def test_Profiler():
+    profiler = profiling.Profiler()
+    for _ in range(3):
+        with profiler.phase("read"):
+            pass
+    with profiler.phase("write"):
+        profiler.count("files_written")
+        profiler.count("bytes_written", 10)
+        profiler.count("bytes_written", 5)
+    profile = profiler.as_dict()
+    assert list(profile["phases"]) == ["read", "write"]
+    assert profile["phases"]["read"]["calls"] == 3
+    assert profile["counters"] == {"files_written": 1, "bytes_written": 15}
+    assert profile["total_seconds"] >= profile["phases"]["write"]["seconds"]
+
+    stream = io.StringIO()
+    profiler.emit("text", stream)
+    lines = stream.getvalue().splitlines()
+    assert lines[0].startswith("profile: ")
+    assert lines[1].startswith("\tread: ") and lines[1].endswith(" s, 3 calls")
+    assert lines[3:] == ["\tbytes_written: 15", "\tfiles_written: 1"]
+
+
+def test_NullProfiler():
+    profiler = profiling.NULL_PROFILER
+    assert not profiler.enabled
+    with profiler.phase("read"):
+        profiler.count("lines", 3)
+    assert cli.MloxRuleManager([]).profiler is profiling.NULL_PROFILER
+
+
+def test_MloxRuleManager_merge_profile(tmp_path, capsys):
+    merged_path = tmp_path / "merged.txt"
+    rulefile_pattern = os.path.join(testfile_dir, "unique_*_sections.txt")
+    cli.main(args = ["--no-cache", "--profile=json", "merge", str(merged_path), rulefile_pattern])
+    profile = json.loads(capsys.readouterr().err)
+    assert list(profile["phases"]) == ["glob", "read", "coalesce", "write"]
+    assert profile["phases"]["read"]["calls"] == 2
+    counters = profile["counters"]
+    assert counters["files_opened"] == 2
+    assert counters["files_written"] == 1
+    assert counters["bytes_written"] == os.path.getsize(merged_path)
+    assert counters["bytes_read"] == sum(
+        os.path.getsize(os.path.join(testfile_dir, name))
+        for name in ("unique_sorted_sections.txt", "unique_unsorted_sections.txt")
+    )
+
+
+def test_MloxRuleManager_split_profile(tmp_path, capsys):
+    rulefile_name = os.path.join(testfile_dir, "report_tester.txt")
+    cli.main(args = ["--no-cache", "--profile", "split", "-d", str(tmp_path), rulefile_name])
+    err = capsys.readouterr().err
+    assert err.startswith("profile: ")
+    assert "\tscan: " in err and "\twrite: " in err
+    with open(rulefile_name, "rb") as f:
+        num_lines = f.read().count(b"\n")
+    assert f"\tlines: {num_lines}\n" in err
+    assert f"\tfiles_written: {len(os.listdir(tmp_path))}\n" in err
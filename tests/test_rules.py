@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from mlox_rule_mgr import rules, sections
+from mlox_rule_mgr.rules import Expr, Rule, RuleError
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+testfile_dir = os.path.abspath(os.path.join(this_dir, '..', 'specs', 'testfiles'))
+
+
+def test_parse_rules_reportTester():
+    report_tester_fnam = os.path.join(testfile_dir, "report_tester.txt")
+    with sections.section_table_factory(report_tester_fnam) as table:
+        parsed_rules, errors = rules.parse_rules(table)
+
+    assert parsed_rules == [
+        Rule("CONFLICT", "mod2 [author2]", 12, "Only use one.", ("abc_mod.esp", "mod2.esp")),
+        Rule("ORDER", "abc_mod [author1]", 20, None, ("abc_mod.esp", "mod3.esp")),
+        Rule("PATCH", "abc_mod [author1]", 24, None, ("abc_mod.esp", "abc_mod_v2_patch.esp")),
+        Rule("ORDER", "abc_mod [author1]", 32, None, ("abc_mod.esp", "cool_new_mod.esp")),
+        Rule("ORDER", "unique_mod [author3]", 39, None, ("fun_mod.esp", "unique_mod.esp")),
+        Rule("REQUIRES", "unique_mod [author3]", 43, None, (
+            "unique_fun_mod.esp",
+            Expr("ALL", ("fun_mod.esp", "unique_mod.esp")),
+        )),
+        Rule("ORDER", "mod2 [author2]", 52, None, ("mod2.esp", "mod1.esp")),
+        Rule("ORDER", "mod2 [otherauthor]", 59, None, ("unique_mod.esp", "otherauthor's mod2.esp")),
+    ]
+    assert errors == [RuleError("_header", 5, "unknown rule [NearFirst]")]
+
+
+def test_parse_rules_mloxBaseExcerpt():
+    testfile_path = os.path.join(this_dir, "..", "untitled1.txt")
+    with sections.section_table_factory(testfile_path) as table:
+        parsed_rules, errors = rules.parse_rules(table)
+
+    assert errors == []
+    assert [rule.kind for rule in parsed_rules] == [
+        "VERSION", "NEARSTART", "ORDER", "NEAREND", "ORDER", "ORDER", "NOTE", "NOTE",
+    ]
+    version, near_start = parsed_rules[:2]
+    assert version.arg == "2017-15-10 11:11:11 (UTC)"
+    assert "Morrowind Rebirth <VER> - Morrowind Patch *.esm" in near_start.items
+    size_note = parsed_rules[6]
+    assert size_note.items[0] == Expr("SIZE", (29311, False, "EBQ_Artifact.esp"))
+    assert size_note.message.startswith("These official plugins")
+
+
+def test_parse_lines_nestedExpressions():
+    parser = rules.RuleParser()
+    parsed_rules = parser.parse_lines([
+        "[Conflict]",
+        "\tDo not use these together. ; not part of the message",
+        "[ALL a.esp [NOT b.esp]]",
+        "[ANY c.esm",
+        "     [VER < 1.2 d.esp]",
+        "     [DESC !/patched/ e.esp]]",
+        "[SIZE !1234 f.esp]",
+    ], first_line = 10, section = "mod [author]")
+
+    assert parser.errors == []
+    assert parsed_rules == [
+        Rule("CONFLICT", "mod [author]", 10, "Do not use these together.", (
+            Expr("ALL", ("a.esp", Expr("NOT", ("b.esp",)))),
+            Expr("ANY", ("c.esm", Expr("VER", ("<", "1.2", "d.esp")), Expr("DESC", ("patched", True, "e.esp")))),
+            Expr("SIZE", (1234, True, "f.esp")),
+        )),
+    ]
+    assert list(parsed_rules[0].plugins()) == ["a.esp", "b.esp", "c.esm", "d.esp", "e.esp", "f.esp"]
+
+
+def test_parse_lines_pluginNamesAreInterned():
+    parser = rules.RuleParser()
+    first, second = parser.parse_lines([
+        "[Order]",
+        "a" + "bc.esp",
+        "[Requires]",
+        "ab" + "c.esp",
+        "d.esp",
+    ])
+    assert first.items[0] is second.items[0]
+
+
+def test_parse_lines_errors():
+    parser = rules.RuleParser()
+    parser.parse_lines([
+        "stray.esp",
+        "[Requires]",
+        "a.esp",
+        "[ALL b.esp",
+        "[Note] unclosed bracket above",
+        "x.esp]",
+        "[Patch]",
+        "a.esp",
+    ], section = "mod [author]")
+
+    assert parser.errors == [
+        RuleError("mod [author]", 1, "text outside of any rule"),
+        RuleError("mod [author]", 2, "unclosed [ALL in [REQUIRES] rule"),
+        RuleError("mod [author]", 2, "[REQUIRES] rule has 1 expressions"),
+        RuleError("mod [author]", 6, "unmatched ]"),
+        RuleError("mod [author]", 7, "[PATCH] rule has 1 expressions"),
+    ]
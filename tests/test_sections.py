@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from mlox_rule_mgr import cli, sections
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+this_dir = os.path.dirname(os.path.realpath(__file__))
+testfile_dir = os.path.abspath(os.path.join(this_dir, '..', 'specs', 'testfiles'))
+
+
+@pytest.mark.parametrize("testfile_name", sorted(os.listdir(testfile_dir)))
+def test_section_table_matches_parse_rulefile(testfile_name):
+    args = []
+    rule_mgr = cli.MloxRuleManager(args)
+
+    testfile_path = os.path.join(testfile_dir, testfile_name)
+    with open(testfile_path, 'r', encoding = 'utf-8') as testfile_f:
+        expected_sections = list(rule_mgr.iter_sections(testfile_f))
+
+    with sections.section_table_factory(testfile_path) as table:
+        assert len(table) == len(expected_sections)
+        for section, (name, section_info) in zip(table, expected_sections):
+            assert section.name == name
+            assert section.mod_name == section_info["mod_name"]
+            assert section.author == section_info["author"]
+            assert section.line_number == section_info["line_number"]
+            assert table.text(section) == "".join(section_info["lines"])
+
+
+def test_iter_sections_offsets():
+    text = b";; header\n\n;;;;\n;; @mod1 [author1]\n[Order]\nmod1.esp\n;;;;\n; @mod2 [author2]\nmod2.esp"
+    header, mod1, mod2 = sections.iter_sections(text)
+
+    assert header.astuple() == ("_header", "_header", "", 1, 1, 0, 11)
+    assert mod1.astuple() == ("mod1 [author1]", "mod1", "author1", 3, 3, 11, 52)
+    assert mod2.astuple() == ("mod2 [author2]", "mod2", "author2", 7, 7, 52, len(text))
+    assert text[mod2.start:mod2.end] == b";;;;\n; @mod2 [author2]\nmod2.esp"
+
+
+def test_iter_sections_lineEnds():
+    text = b";; header\r\n\r;;;;\r;; @mod1 [author1]\r[Order]\rmod1.esp\n;;;;\r\n; @mod2 [author2]\rmod2.esp"
+    header, mod1, mod2 = sections.iter_sections(text)
+
+    assert header.astuple() == ("_header", "_header", "", 1, 1, 0, 12)
+    assert mod1.astuple() == ("mod1 [author1]", "mod1", "author1", 3, 3, 12, 53)
+    assert mod2.astuple() == ("mod2 [author2]", "mod2", "author2", 7, 7, 53, len(text))
+
+
+def test_iter_sections_unicodeSpaces(tmp_path):
+    testfile_path = tmp_path / "spaces.txt"
+    testfile_path.write_text(
+        ";; header\n\n\u00a0; @mod1\u00a0 [author1]\nmod1.esp\n\u3000;;;;\n\x1c;\u2003@mod2 [author2]\nmod2.esp \xe9\n",
+        encoding = 'utf-8',
+    )
+    rule_mgr = cli.MloxRuleManager([])
+    with open(testfile_path, 'r', encoding = 'utf-8') as testfile_f:
+        expected_sections = list(rule_mgr.iter_sections(testfile_f))
+    with sections.section_table_factory(str(testfile_path)) as table:
+        assert [section.name for section in table] == ["_header", "mod1 [author1]", "mod2 [author2]"]
+        for section, (name, section_info) in zip(table, expected_sections):
+            assert section.line_number == section_info["line_number"]
+            assert table.text(section) == "".join(section_info["lines"])
+
+
+def test_section_names_are_interned():
+    text = b"; @mod1 [author1]\n; @mod1 [author1]\n"
+    _, first, second = sections.iter_sections(text)
+    assert first.name is second.name
+    assert first.author is second.author
+
+
+def test_section_table_emptyFile():
+    testfile_path = os.path.join(testfile_dir, "empty.txt")
+    with sections.section_table_factory(testfile_path) as table:
+        assert len(table) == 1
+        assert len(table.header) == 0
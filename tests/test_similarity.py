@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import random
+import time
+
+import pytest
+
+from mlox_rule_mgr import cli, similarity
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+def test_normalized_body():
+    text = ";;;;;;\n;; @mod2 [author2]\n\n[ORDER]\n  Mod2.esp \n; a comment\nmod1.esp\n\t \n"
+    assert similarity.normalized_body(text) == "[order]\nmod2.esp\nmod1.esp"
+    assert similarity.normalized_body(";; @empty [author]\n\n") == ""
+
+
+def test_exact_duplicates():
+    bodies = ["[order]\na.esp\nb.esp", "", "[note] x\na.esp", "[order]\na.esp\nb.esp", "", "[note] x\na.esp", "c"]
+    assert similarity.exact_duplicates(bodies) == [[0, 3], [2, 5]]
+
+
+def test_near_duplicates():
+    common = "[order]\nbase.esm\nmod1.esp\nmod2.esp\nmod3.esp\nmod4.esp\nmod5.esp\nmod6.esp\n"
+    bodies = [
+        common + "mod7.esp",
+        "[conflict]\nsomething.esp\nelse.esp\nentirely.esp\nother.esp",
+        common + "mod8.esp",
+        common + "mod7.esp",
+        "[order]\na.esp",
+    ]
+    pairs = similarity.near_duplicates(bodies)
+    assert [(i, j) for i, j, _ in pairs] == [(0, 2)]
+    assert pairs[0][2] == 7 / 9
+
+
+def test_near_duplicates_findsSimilarPairs():
+    rng = random.Random(3)
+    words = [f"w{i}" for i in range(400)]
+    bodies = list()
+    for _ in range(150):
+        body = [rng.choice(words) for _ in range(20)]
+        bodies.append(" ".join(body))
+        # A copy with one or two words changed.
+        for _ in range(rng.randint(1, 2)):
+            body[rng.randrange(len(body))] = rng.choice(words)
+        bodies.append(" ".join(body))
+
+    expected = set()
+    shingle_sets = [similarity.shingles(body) for body in bodies]
+    for i, j in itertools.combinations(range(len(bodies)), 2):
+        if bodies[i] != bodies[j] and similarity.jaccard(shingle_sets[i], shingle_sets[j]) >= 0.7:
+            expected.add((i, j))
+    found = {(i, j) for i, j, _ in similarity.near_duplicates(bodies)}
+    assert found <= expected
+    assert len(found) >= 0.9 * len(expected)
+
+
+def test_MloxRuleManager_report_similarSections(tmp_path, capsys):
+    testfile_path = tmp_path / "similar.txt"
+    testfile_path.write_text(
+        ";; @mod1 [author1]\n[Requires]\nmod1.esp\n[ALL base.esm patch1.esp patch2.esp patch3.esp]\n\n"
+        ";; @mod2 [author2]\n[Note]\n Completely different.\nmod2.esp\n\n"
+        ";; @mod1 copy [author9]\n; pasted\n[REQUIRES]\nmod1.esp\n[ALL  base.esm patch1.esp patch2.esp patch3.esp]\n\n"
+        ";; @mod1 edit [author9]\n[Requires]\nmod1.esp\n[ALL base.esm patch1.esp patch2.esp patch4.esp]\n",
+        encoding = 'utf-8',
+    )
+    cli.main(args = ["report", "--similar-bodies", str(testfile_path)])
+    assert capsys.readouterr().out == (
+        f"{testfile_path} report:\n"
+        "\tHeader: No\n"
+        "\t4 Mod Sections\n"
+        "\tSections Sorted: No\n"
+        "\t0 Duplicate Section Names\n"
+        "\t1 Duplicate Section Body:\n"
+        "\t\tmod1 [author1] line 1, mod1 copy [author9] line 11\n"
+        "\t1 Similar Section Pair:\n"
+        "\t\tmod1 [author1] line 1, mod1 edit [author9] line 17: 71% similar\n"
+    )
+    cli.main(args = ["report", str(testfile_path)])
+    output = capsys.readouterr().out
+    assert "\t1 Duplicate Section Body:\n" in output
+    assert "Similar Section Pair" not in output
+
+
+def test_edit_distance():
+    assert similarity.edit_distance("kitten", "sitting", 5) == 3
+    assert similarity.edit_distance("kitten", "sitting", 2) == 3
+    assert similarity.edit_distance("abc", "abc", 0) == 0
+    assert similarity.edit_distance("", "abc", 3) == 3
+    assert similarity.edit_distance("abcdef", "ab", 2) == 3
+
+
+def test_NameIndex_findsAllWithinDistance():
+    rng = random.Random(5)
+    strings = list()
+    for _ in range(300):
+        string = "".join(rng.choice("abcd ") for _ in range(rng.randint(0, 12)))
+        strings.append(string)
+    for max_distance in (0, 1, 2, 3):
+        name_index = similarity.NameIndex(max_distance)
+        for string_id, string in enumerate(strings):
+            name_index.add(string_id, string)
+        for string in strings[:50]:
+            expected = {
+                string_id for string_id, other in enumerate(strings)
+                if similarity.edit_distance(string, other, max_distance) <= max_distance
+            }
+            assert expected <= name_index.candidates(string)
+
+
+def test_similar_names():
+    names = [
+        "Tamriel Rebuilt [TR Team]",
+        "mod1 [author1]",
+        "mod2 [author2]",
+        "Mod2  [Author2]",
+        "Tamriel Rebiult [TR Team]",
+        "Tamriel Rebuilt [TR Teams]",
+        "Something Else [someone]",
+    ]
+    assert similarity.similar_names(names) == [(0, 2, 3), (1, 0, 5), (2, 0, 4)]
+    assert similarity.similar_names(names, 1) == [(0, 2, 3), (1, 0, 5)]
+    assert similarity.similar_names(names, 0) == [(0, 2, 3)]
+
+
+def _random_names(rng, count):
+    syllables = ("mor", "row", "ind", "tri", "bu", "nal", "moon", "tam", "ri", "el", "re", "van", "do")
+    words = ("Better", "Bodies", "Sounds", "Textures", "Weapons", "Armor", "Patch", "Quests")
+    authors = ("Qarl", "Abot", "TR Team", "Westly", "Melchior")
+    def word():
+        if rng.random() < 0.3:
+            return rng.choice(words)
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title()
+    names = (" ".join(word() for _ in range(rng.randint(1, 4))) + f" [{rng.choice(authors)}]" for _ in range(count))
+    return list(dict.fromkeys(names))
+
+
+def test_similar_names_findsAllWithinDistance():
+    rng = random.Random(3)
+    names = _random_names(rng, 300)
+    # Add names a few random edits away.
+    for name in names[:100]:
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(name))
+            name = name[:position] + rng.choice("abe ") + name[position + rng.randint(0, 1):]
+        names.append(name)
+    names = list(dict.fromkeys(names))
+    keys = [similarity.normalized_name(name) for name in names]
+    numberless_keys = [similarity.digits_regex.sub("", key) for key in keys]
+    expected = sorted(
+        (similarity.edit_distance(keys[i], keys[j], 2), i, j)
+        for i, j in itertools.combinations(range(len(names)), 2)
+        if similarity.edit_distance(keys[i], keys[j], 2) <= 2
+        and (keys[i] == keys[j] or numberless_keys[i] != numberless_keys[j])
+    )
+    assert len(expected) > 50
+    assert sorted(similarity.similar_names(names)) == expected
+
+
+def test_similar_names_isFast():
+    # Names sharing words and authors share pigeonhole segments.
+    names = _random_names(random.Random(0), 6000)
+    start_time = time.perf_counter()
+    similarity.similar_names(names)
+    assert time.perf_counter() - start_time < 2.5
+
+
+def test_MloxRuleManager_report_similarNames(tmp_path, capsys):
+    testfile_path = tmp_path / "names.txt"
+    testfile_path.write_text(
+        ";; @Better Bodies [Psychodog]\n[Requires]\nbb.esp\nbase.esm\n\n"
+        ";; @better bodies [psychodog]\n[Order]\nbb.esp\nother.esp\n\n"
+        ";; @Beter Bodies [Psychodog]\n[Note]\n Typo.\nbb2.esp\n",
+        encoding = 'utf-8',
+    )
+    cli.main(args = ["report", "--similar-names", str(testfile_path)])
+    assert capsys.readouterr().out == (
+        f"{testfile_path} report:\n"
+        "\tHeader: No\n"
+        "\t3 Mod Sections\n"
+        "\tSections Sorted: No\n"
+        "\t0 Duplicate Section Names\n"
+        "\t2 Similar Section Names:\n"
+        "\t\tBetter Bodies [Psychodog] line 1, better bodies [psychodog] line 6: case or spacing\n"
+        "\t\tBetter Bodies [Psychodog] line 1, Beter Bodies [Psychodog] line 11: 1 edit\n"
+    )
+    cli.main(args = ["report", "--similar-names", "--name-distance", "0", str(testfile_path)])
+    assert "\t1 Similar Section Name:\n" in capsys.readouterr().out
+    cli.main(args = ["report", str(testfile_path)])
+    assert "Similar Section Name" not in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        cli.main(args = ["report", "--name-distance", "-1", str(testfile_path)])
+    assert "--name-distance: must be at least 0, not -1" in capsys.readouterr().err
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mlox_rule_mgr
+from mlox_rule_mgr import cli, commands
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+# Cumulative import time of mlox_rule_mgr.cli, in microseconds. About 50 ms
+# here; pkg_resources alone took over 150 ms.
+IMPORT_TIME_BUDGET = 150000
+
+# Modules only some subcommands need.
+HEAVY_MODULES = (
+    "pkg_resources",
+    "importlib.metadata",
+    "numpy",
+    "concurrent.futures",
+    "mlox_rule_mgr.evaluation",
+    "mlox_rule_mgr.parallel",
+    "mlox_rule_mgr.similarity",
+)
+
+
+def run_python(*args):
+    """Runs python with mlox_rule_mgr importable, returning its stderr."""
+    env = dict(os.environ)
+    package_dir = os.path.dirname(os.path.dirname(os.path.realpath(mlox_rule_mgr.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (package_dir, env.get("PYTHONPATH"))))
+    completed = subprocess.run(
+        [sys.executable, *args], env = env, stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+        universal_newlines = True, check = True,
+    )
+    return completed.stdout, completed.stderr
+
+
+def import_times(stderr):
+    """Parses -X importtime output into {module: cumulative microseconds}."""
+    times = dict()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_cli_withinBudget():
+    # Best of a few runs, as a busy machine can slow any one run.
+    cli_time = None
+    for _ in range(3):
+        _, stderr = run_python("-X", "importtime", "-c", "import mlox_rule_mgr.cli")
+        times = import_times(stderr)
+        for module in HEAVY_MODULES:
+            assert module not in times
+        assert not [module for module in times if module.startswith("mlox_rule_mgr.commands.")]
+        cli_time = min(times["mlox_rule_mgr.cli"], cli_time or times["mlox_rule_mgr.cli"])
+    assert cli_time < IMPORT_TIME_BUDGET
+
+
+def test_parse_args_importsOnlyChosenCommand():
+    stdout, _ = run_python("-c", (
+        "import sys\n"
+        "from mlox_rule_mgr import cli\n"
+        "cli.parse_args(['report', 'rules.txt'])\n"
+        "print(' '.join(sorted(m for m in sys.modules if m.startswith('mlox_rule_mgr.commands.'))))\n"
+    ))
+    assert stdout.split() == ["mlox_rule_mgr.commands.report"]
+
+
+def test_MloxRuleManager_commandMethods():
+    rule_mgr = cli.MloxRuleManager(cli.parse_args(["--no-cache", "index", "rules.txt"]))
+    for command in commands.COMMANDS:
+        module = commands.load(command.module_name)
+        assert hasattr(module, "add_arguments")
+        for method in command.methods:
+            assert getattr(rule_mgr, method).func is getattr(module, method)
+    with pytest.raises(AttributeError):
+        rule_mgr.no_such_command
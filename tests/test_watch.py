@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from mlox_rule_mgr import cli, watch
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+def test_stat_files(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"abc")
+    filenames = [str(tmp_path / "a.txt"), str(tmp_path / "missing.txt"), str(tmp_path / "nowhere" / "b.txt")]
+    stats = watch.stat_files(filenames)
+    assert list(stats) == [str(tmp_path / "a.txt")]
+    assert stats[str(tmp_path / "a.txt")][0] == 3
+
+
+def test_PollingWatcher(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "b.txt").write_bytes(b"b")
+    def list_files():
+        return sorted(str(path) for path in tmp_path.glob("*.txt"))
+    watcher = watch.PollingWatcher(list_files, interval = 0.01, debounce = 0.0)
+    assert watcher.poll() == set()
+
+    (tmp_path / "a.txt").write_bytes(b"aa")
+    os.remove(tmp_path / "b.txt")
+    (tmp_path / "c.txt").write_bytes(b"c")
+    assert watcher.wait() == {str(tmp_path / name) for name in ("a.txt", "b.txt", "c.txt")}
+    assert watcher.poll() == set()
+
+
+def test_MloxRuleManager_watch_merge(tmp_path, monkeypatch, capsys):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    (rules_dir / "a.txt").write_text(";; @a [author]\n", encoding = 'utf-8')
+    (rules_dir / "b.txt").write_text(";; @b [author]\n", encoding = 'utf-8')
+    merged_path = rules_dir / "merged.txt"
+
+    def fake_wait(self):
+        if fake_wait.calls:
+            raise KeyboardInterrupt
+        fake_wait.calls += 1
+        # The merged file is not watched.
+        assert str(merged_path) not in self.stats
+        (rules_dir / "b.txt").write_text(";; @b [author]\n[Note]\n edited\n", encoding = 'utf-8')
+        return {str(rules_dir / "b.txt")}
+    fake_wait.calls = 0
+    monkeypatch.setattr(watch.PollingWatcher, "wait", fake_wait)
+
+    cli.main(args = ["watch", "merge", str(merged_path), str(rules_dir / "*.txt")])
+    out = capsys.readouterr().out
+    assert "merge: 2 added, 0 changed, 0 removed, 0 unchanged" in out
+    assert "merge: 0 added, 1 changed, 0 removed, 1 unchanged" in out
+    assert merged_path.read_text(encoding = 'utf-8') == f";; @a [author]{os.linesep};; @b [author]\n[Note]\n edited{os.linesep}"
+
+
+def test_MloxRuleManager_watch_split(tmp_path, monkeypatch, capsys):
+    rulefile_path = tmp_path / "rules.txt"
+    rulefile_path.write_text(";; @a [author]\n\n;; @b [author]\n", encoding = 'utf-8')
+    split_dir = tmp_path / "split"
+    split_dir.mkdir()
+
+    def fake_wait(self):
+        if fake_wait.calls:
+            raise KeyboardInterrupt
+        fake_wait.calls += 1
+        rulefile_path.write_text(";; @a [author]\n\n;; @c [author]\n", encoding = 'utf-8')
+        return {str(rulefile_path)}
+    fake_wait.calls = 0
+    monkeypatch.setattr(watch.PollingWatcher, "wait", fake_wait)
+
+    cli.main(args = ["watch", "split", "-d", str(split_dir), str(rulefile_path)])
+    out = capsys.readouterr().out
+    assert "split: 3 added, 0 changed, 0 removed, 0 unchanged" in out
+    assert "split: 1 added, 0 changed, 1 removed, 2 unchanged" in out
+    assert sorted(os.listdir(split_dir)) == [".mlox_split_manifest.json", "_header.txt", "aauthor.txt", "cauthor.txt"]
+
+
+def test_MloxRuleManager_watch_split_survivesFailedBuild(tmp_path, monkeypatch, capsys, caplog):
+    rulefile_path = tmp_path / "rules.txt"
+    rulefile_path.write_text(";; @a [author]\n", encoding = 'utf-8')
+    split_dir = tmp_path / "split"
+    split_dir.mkdir()
+
+    def fake_wait(self):
+        fake_wait.calls += 1
+        if fake_wait.calls == 1:
+            # Removed between polls, as by an editor's atomic save.
+            os.remove(rulefile_path)
+        elif fake_wait.calls == 2:
+            rulefile_path.write_text(";; @a [author]\n\n;; @b [author]\n", encoding = 'utf-8')
+        else:
+            raise KeyboardInterrupt
+        return {str(rulefile_path)}
+    fake_wait.calls = 0
+    monkeypatch.setattr(watch.PollingWatcher, "wait", fake_wait)
+
+    cli.main(args = ["watch", "split", "-d", str(split_dir), str(rulefile_path)])
+    assert fake_wait.calls == 3
+    assert "rebuild failed, waiting for the next change" in caplog.text
+    assert "split: 1 added, 0 changed, 0 removed, 2 unchanged" in capsys.readouterr().out
+    assert sorted(os.listdir(split_dir)) == [".mlox_split_manifest.json", "_header.txt", "aauthor.txt", "bauthor.txt"]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from mlox_rule_mgr import writer
+
+__author__ = "Kaben Nanlohy"
+__copyright__ = "Kaben Nanlohy"
+
+
+def test_FileWriter(tmp_path):
+    with writer.FileWriter(threads = 3, fsync_directory = str(tmp_path)) as file_writer:
+        for i in range(50):
+            file_writer.submit(str(tmp_path / f"{i}.txt"), [b"section ", memoryview(b"text ")[:4], f"{i}\n".encode()])
+
+    assert file_writer.files_written == 50
+    assert file_writer.bytes_written == sum(len(f"section text{i}\n") for i in range(50))
+    assert (tmp_path / "7.txt").read_bytes() == b"section text7\n"
+    assert file_writer.throughput().startswith("wrote 50 files, ")
+
+
+def test_FileWriter_raisesWriteErrors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        with writer.FileWriter(threads = 2) as file_writer:
+            file_writer.submit(str(tmp_path / "ok.txt"), [b"ok"])
+            file_writer.submit(str(tmp_path / "missing" / "bad.txt"), [b"bad"])
+    assert (tmp_path / "ok.txt").read_bytes() == b"ok"